@@ -0,0 +1,85 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from app.core.database import get_db
+from app.services.alarm_history import (LATENCY_MAX_EVENTS, daily_counts, latency_rows, query_page,
+                                        stage_latency_stats)
+from pydantic import BaseModel
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+router = APIRouter()
+
+class AlarmEventResponse(BaseModel):
+    id: int
+    user_id: Optional[int] = None
+    stock_code: str
+    stock_name: Optional[str] = None
+    signal_type: Optional[str] = None
+    priority: Optional[str] = None
+    reason: Optional[str] = None
+    value: Optional[float] = None
+    threshold: Optional[float] = None
+    price: Optional[float] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class AlarmPage(BaseModel):
+    items: List[AlarmEventResponse]
+    next_cursor: Optional[str] = None
+
+@router.get("/", response_model=AlarmPage)
+def list_alarms(
+    user_id: Optional[int] = None,
+    stock_code: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """
+    Alarm history, newest first. Pass `next_cursor` from the previous page as
+    `cursor` to continue; pages are keyset based so depth does not matter.
+    """
+    try:
+        events, next_cursor = query_page(
+            db, user_id=user_id, stock_code=stock_code,
+            since=since, until=until, cursor=cursor, limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return AlarmPage(items=events, next_cursor=next_cursor)
+
+@router.get("/stats/daily")
+def get_daily_stats(
+    days: int = Query(7, ge=1, le=365),
+    user_id: Optional[int] = None,
+    stock_code: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Alarm counts per symbol per day (and signal type) over the last `days`.
+    """
+    since = datetime.now() - timedelta(days=days)
+    return {
+        "since": since.isoformat(),
+        "counts": daily_counts(db, since, user_id=user_id, stock_code=stock_code)
+    }
+
+@router.get("/latency")
+def get_alarm_latency(hours: int = Query(24, ge=1, le=168), stock_code: Optional[str] = None,
+                      db: Session = Depends(get_db)):
+    """
+    p50/p95/p99 latency (seconds) per alarm pipeline stage over the last `hours`
+    (at most a week, and the newest LATENCY_MAX_EVENTS alarms).
+    """
+    since = datetime.now() - timedelta(hours=hours)
+    rows = latency_rows(db, since, stock_code=stock_code)
+    return {
+        "since": since.isoformat(),
+        "alarms": len(rows),
+        "truncated": len(rows) >= LATENCY_MAX_EVENTS,
+        "stages": stage_latency_stats(rows)
+    }
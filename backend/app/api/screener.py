@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from app.core.database import get_db
+from app.services.screener import screener, query_results, ScreenerError
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+
+router = APIRouter()
+
+class ScreenerRow(BaseModel):
+    stock_code: str
+    stock_name: Optional[str] = None
+    stock_type: str
+    bar_date: Optional[str] = None
+    source: Optional[str] = None
+    price: Optional[float] = None
+    change_pct: Optional[float] = None
+    rsi6: Optional[float] = None
+    rsi14: Optional[float] = None
+    ma20: Optional[float] = None
+    ma60: Optional[float] = None
+    bb_lower: Optional[float] = None
+    bb_mid: Optional[float] = None
+    bb_upper: Optional[float] = None
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+@router.get("/", response_model=List[ScreenerRow])
+def screen(
+    where: Optional[str] = None,
+    stock_type: Optional[str] = None,
+    order_by: str = "rsi6",
+    descending: bool = False,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """
+    Latest screener results, e.g. where="rsi6 < 20 and price > ma60".
+    Columns: price, change_pct, rsi6, rsi14, ma20, ma60, bb_lower, bb_mid, bb_upper.
+    """
+    try:
+        return query_results(db, where=where, stock_type=stock_type, order_by=order_by,
+                             descending=descending, limit=limit)
+    except ScreenerError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/status")
+def screener_status():
+    """
+    Timing and size of the last close / intraday passes in this process.
+    """
+    return {
+        "last_close_date": screener.last_close_date.isoformat() if screener.last_close_date else None,
+        "runs": screener.last_run,
+    }
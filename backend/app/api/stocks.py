@@ -1,14 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from app.core.database import get_db
+from app.core.etag import make_etag, not_modified, cache_headers
 from app.models import UserStock, UserStrategy
+from app.services import versions
 from pydantic import BaseModel
 from typing import List
 
 router = APIRouter()
 
 from typing import Optional
-from app.services.market_data import MarketDataService
 
 class StockCreate(BaseModel):
     stock_code: str
@@ -48,18 +50,82 @@ def add_stock(stock: StockCreate, db: Session = Depends(get_db)):
         enable_push=True
     )
     db.add(db_strategy)
+    versions.bump(db, versions.STOCKS, versions.STRATEGIES)
     
     db.commit()
     db.refresh(db_stock)
     return db_stock
 
 @router.get("/list", response_model=List[StockResponse])
-def list_stocks(db: Session = Depends(get_db)):
+def list_stocks(request: Request, response: Response, db: Session = Depends(get_db)):
+    etag = make_etag(versions.STOCKS, versions.current(db, versions.STOCKS))
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    response.headers.update(cache_headers(etag))
     return db.query(UserStock).all()
 
+class ImportRowError(BaseModel):
+    row: int
+    stock_code: Optional[str] = None
+    error: str
+
+class ImportResult(BaseModel):
+    added: List[str]
+    updated: List[str]
+    errors: List[ImportRowError]
+    warming: bool = False
+
+@router.post("/import", response_model=ImportResult)
+async def import_stocks(request: Request, background_tasks: BackgroundTasks,
+                        stock_type: str = "stock", warm: bool = False,
+                        db: Session = Depends(get_db)):
+    """
+    Bulk add/update stocks from a CSV or JSON body (see services/watchlist.py).
+    Invalid rows are reported and skipped; valid rows are saved in one
+    transaction. With warm=true, history for new symbols is fetched in the
+    background.
+    """
+    from fastapi.concurrency import run_in_threadpool
+    from app.services import watchlist
+    body = await request.body()
+    try:
+        rows = watchlist.parse_rows(body, request.headers.get("content-type", ""))
+    except watchlist.WatchlistError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def save():
+        # Listing fetch and DB writes block: keep them off the event loop
+        valid, errors = watchlist.validate_rows(rows, default_type=stock_type)
+        return valid, errors, watchlist.upsert(db, valid) if valid else {"added": [], "updated": []}
+
+    valid, errors, result = await run_in_threadpool(save)
+    if warm and result["added"]:
+        background_tasks.add_task(
+            watchlist.warm_history, [(code, valid[code]["stock_type"]) for code in result["added"]]
+        )
+    return ImportResult(errors=errors, warming=bool(warm and result["added"]), **result)
+
+@router.get("/export")
+def export_stocks(format: str = "json", db: Session = Depends(get_db)):
+    """
+    Watchlist with strategy settings, as JSON or CSV (importable as-is).
+    """
+    from app.services import watchlist
+    rows = watchlist.export_rows(db)
+    if format == "csv":
+        return Response(
+            content=watchlist.to_csv(rows),
+            media_type="text/csv",
+            headers={"Content-Disposition": "attachment; filename=watchlist.csv"}
+        )
+    if format != "json":
+        raise HTTPException(status_code=400, detail="format must be json or csv")
+    return rows
+
 @router.delete("/delete/{stock_code}")
 def delete_stock(stock_code: str, db: Session = Depends(get_db)):
     db.query(UserStock).filter(UserStock.stock_code == stock_code).delete()
+    versions.bump(db, versions.STOCKS)
     db.commit()
     return {"status": "ok"}
 
@@ -70,17 +136,22 @@ class StockMetrics(BaseModel):
     rsi: Optional[float] = None
     rsi_length: int = 14
     timestamp: str
+    computed_at: Optional[str] = None  # When the underlying bars were fetched
     market_status: str
     
     class Config:
         from_attributes = True
 
 @router.get("/metrics/{stock_code}", response_model=StockMetrics)
-def get_stock_metrics(stock_code: str, db: Session = Depends(get_db)):
+def get_stock_metrics(stock_code: str, request: Request, response: Response, db: Session = Depends(get_db)):
     """
     Get real-time metrics for a stock: price, RSI, change percentage.
+    The ETag follows the underlying bars, so polls between data refreshes get 304.
     """
     from datetime import datetime
+    from app.services.bar_cache import bar_cache
+    from app.services.indicator_cache import fingerprint
+    from app.services.market_data import MarketDataService
     from app.services.indicator import IndicatorService
     from app.services.trading_hours import get_market_status
     
@@ -108,6 +179,14 @@ def get_stock_metrics(stock_code: str, db: Session = Depends(get_db)):
     
     if df is None or df.empty:
         raise HTTPException(status_code=500, detail="Failed to fetch market data")
+
+    market_status = get_market_status()
+    entry = bar_cache.peek(bar_cache.make_key(stock.stock_code, rsi_period, stock.stock_type))
+    computed_at = datetime.fromtimestamp(entry["fetched_at"]).isoformat() if entry else None
+    etag = make_etag("metrics", fingerprint(df), rsi_length, market_status, computed_at)
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    response.headers.update(cache_headers(etag))
     
     # Determine column name
     close_col = 'close' if 'close' in df.columns else '收盘'
@@ -133,9 +212,6 @@ def get_stock_metrics(stock_code: str, db: Session = Depends(get_db)):
         # RSI calculation failed, but still return price data
         pass
     
-    # Get market status
-    market_status = get_market_status()
-    
     return StockMetrics(
         stock_code=stock_code,
         price=current_price,
@@ -143,6 +219,75 @@ def get_stock_metrics(stock_code: str, db: Session = Depends(get_db)):
         rsi=rsi_value,
         rsi_length=rsi_length,
         timestamp=datetime.now().isoformat(),
+        computed_at=computed_at,
         market_status=market_status
     )
 
+
+@router.get("/series/{stock_code}")
+def get_stock_series(
+    stock_code: str,
+    request: Request,
+    period: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    points: Optional[int] = Query(None, ge=3),
+    indicators: str = "rsi,ma,bb",
+    rsi_length: Optional[int] = Query(None, ge=2),
+    format: str = "json",
+    db: Session = Depends(get_db)
+):
+    """
+    OHLC + indicator series for charts (see services/series.py), computed
+    from cached bars. `points` downsamples with LTTB; format=binary returns
+    the packed columnar encoding instead of JSON.
+    Period and RSI length default to the stock's strategy.
+    """
+    import pandas as pd
+    from app.core.config import settings
+    from app.services.indicator_cache import fingerprint
+    from app.services.market_data import MarketDataService
+    from app.services import series
+
+    if format not in ("json", "binary"):
+        raise HTTPException(status_code=400, detail="format must be json or binary")
+    if points is not None and points > settings.SERIES_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"points must be at most {settings.SERIES_MAX_POINTS}")
+    stock = db.query(UserStock).filter(UserStock.stock_code == stock_code).first()
+    if not stock:
+        raise HTTPException(status_code=404, detail="Stock not found")
+    strategy = db.query(UserStrategy).filter_by(stock_code=stock_code).first()
+    period = period or (strategy.rsi_period if strategy else "daily")
+    rsi_length = rsi_length or (strategy.rsi_length if strategy and strategy.rsi_length else 14)
+    names = tuple(name.strip() for name in indicators.split(",") if name.strip())
+
+    df = MarketDataService.get_history_data(stock_code, period=period, stock_type=stock.stock_type)
+    if df is not None and not df.empty and df.attrs.get("trimmed"):
+        # Cached bars keep only the strategies' lookback: the whole history, or a
+        # range starting within the indicators' warm-up of it, needs the full history
+        warmed_from = df["date"].iloc[min(series.warmup_bars(names, rsi_length), len(df) - 1)]
+        try:
+            full = start is None or pd.Timestamp(start) < pd.Timestamp(warmed_from)
+        except (ValueError, TypeError):
+            full = False  # Rejected by build_series below
+        if full:
+            df = MarketDataService.get_history_data(stock_code, period=period, stock_type=stock.stock_type,
+                                                    use_cache=False)
+    if df is None or df.empty:
+        raise HTTPException(status_code=500, detail="Failed to fetch market data")
+
+    etag = make_etag("series", fingerprint(df), start, end, points, names, rsi_length, format)
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    try:
+        columns = series.build_series(df, start=start, end=end, points=points,
+                                      indicators=names, rsi_length=rsi_length)
+    except series.SeriesError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if format == "binary":
+        return Response(content=series.to_binary(columns), media_type="application/octet-stream",
+                        headers=cache_headers(etag))
+    # Plain lists already: skip FastAPI's per-element encoding
+    payload = {"stock_code": stock_code, "period": period, "rsi_length": rsi_length, **series.to_json(columns)}
+    return JSONResponse(content=payload, headers=cache_headers(etag))
@@ -1,8 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from app.core.database import get_db
+from app.core.etag import make_etag, not_modified, cache_headers
 from app.models import UserStrategy
+from app.services import versions
+from app.services.signal_state import signal_state
 from pydantic import BaseModel
+from typing import Optional
 
 router = APIRouter()
 
@@ -15,9 +19,15 @@ class StrategyUpdate(BaseModel):
     enable_push: bool
     enable_trend_filter: bool = False
     enable_volatility_filter: bool = False
+    buy_rule: Optional[str] = None
+    sell_rule: Optional[str] = None
 
 @router.get("/{stock_code}")
-def get_strategy(stock_code: str, db: Session = Depends(get_db)):
+def get_strategy(stock_code: str, request: Request, response: Response, db: Session = Depends(get_db)):
+    etag = make_etag(versions.STRATEGIES, stock_code, versions.current(db, versions.STRATEGIES))
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    response.headers.update(cache_headers(etag))
     strategy = db.query(UserStrategy).filter(UserStrategy.stock_code == stock_code).first()
     if not strategy:
         # Return default
@@ -28,12 +38,27 @@ def get_strategy(stock_code: str, db: Session = Depends(get_db)):
             "rsi_length": 14, 
             "enable_push": True,
             "enable_trend_filter": False,
-            "enable_volatility_filter": False
+            "enable_volatility_filter": False,
+            "buy_rule": None,
+            "sell_rule": None
         }
     return strategy
 
 @router.post("/update")
 def update_strategy(strategy: StrategyUpdate, db: Session = Depends(get_db)):
+    from app.services.rules import RuleError, compile_rule
+
+    # Blank rules clear the field; others must compile
+    strategy.buy_rule = (strategy.buy_rule or "").strip() or None
+    strategy.sell_rule = (strategy.sell_rule or "").strip() or None
+    for field in ("buy_rule", "sell_rule"):
+        text = getattr(strategy, field)
+        if text:
+            try:
+                compile_rule(text)
+            except RuleError as e:
+                raise HTTPException(status_code=400, detail=f"Invalid {field}: {e}")
+
     db_strategy = db.query(UserStrategy).filter(UserStrategy.stock_code == strategy.stock_code).first()
     if not db_strategy:
         db_strategy = UserStrategy(
@@ -44,7 +69,9 @@ def update_strategy(strategy: StrategyUpdate, db: Session = Depends(get_db)):
             rsi_length=strategy.rsi_length,
             enable_push=strategy.enable_push,
             enable_trend_filter=strategy.enable_trend_filter,
-            enable_volatility_filter=strategy.enable_volatility_filter
+            enable_volatility_filter=strategy.enable_volatility_filter,
+            buy_rule=strategy.buy_rule,
+            sell_rule=strategy.sell_rule
         )
         db.add(db_strategy)
     else:
@@ -55,6 +82,47 @@ def update_strategy(strategy: StrategyUpdate, db: Session = Depends(get_db)):
         db_strategy.enable_push = strategy.enable_push
         db_strategy.enable_trend_filter = strategy.enable_trend_filter
         db_strategy.enable_volatility_filter = strategy.enable_volatility_filter
+        db_strategy.buy_rule = strategy.buy_rule
+        db_strategy.sell_rule = strategy.sell_rule
+    versions.bump(db, versions.STRATEGIES)
     
     db.commit()
+    # Thresholds or rules may have changed; start a new signal episode
+    signal_state.reset(db_strategy.id)
+    signal_state.checkpoint(db)
     return {"status": "ok"}
+
+@router.get("/{stock_code}/triggers")
+def get_trigger_levels(stock_code: str, db: Session = Depends(get_db)):
+    """
+    Prices at which today's daily bar would trigger the strategy (see
+    services/trigger_levels.py), with RSI at the latest price.
+    """
+    from app.models import UserStock
+    from app.services.market_data import MarketDataService
+    from app.services.trigger_levels import compute_levels
+
+    strategy = db.query(UserStrategy).filter(UserStrategy.stock_code == stock_code).first()
+    stock = db.query(UserStock).filter(UserStock.stock_code == stock_code).first()
+    if not strategy or not stock:
+        raise HTTPException(status_code=404, detail="Strategy not found")
+    if strategy.rsi_period != "daily":
+        raise HTTPException(status_code=400, detail="Trigger prices are only available for daily strategies")
+    if strategy.buy_rule or strategy.sell_rule:
+        raise HTTPException(status_code=400, detail="Trigger prices are not available for rule strategies")
+
+    df = MarketDataService.get_history_data(stock_code, period="daily", stock_type=stock.stock_type)
+    if df is None or df.empty:
+        raise HTTPException(status_code=500, detail="Failed to fetch market data")
+    levels = compute_levels(df, strategy)
+    if levels is None:
+        raise HTTPException(status_code=400, detail="Not enough history")
+    price = float(df["close"].iloc[-1])
+    rsi = levels.rsi_at(price)
+    return {
+        "stock_code": stock_code,
+        **levels.to_dict(),
+        "price": price,
+        "rsi": round(rsi, 2) if rsi is not None else None,
+        "signal": levels.check(price),
+    }
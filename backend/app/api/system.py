@@ -0,0 +1,57 @@
+from fastapi import APIRouter
+from app.core import startup
+from app.services.bar_cache import bar_cache
+
+router = APIRouter()
+
+@router.get("/cache")
+def get_cache_stats():
+    """
+    Entry counts and hit statistics of the in-process caches, the
+    host-wide shared bar store (SHARED_BARS_DIR) and the history windows
+    cached series are trimmed to.
+    """
+    from app.services.indicator_cache import indicator_cache
+    from app.services.lookback import lookback_policy
+    from app.services.shared_bars import shared_bars
+    return {
+        "history": {"entries": len(bar_cache)},
+        "indicator": indicator_cache.stats(),
+        "shared_bars": shared_bars.stats(),
+        "lookback": lookback_policy.stats()
+    }
+
+@router.get("/memory")
+def get_memory_usage():
+    """
+    Estimated bytes held per cache pool and per symbol (largest first)
+    against MEMORY_BUDGET_MB, process RSS, and evictions so far.
+    """
+    from app.services.memory_budget import memory_budget
+    return memory_budget.stats()
+
+@router.get("/http")
+def get_http_stats():
+    """
+    Requests and in-flight counts per upstream host (pooled sessions), and
+    recent latency per data source (hedging delays derive from the p90).
+    """
+    from app.core.http import transport
+    from app.services.hedging import latency_tracker
+    return {"hosts": transport.stats(), "sources": latency_tracker.stats()}
+
+@router.get("/scan")
+def get_scan_schedule():
+    """
+    Adaptive scan scheduling in this process: polling intervals and the
+    last cycle's due / polled / deferred counts.
+    """
+    from app.services.scan_scheduler import scan_scheduler
+    return scan_scheduler.stats()
+
+@router.get("/startup")
+def get_startup_profile():
+    """
+    Startup phase timings and the slowest imports (STARTUP_PROFILE=true).
+    """
+    return startup.report()
@@ -9,16 +9,141 @@ class Settings(BaseSettings):
     # Redis
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
+    REDIS_CONNECT_TIMEOUT: float = 0.5  # Seconds; the queue connects on first use
     
     # Email
     SMTP_HOST: str = ""
     SMTP_PORT: int = 587
     SMTP_USER: str = ""
     SMTP_PASSWORD: str = ""
+    SMTP_TIMEOUT: float = 10.0  # Seconds; the connection is kept open between sends
     
     # Telegram
     TELEGRAM_BOT_TOKEN: str = ""
     TELEGRAM_CHAT_ID: str = ""
+    TELEGRAM_TIMEOUT: float = 10.0
+    
+    # Upstream HTTP (pooled keep-alive sessions per host, see core/http.py)
+    HTTP_POOLING: bool = True
+    HTTP_MAX_PER_HOST: int = 8         # Concurrent requests and kept-alive connections per host
+    HTTP_CONNECT_TIMEOUT: float = 5.0  # Defaults for calls that do not pass a timeout
+    HTTP_READ_TIMEOUT: float = 30.0
+    
+    # Process role: all (API + scanner + worker), api (HTTP only), scanner (jobs + worker)
+    APP_ROLE: str = "all"
+    STARTUP_PROFILE: bool = False  # Log import/startup timings, see /api/system/startup
+    
+    # HTTP responses larger than this (bytes) are gzip-compressed
+    GZIP_MIN_SIZE: int = 1024
+    
+    # Chart series endpoint: upper bound on requested (downsampled) points
+    SERIES_MAX_POINTS: int = 5000
+    
+    # Observability
+    LOG_SAMPLE_RATE: float = 0.05  # Fraction of per-symbol debug lines to keep
+    
+    # Market data provider: akshare (live) or replay (recorded/synthetic, offline)
+    MARKET_DATA_PROVIDER: str = "akshare"
+    MARKET_DATA_RECORD_DIR: str = ""   # If set, fetched bars are saved here in replay layout
+    REPLAY_DATA_DIR: str = "./replay_data"
+    REPLAY_LATENCY_MS: float = 0.0     # Mean simulated latency per call
+    REPLAY_ERROR_RATE: float = 0.0     # Probability of a simulated connection error
+    REPLAY_SEED: int = 42
+    REPLAY_BARS: int = 750             # Synthetic daily bars per symbol
+    REPLAY_UNIVERSE_SIZE: int = 5000   # Synthetic symbols in spot snapshots
+    
+    # Hedged upstream requests: an alternate source is tried once the primary
+    # is slower than its recent HEDGE_PERCENTILE latency (see hedging.py)
+    HEDGE_ENABLED: bool = True
+    HEDGE_PERCENTILE: float = 0.9
+    HEDGE_MIN_DELAY: float = 0.2   # Seconds
+    HEDGE_MAX_DELAY: float = 5.0   # Also used until a source has enough samples
+    HEDGE_WINDOW: int = 200        # Latency samples kept per source
+    HEDGE_MAX_WORKERS: int = 16
+    
+    # Adaptive scan scheduling (see services/scan_scheduler.py)
+    SCAN_ADAPTIVE: bool = True
+    SCAN_INTERVAL: int = 120          # Seconds between scan cycles without adaptive scheduling
+    SCAN_MIN_INTERVAL: int = 30       # Cycle period; polling interval of near-threshold strategies
+    SCAN_MAX_INTERVAL: int = 600      # Polling interval of the farthest strategies
+    SCAN_REQUEST_BUDGET: int = 40     # Strategies polled (history requests) per cycle
+    SCAN_SAFETY_SIGMAS: float = 3.0   # RSI volatility multiples a poll interval must cover
+    
+    # Market data cache (seconds)
+    HISTORY_CACHE_TTL: int = 60           # During trading hours
+    HISTORY_CACHE_TTL_CLOSED: int = 1800  # Outside trading hours
+    
+    # History trimming: cached series keep only the bars the watched strategies'
+    # indicators need (see services/lookback.py)
+    HISTORY_TRIM: bool = True
+    LOOKBACK_TOLERANCE: float = 1e-4  # Weight of truncated history left in recursive indicators
+    LOOKBACK_MARGIN: int = 30         # Extra bars beyond the computed lookback
+    LOOKBACK_MIN_BARS: int = 120      # Smallest window kept per base series
+    
+    # Host-wide shared bar store (see services/shared_bars.py): the job process
+    # publishes bars, API workers map them. Use a tmpfs path, e.g. /dev/shm/kalert.
+    SHARED_BARS_DIR: str = ""       # Empty disables
+    SHARED_BARS_SLOTS: int = 8192   # Series (symbol x base period) the index can hold
+    
+    # Cluster cache: bars and spot snapshots shared by all nodes through Redis
+    # (see services/cluster_cache.py)
+    CLUSTER_CACHE_ENABLED: bool = False
+    CLUSTER_CACHE_TTL: int = 7 * 86400    # Redis expiry of cached values
+    CLUSTER_LOCK_TIMEOUT: float = 30.0    # Fetch lock expiry if its holder dies
+    CLUSTER_LOCK_WAIT: float = 15.0       # Longest wait for another node's fetch
+    CLUSTER_SPOT_MAX_AGE: float = 4.0     # Spot snapshot reuse window (below REALTIME_INTERVAL)
+    
+    # Global memory budget for caches and per-symbol state (see services/memory_budget.py)
+    MEMORY_BUDGET_MB: int = 512        # 0 disables eviction (usage is still reported)
+    MEMORY_LOW_WATERMARK: float = 0.8  # Evict down to this fraction of the budget
+    MEMORY_IDLE_SECONDS: int = 1800    # Symbols unused for longer are evicted first
+    MEMORY_CHECK_INTERVAL: int = 30    # Seconds between periodic budget checks
+    
+    # Indicator memoization (LRU entries)
+    INDICATOR_CACHE_SIZE: int = 4096
+    
+    # Realtime ingestion (intrabar evaluation from spot quotes)
+    REALTIME_ENABLED: bool = False
+    REALTIME_INTERVAL: int = 5       # Spot poll interval in seconds
+    REALTIME_BUFFER_SIZE: int = 720  # Ticks kept per symbol (1h at 5s)
+    
+    # Signal state machine: RSI points a value must move back past its
+    # threshold before the same side can alarm again
+    SIGNAL_HYSTERESIS: float = 5.0
+    
+    # Warm-start snapshot of in-process state (bars, signal states, symbol names)
+    SNAPSHOT_PATH: str = "./state/snapshot.pkl.gz"  # Empty disables snapshots
+    SNAPSHOT_INTERVAL: int = 300       # Seconds between periodic saves
+    SNAPSHOT_MAX_AGE: int = 7 * 86400  # Older snapshots are ignored at startup
+    
+    # Watchlist import: listed-symbol index used to validate codes
+    SYMBOL_INDEX_TTL: int = 86400  # Seconds between refreshes of the listing
+    IMPORT_MAX_ROWS: int = 5000
+    
+    # Market-wide screener (whole A-share + ETF universe)
+    SCREENER_ENABLED: bool = False
+    SCREENER_PROCESSES: int = 0            # Indicator worker processes (0 = CPU count)
+    SCREENER_FETCH_WORKERS: int = 8        # Concurrent history fetches
+    SCREENER_BATCH_SIZE: int = 200         # Symbols per process-pool task
+    SCREENER_LOOKBACK_DAYS: int = 400      # Calendar days of daily bars fetched per symbol
+    SCREENER_CLOSE_AFTER: str = "15:10"    # Daily pass runs once per trading day after this time
+    SCREENER_INTRADAY_INTERVAL: int = 0    # Seconds between intraday passes from spot quotes (0 = off)
+    
+    # Alarm queue lanes and backpressure
+    ALARM_LANE_WEIGHTS: dict = {"strong": 6, "normal": 3, "info": 1}  # Weighted fair draining
+    ALARM_USER_MAX_DEPTH: int = 20        # Pending alarms per user before the overflow policy applies
+    ALARM_BACKLOG_THRESHOLD: int = 500    # Pending alarms in total before the overflow policy applies
+    ALARM_OVERFLOW_POLICY: str = "digest" # digest (batch into one message per user) or drop
+    ALARM_DIGEST_INTERVAL: float = 60.0   # Seconds between digest deliveries
+    
+    # Notification rate limiting (per user and channel; spacing from UserNotify.notify_rate_limit)
+    NOTIFY_BURST: int = 3                  # Messages that may go out back to back
+    NOTIFY_RATE_LIMIT_DEFAULT: int = 30    # Seconds, for the global Telegram chat fallback
+    RATE_LIMIT_BACKEND: str = "memory"     # memory or redis (shared between workers)
+    
+    # Alarm history
+    ALARM_HISTORY_BATCH_SIZE: int = 50
+    ALARM_HISTORY_FLUSH_SECONDS: float = 5.0
     
     class Config:
         env_file = ".env"
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker
 from app.models import Base
 
@@ -11,6 +11,34 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def init_db():
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+    seed_versions()
+
+def seed_versions():
+    from app.services import versions
+    db = SessionLocal()
+    try:
+        versions.seed(db)
+        db.commit()
+    finally:
+        db.close()
+
+def add_missing_columns():
+    """
+    create_all does not alter existing tables; add columns introduced since
+    the database was created (new columns must be nullable or have a default).
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                col_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {col_type}'))
 
 def get_db():
     db = SessionLocal()
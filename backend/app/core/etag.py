@@ -0,0 +1,36 @@
+"""
+ETag / If-None-Match support for read endpoints.
+
+Handlers compute a validator from something cheap (a version counter, a data
+fingerprint) before building the payload:
+
+    etag = make_etag("stocks", version)
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    response.headers.update(cache_headers(etag))
+
+ETags are weak (W/"..."): responses may also be served gzip-compressed.
+"""
+import hashlib
+from fastapi import Request
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison: ignore W/ prefixes
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def cache_headers(etag: str) -> dict:
+    # Clients may cache but must revalidate every time
+    return {"ETag": etag, "Cache-Control": "no-cache"}
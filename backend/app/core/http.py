@@ -0,0 +1,104 @@
+"""
+Shared HTTP transport: one keep-alive requests.Session per upstream host.
+
+`requests.get()` / `requests.post()` open a new Session, and with it a new
+TCP/TLS connection, on every call; AkShare uses them for every request.
+`install()` routes those module-level calls through pooled per-host
+sessions, so connections are reused across symbols and cycles. Our own
+callers (notifications) use `session_for()` / `request()` directly.
+
+Per host, at most HTTP_MAX_PER_HOST requests run at once (extra callers
+wait for a slot) and the connection pool keeps as many sockets alive.
+Requests without an explicit timeout get HTTP_CONNECT_TIMEOUT /
+HTTP_READ_TIMEOUT.
+"""
+import threading
+from urllib.parse import urlsplit
+import requests
+import requests.api
+from requests.adapters import HTTPAdapter
+from app.core.config import settings
+
+_original_request = requests.api.request
+
+
+class HostPool:
+    def __init__(self, host: str, max_connections: int):
+        self.host = host
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections, pool_block=False)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.requests = 0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def request(self, method: str, url: str, **kwargs):
+        kwargs.setdefault("timeout", (settings.HTTP_CONNECT_TIMEOUT, settings.HTTP_READ_TIMEOUT))
+        with self.slots:
+            with self._lock:
+                self.requests += 1
+                self.in_flight += 1
+            try:
+                return self.session.request(method=method, url=url, **kwargs)
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {"requests": self.requests, "in_flight": self.in_flight}
+
+
+class Transport:
+    def __init__(self):
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def pool_for(self, url: str) -> HostPool:
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        pool = self._pools.get(host)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(host)
+                if pool is None:
+                    pool = self._pools[host] = HostPool(host, settings.HTTP_MAX_PER_HOST)
+        return pool
+
+    def request(self, method: str, url: str, **kwargs):
+        return self.pool_for(url).request(method, url, **kwargs)
+
+    def stats(self) -> dict:
+        return {host: pool.stats() for host, pool in sorted(self._pools.items())}
+
+    def close(self):
+        with self._lock:
+            for pool in self._pools.values():
+                pool.session.close()
+            self._pools.clear()
+
+
+transport = Transport()
+
+
+def session_for(url: str) -> requests.Session:
+    return transport.pool_for(url).session
+
+
+def request(method: str, url: str, **kwargs):
+    """Pooled drop-in for requests.request()."""
+    return transport.request(method, url, **kwargs)
+
+
+def install():
+    """
+    Route requests.get/post/... (as used by AkShare) through the shared
+    pools. Idempotent; a no-op with HTTP_POOLING disabled.
+    """
+    if settings.HTTP_POOLING:
+        requests.api.request = request
+
+
+def uninstall():
+    requests.api.request = _original_request
@@ -0,0 +1,134 @@
+"""
+Prometheus metrics for the hot paths.
+
+Every stage of the alert pipeline (upstream fetch, indicator, signal, DB,
+queue, notification) records into the histograms/counters below and the
+whole registry is served on `/metrics`.
+"""
+import random
+import time
+from contextlib import contextmanager
+from loguru import logger
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from app.core.config import settings
+
+# Upstream market data (labelled by AkShare endpoint name)
+UPSTREAM_REQUESTS = Counter(
+    "kalert_upstream_requests_total", "Upstream market data calls", ["endpoint"]
+)
+UPSTREAM_ERRORS = Counter(
+    "kalert_upstream_errors_total", "Upstream market data calls that raised", ["endpoint"]
+)
+UPSTREAM_LATENCY = Histogram(
+    "kalert_upstream_request_seconds", "Upstream market data call latency", ["endpoint"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+)
+UPSTREAM_HEDGES = Counter(
+    "kalert_upstream_hedged_total", "Hedged upstream requests by winning source", ["request", "winner"]
+)
+
+# Computation
+INDICATOR_LATENCY = Histogram(
+    "kalert_indicator_seconds", "Indicator calculation latency", ["indicator"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5)
+)
+SIGNAL_LATENCY = Histogram(
+    "kalert_signal_eval_seconds", "SignalEngine.check_signal latency",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5)
+)
+
+# Storage / queue
+DB_LATENCY = Histogram(
+    "kalert_db_seconds", "Database access latency", ["operation"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1)
+)
+QUEUE_LATENCY = Histogram(
+    "kalert_queue_op_seconds", "Alarm queue operation latency", ["operation"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2)
+)
+QUEUE_DEPTH = Gauge("kalert_queue_depth", "Pending alarms in the alarm queue")
+QUEUE_OVERFLOW = Counter(
+    "kalert_queue_overflow_total", "Alarms digested or dropped by queue backpressure", ["priority", "action"]
+)
+
+# Notifications
+NOTIFY_LATENCY = Histogram(
+    "kalert_notification_seconds", "Notification send latency", ["channel"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+)
+NOTIFY_RESULTS = Counter(
+    "kalert_notifications_total", "Notification send results", ["channel", "status"]
+)
+
+# Scanner
+SCAN_CYCLE = Histogram(
+    "kalert_scan_cycle_seconds", "Duration of a full scan_stocks cycle",
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600)
+)
+SCAN_SYMBOLS = Counter(
+    "kalert_scan_symbols_total", "Symbols processed by the scanner", ["status"]
+)
+
+SCREENER_PASS = Histogram(
+    "kalert_screener_pass_seconds", "Duration of a full-universe screener pass", ["source"],
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1200)
+)
+
+# Caches (hit rate = hit / (hit + miss))
+CACHE_REQUESTS = Counter(
+    "kalert_cache_requests_total", "Cache lookups", ["cache", "result"]
+)
+
+# Memory budget (see services/memory_budget.py)
+MEMORY_BYTES = Gauge(
+    "kalert_memory_bytes", "Estimated bytes held per accounted pool", ["pool"]
+)
+MEMORY_EVICTIONS = Counter(
+    "kalert_memory_evictions_total", "Entries evicted to stay within MEMORY_BUDGET_MB", ["pool"]
+)
+
+# Alarms
+ALARMS_PUSHED = Counter("kalert_alarms_pushed_total", "Alarms pushed to the queue")
+ALARM_LATENCY = Histogram(
+    "kalert_alarm_end_to_end_seconds", "Alarm latency from signal to delivered notification",
+    buckets=(0.5, 1, 2, 5, 10, 30, 60, 120, 300)
+)
+
+
+@contextmanager
+def track_upstream(endpoint: str):
+    """
+    Time an upstream call and count it (and its failure, if it raises).
+    """
+    UPSTREAM_REQUESTS.labels(endpoint=endpoint).inc()
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        UPSTREAM_ERRORS.labels(endpoint=endpoint).inc()
+        raise
+    finally:
+        UPSTREAM_LATENCY.labels(endpoint=endpoint).observe(time.perf_counter() - start)
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def log_sampled(message: str):
+    """
+    Debug-log a per-symbol line for only a fraction of calls.
+
+    Per-symbol INFO lines used to be emitted for every stock on every cycle,
+    which is a measurable cost with large watchlists. LOG_SAMPLE_RATE
+    controls the fraction kept (0 disables, 1 keeps everything).
+    """
+    if random.random() < settings.LOG_SAMPLE_RATE:
+        logger.opt(depth=1).debug(message)
+
+
+def render_latest():
+    """
+    Returns (body, content_type) for the Prometheus scrape endpoint.
+    """
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -1,43 +1,222 @@
 import redis
 import json
+import threading
+import time
+from datetime import datetime
 from app.core.config import settings
+from app.core.metrics import QUEUE_LATENCY, QUEUE_DEPTH, QUEUE_OVERFLOW
+
+# Priority lanes, most important first. "normal" keeps the original list
+# name so alarms queued before an upgrade are still delivered.
+LANES = {
+    "strong": "alarm_queue:strong",
+    "normal": "alarm_queue",
+    "info": "alarm_queue:info",
+}
+USER_DEPTH_KEY = "alarm_queue:user_depth"     # hash user_id -> pending alarms
+DIGEST_USERS_KEY = "alarm_queue:digest_users"  # set of users with digested alarms
+DIGEST_KEY = "alarm_queue:digest:{}"           # list of digested alarms per user
+
 
 class AlarmQueue:
+    """
+    Redis lists of pending alarms, one per priority lane (strong / normal /
+    info). Connects on first use rather than at import, with a short connect
+    timeout; after a failed connect, calls return immediately until
+    RETRY_INTERVAL has passed.
+
+    Backpressure: once a user has ALARM_USER_MAX_DEPTH pending alarms or the
+    whole queue ALARM_BACKLOG_THRESHOLD, info alarms are dropped and normal
+    ones are digested (or dropped, per ALARM_OVERFLOW_POLICY). Intrabar
+    alarms ride the info lane but are digested like normal ones: each is the
+    only alarm of its signal episode. Strong alarms are always queued.
+    """
+    RETRY_INTERVAL = 5.0
+
     def __init__(self):
+        self._client = None
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+        # Smooth weighted round-robin state per lane
+        self._credit = {lane: 0 for lane in LANES}
+
+    @property
+    def client(self):
+        if self._client is None and time.time() >= self._retry_at:
+            with self._lock:
+                if self._client is None and time.time() >= self._retry_at:
+                    self._client = self._connect()
+        return self._client
+
+    def _connect(self):
         try:
-            self.client = redis.Redis(
+            client = redis.Redis(
                 host=settings.REDIS_HOST,
                 port=settings.REDIS_PORT,
                 db=0,
-                decode_responses=True
+                decode_responses=True,
+                socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT
             )
             # Test connection
-            self.client.ping()
+            client.ping()
+            return client
         except Exception as e:
             print(f"Redis connection failed: {e}")
-            self.client = None
+            self._retry_at = time.time() + self.RETRY_INTERVAL
+            return None
+
+    @staticmethod
+    def _lane(alarm_data: dict) -> str:
+        priority = alarm_data.get("priority")
+        return priority if priority in LANES else "normal"
+
+    def _overflow_action(self, lane: str, user_depth: int, total_depth: int, intrabar: bool = False):
+        """
+        None to enqueue, else "digest" or "drop".
+        """
+        if lane == "strong":
+            return None
+        if user_depth < settings.ALARM_USER_MAX_DEPTH and total_depth < settings.ALARM_BACKLOG_THRESHOLD:
+            return None
+        if (lane == "info" and not intrabar) or settings.ALARM_OVERFLOW_POLICY == "drop":
+            return "drop"
+        return "digest"
 
     def push_alarm(self, alarm_data: dict):
+        """
+        Queue an alarm in its priority lane. Returns False if it was dropped
+        or Redis is unavailable.
+        """
         if not self.client:
             return False
         try:
-            self.client.lpush("alarm_queue", json.dumps(alarm_data))
+            lane = self._lane(alarm_data)
+            user = str(alarm_data.get("user_id"))
+            alarm_data.setdefault("stages", {})["enqueued"] = time.time()
+            with QUEUE_LATENCY.labels(operation="push").time():
+                pipe = self.client.pipeline(transaction=False)
+                pipe.hget(USER_DEPTH_KEY, user)
+                for key in LANES.values():
+                    pipe.llen(key)
+                user_depth, *lane_depths = pipe.execute()
+
+                action = self._overflow_action(lane, int(user_depth or 0), sum(lane_depths),
+                                               intrabar=bool(alarm_data.get("intrabar")))
+                if action == "drop":
+                    QUEUE_OVERFLOW.labels(priority=lane, action="drop").inc()
+                    print(f"Alarm dropped by backpressure: {alarm_data.get('stock_code')} ({lane})")
+                    return False
+
+                payload = json.dumps(alarm_data)
+                pipe = self.client.pipeline(transaction=False)
+                if action == "digest":
+                    QUEUE_OVERFLOW.labels(priority=lane, action="digest").inc()
+                    pipe.lpush(DIGEST_KEY.format(user), payload)
+                    pipe.sadd(DIGEST_USERS_KEY, user)
+                else:
+                    pipe.lpush(LANES[lane], payload)
+                    pipe.hincrby(USER_DEPTH_KEY, user, 1)
+                pipe.execute()
             return True
         except Exception as e:
             print(f"Failed to push alarm: {e}")
             return False
 
+    def _next_lane(self, ready: list) -> str:
+        """
+        Smooth weighted round-robin over the non-empty lanes: with weights
+        6/3/1 a sustained backlog drains strong:normal:info as 6:3:1, and no
+        lane with pending alarms is starved.
+        """
+        weights = settings.ALARM_LANE_WEIGHTS
+        total = 0
+        best = None
+        for lane in ready:
+            weight = max(1, int(weights.get(lane, 1)))
+            self._credit[lane] += weight
+            total += weight
+            if best is None or self._credit[lane] > self._credit[best]:
+                best = lane
+        self._credit[best] -= total
+        return best
+
     def pop_alarm(self):
         if not self.client:
             return None
         try:
-            # brpop returns tuple (key, value)
-            item = self.client.brpop("alarm_queue", timeout=1)
-            if item:
-                return json.loads(item[1])
+            # Note: latency includes the blocking wait when the queue is empty
+            with QUEUE_LATENCY.labels(operation="pop").time():
+                pipe = self.client.pipeline(transaction=False)
+                for key in LANES.values():
+                    pipe.llen(key)
+                depths = pipe.execute()
+                ready = [lane for lane, depth in zip(LANES, depths) if depth]
+                if ready:
+                    raw = self.client.rpop(LANES[self._next_lane(ready)])
+                else:
+                    # All lanes empty: block on all of them (brpop checks in order)
+                    item = self.client.brpop(list(LANES.values()), timeout=1)
+                    raw = item[1] if item else None
+            if raw:
+                alarm = json.loads(raw)
+                alarm.setdefault("stages", {})["dequeued"] = time.time()
+                self._release(alarm.get("user_id"))
+                return alarm
             return None
         except Exception as e:
             print(f"Failed to pop alarm: {e}")
             return None
 
+    def _release(self, user_id):
+        user = str(user_id)
+        if self.client.hincrby(USER_DEPTH_KEY, user, -1) < 0:
+            # Drift (e.g. alarms queued before depth tracking); clamp at zero
+            self.client.hset(USER_DEPTH_KEY, user, 0)
+
+    def pop_digests(self) -> list:
+        """
+        Collect digested alarms into one digest alarm per user:
+        {"user_id", "digest": True, "items": [...], "time", "stages"}.
+        """
+        if not self.client:
+            return []
+        digests = []
+        try:
+            for user in self.client.smembers(DIGEST_USERS_KEY):
+                key = DIGEST_KEY.format(user)
+                pipe = self.client.pipeline(transaction=True)
+                pipe.lrange(key, 0, -1)
+                pipe.delete(key)
+                pipe.srem(DIGEST_USERS_KEY, user)
+                raw_items, _, _ = pipe.execute()
+                if not raw_items:
+                    continue
+                # lpush order -> oldest last
+                items = [json.loads(raw) for raw in reversed(raw_items)]
+                digests.append({
+                    "user_id": items[0].get("user_id"),
+                    "digest": True,
+                    "priority": "normal",
+                    "items": items,
+                    "time": datetime.now().isoformat(),
+                    "stages": {"dequeued": time.time()}
+                })
+        except Exception as e:
+            print(f"Failed to collect digests: {e}")
+        return digests
+
+    def depth(self) -> int:
+        """Number of pending alarms (0 if Redis is unavailable or not connected yet)."""
+        if not self._client:
+            return 0
+        try:
+            pipe = self._client.pipeline(transaction=False)
+            for key in LANES.values():
+                pipe.llen(key)
+            return int(sum(pipe.execute()))
+        except Exception:
+            return 0
+
 alarm_queue = AlarmQueue()
+# Sampled on scrape instead of on every push/pop
+QUEUE_DEPTH.set_function(alarm_queue.depth)
@@ -9,7 +9,7 @@ def start_scheduler():
         scheduler.start()
         atexit.register(lambda: scheduler.shutdown())
 
-def add_job(func, seconds=60, args=None, id=None, jitter=3):
+def add_job(func, seconds=60, args=None, id=None, jitter=3, max_instances=3):
     """
     Add a scheduled job with jitter to avoid pattern detection.
     
@@ -20,6 +20,7 @@ def add_job(func, seconds=60, args=None, id=None, jitter=3):
         id: Unique job identifier
         jitter: Random variation in seconds (±jitter). Default is 3 seconds.
                 For example, with seconds=15 and jitter=3, actual interval will be 12-18 seconds.
+        max_instances: Maximum concurrently running instances of the job.
     """
     scheduler.add_job(
         func,
@@ -27,5 +28,5 @@ def add_job(func, seconds=60, args=None, id=None, jitter=3):
         args=args,
         id=id,
         replace_existing=True,
-        max_instances=3  # Allow up to 3 overlapping instances to prevent skipping
+        max_instances=max_instances  # Default 3 overlapping instances to prevent skipping
     )
@@ -0,0 +1,107 @@
+"""
+Startup profiling and lazy imports.
+
+With STARTUP_PROFILE=true, `install()` (called first thing in app.main)
+times every first-time module import, inclusive of the modules it pulls in,
+and `phase()` times named startup steps. `report()` summarizes both; it is
+logged when startup completes and served at GET /api/system/startup.
+"""
+import builtins
+import importlib
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from loguru import logger
+from app.core.config import settings
+
+_started = time.perf_counter()
+_imports = {}  # module -> seconds (inclusive)
+_phases = {}   # phase -> seconds
+_original_import = builtins.__import__
+_lock = threading.Lock()
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level or name in _imports or name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+    start = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        _imports.setdefault(name, time.perf_counter() - start)
+
+
+def install():
+    """
+    Start timing imports if STARTUP_PROFILE is set.
+    """
+    if settings.STARTUP_PROFILE and builtins.__import__ is _original_import:
+        builtins.__import__ = _timed_import
+
+
+def uninstall():
+    builtins.__import__ = _original_import
+
+
+@contextmanager
+def phase(name: str):
+    """
+    Time a named startup step (recorded whether or not profiling is on).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases[name] = time.perf_counter() - start
+
+
+def report(top: int = 15) -> dict:
+    """
+    Phase timings and the slowest top-level / app imports.
+    """
+    slowest = sorted(
+        ((name, seconds) for name, seconds in _imports.items()
+         if "." not in name or name.startswith("app.")),
+        key=lambda item: item[1], reverse=True
+    )[:top]
+    return {
+        "profiling": settings.STARTUP_PROFILE,
+        "role": settings.APP_ROLE,
+        "uptime_seconds": round(time.perf_counter() - _started, 3),
+        "phases": {name: round(seconds, 4) for name, seconds in _phases.items()},
+        "slowest_imports": [{"module": name, "seconds": round(seconds, 4)} for name, seconds in slowest],
+    }
+
+
+def log_report():
+    if not settings.STARTUP_PROFILE:
+        return
+    profile = report()
+    lines = [f"  {name:<32} {seconds * 1000:8.1f} ms" for name, seconds in profile["phases"].items()]
+    lines += [f"  import {entry['module']:<25} {entry['seconds'] * 1000:8.1f} ms"
+              for entry in profile["slowest_imports"]]
+    logger.info(f"Startup profile (role={profile['role']}):\n" + "\n".join(lines))
+
+
+class _LazyModule:
+    """
+    Module proxy that imports on first attribute access.
+    """
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            with _lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+def lazy_import(name: str):
+    """
+    Defer importing a heavy dependency until it is first used.
+    """
+    return _LazyModule(name)
@@ -1,10 +1,15 @@
-from fastapi import FastAPI
+from app.core import startup
+# Before anything else, so STARTUP_PROFILE sees every import
+startup.install()
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from app.core.database import init_db
 from app.core.scheduler import start_scheduler, add_job
-from app.services.scanner import scan_stocks
-from app.services.worker import process_alarms
-from app.api import stocks, strategies, notifications
+from app.core.metrics import render_latest
+from app.core.config import settings
+from app.api import stocks, strategies, notifications, alarms, system, screener
 import threading
 
 app = FastAPI(title="Stock Monitor API")
@@ -16,24 +21,96 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
+# Compress larger JSON payloads (lists, alarm history, screener results)
+app.add_middleware(GZipMiddleware, minimum_size=settings.GZIP_MIN_SIZE)
 
 # Include routers
 app.include_router(stocks.router, prefix="/api/stock", tags=["stocks"])
 app.include_router(strategies.router, prefix="/api/strategies", tags=["strategies"])
 app.include_router(notifications.router, prefix="/api/notifications", tags=["notifications"])
+app.include_router(alarms.router, prefix="/api/alarms", tags=["alarms"])
+app.include_router(system.router, prefix="/api/system", tags=["system"])
+app.include_router(screener.router, prefix="/api/screener", tags=["screener"])
+
+def runs_jobs() -> bool:
+    """
+    Whether this process runs the scanner, realtime and worker (APP_ROLE).
+    The analytics stack (pandas, pandas_ta, akshare) is only imported if so.
+    """
+    return settings.APP_ROLE in ("all", "scanner")
 
 @app.on_event("startup")
 def startup_event():
-    init_db()
+    with startup.phase("init_db"):
+        init_db()
+    if runs_jobs():
+        with startup.phase("start_jobs"):
+            start_jobs()
+    startup.log_report()
+    startup.uninstall()
+
+def start_jobs():
+    from app.services.scanner import scan_stocks
+    from app.services.worker import process_alarms
+    from app.services.realtime import realtime_ingestor
+    from app.services.snapshot import load_snapshot, save_snapshot_job
+
+    # This process fetches bars: publish them to the other processes on the host
+    if settings.SHARED_BARS_DIR:
+        from app.services.shared_bars import shared_bars
+        with startup.phase("shared_bars"):
+            shared_bars.create()
+    
+    # Warm start: restore cached bars and signal states before the first scan
+    with startup.phase("load_snapshot"):
+        load_snapshot()
     start_scheduler()
-    # Add scanner job (every 120 seconds with randomization in scanner)
-    add_job(scan_stocks, seconds=120, id="scan_stocks")
+    # Add scanner job. With adaptive scheduling each cycle polls only the
+    # strategies that are due, so cycles run at the shortest polling interval.
+    if settings.SCAN_ADAPTIVE:
+        add_job(scan_stocks, seconds=settings.SCAN_MIN_INTERVAL, id="scan_stocks", max_instances=1)
+    else:
+        add_job(scan_stocks, seconds=settings.SCAN_INTERVAL, id="scan_stocks")
+    
+    # Realtime intrabar evaluation from spot quotes (only acts during trading hours)
+    if settings.REALTIME_ENABLED:
+        add_job(realtime_ingestor.poll_once, seconds=settings.REALTIME_INTERVAL,
+                id="realtime_ingest", jitter=1, max_instances=1)
+    
+    if settings.SCREENER_ENABLED:
+        from app.services.screener import screener_close_job, screener_intraday_job
+        add_job(screener_close_job, seconds=600, id="screener_close", jitter=30, max_instances=1)
+        if settings.SCREENER_INTRADAY_INTERVAL > 0:
+            add_job(screener_intraday_job, seconds=settings.SCREENER_INTRADAY_INTERVAL,
+                    id="screener_intraday", jitter=5, max_instances=1)
+    
+    # Evict cold cache entries when over MEMORY_BUDGET_MB (inserts also check)
+    if settings.MEMORY_BUDGET_MB > 0:
+        from app.services.memory_budget import memory_budget
+        add_job(memory_budget.enforce, seconds=settings.MEMORY_CHECK_INTERVAL, id="memory_budget",
+                max_instances=1)
+    
+    if settings.SNAPSHOT_PATH and settings.SNAPSHOT_INTERVAL > 0:
+        add_job(save_snapshot_job, seconds=settings.SNAPSHOT_INTERVAL, id="save_snapshot", max_instances=1)
     
     # Start worker in a separate thread
     worker_thread = threading.Thread(target=process_alarms, daemon=True)
     worker_thread.start()
 
+@app.on_event("shutdown")
+def shutdown_event():
+    if runs_jobs():
+        from app.services.snapshot import save_snapshot_job
+        save_snapshot_job()
+
 @app.get("/")
 def read_root():
     return {"message": "Stock Monitor API is running"}
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Prometheus scrape endpoint."""
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, func
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Index, func
 from sqlalchemy.orm import DeclarativeBase
 
 class Base(DeclarativeBase):
@@ -27,9 +27,42 @@ class UserStrategy(Base):
     enable_push = Column(Boolean, default=True)
     enable_trend_filter = Column(Boolean, default=False)
     enable_volatility_filter = Column(Boolean, default=False)
+    buy_rule = Column(String, nullable=True) # rule DSL, e.g. "rsi(14) < 30 and macd_hist > 0"
+    sell_rule = Column(String, nullable=True)
     last_notify_time = Column(DateTime, nullable=True)
-    cooldown_period = Column(Integer, default=30) # minutes
+    cooldown_period = Column(Integer, default=30) # minutes (legacy: alarms are edge-triggered now)
+    signal_state = Column(String, default="idle") # idle, armed, fired, reset (see signal_state.py)
+    signal_side = Column(String, nullable=True) # buy, sell
+    signal_state_at = Column(DateTime, nullable=True)
     
+class ScreenerResult(Base):
+    __tablename__ = "screener_results"
+    # One row per listed symbol, replaced on every screener pass (see screener.py)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    stock_code = Column(String, unique=True, index=True)
+    stock_name = Column(String)
+    stock_type = Column(String, index=True) # stock, etf
+    bar_date = Column(String) # YYYY-MM-DD of the last bar
+    source = Column(String) # close (daily bars) or intraday (spot price as the last bar)
+    price = Column(Float)
+    change_pct = Column(Float, index=True)
+    rsi6 = Column(Float, index=True)
+    rsi14 = Column(Float, index=True)
+    ma20 = Column(Float)
+    ma60 = Column(Float)
+    bb_lower = Column(Float)
+    bb_mid = Column(Float)
+    bb_upper = Column(Float)
+    updated_at = Column(DateTime, default=func.now())
+
+class ResourceVersion(Base):
+    __tablename__ = "resource_versions"
+    # Counters bumped on every write to a resource; ETags of read endpoints derive from them
+    
+    name = Column(String, primary_key=True) # stocks, strategies
+    version = Column(Integer, default=0)
+
 class UserNotify(Base):
     __tablename__ = "user_notifies"
     
@@ -38,3 +71,30 @@ class UserNotify(Base):
     telegram_id = Column(String, nullable=True)
     email = Column(String, nullable=True)
     notify_rate_limit = Column(Integer, default=30) # seconds
+
+class AlarmEvent(Base):
+    __tablename__ = "alarm_events"
+    # Composite indexes back the keyset-paginated history queries
+    __table_args__ = (
+        Index("ix_alarm_events_user_created", "user_id", "created_at", "id"),
+        Index("ix_alarm_events_stock_created", "stock_code", "created_at", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, default=1)
+    stock_code = Column(String)
+    stock_name = Column(String)
+    signal_type = Column(String) # buy, sell
+    priority = Column(String, nullable=True) # strong, normal, info
+    reason = Column(String)
+    value = Column(Float)
+    threshold = Column(Float)
+    price = Column(Float)
+    created_at = Column(DateTime, default=func.now(), index=True)
+    # Stage timestamps (epoch seconds, wall clock since stages span processes)
+    data_asof_ts = Column(Float, nullable=True) # close time of the bar the signal was computed on
+    computed_ts = Column(Float, nullable=True)
+    enqueued_ts = Column(Float, nullable=True)
+    dequeued_ts = Column(Float, nullable=True)
+    telegram_sent_ts = Column(Float, nullable=True)
+    email_sent_ts = Column(Float, nullable=True)
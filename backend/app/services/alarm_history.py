@@ -0,0 +1,250 @@
+"""
+Alarm history: batched persistence, keyset-paginated queries and stage
+latency statistics.
+
+Each alarm carries a `stages` dict of epoch timestamps stamped along the
+pipeline: data_asof (bar close) and computed (scanner), enqueued / dequeued
+(AlarmQueue), sent_telegram / sent_email (worker).
+"""
+import base64
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import insert, or_, and_, func
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models import AlarmEvent
+
+# Newest events the latency report reads at most
+LATENCY_MAX_EVENTS = 50000
+# Stage name -> (start column, end column)
+STAGES = {
+    "data_age": ("data_asof_ts", "computed_ts"),
+    "enqueue": ("computed_ts", "enqueued_ts"),
+    "queue_wait": ("enqueued_ts", "dequeued_ts"),
+    "send_telegram": ("dequeued_ts", "telegram_sent_ts"),
+    "send_email": ("dequeued_ts", "email_sent_ts"),
+}
+
+
+def alarm_to_row(alarm: dict) -> dict:
+    """
+    Column mapping for an AlarmEvent row from a processed alarm dict.
+    """
+    stages = alarm.get("stages") or {}
+    try:
+        created_at = datetime.fromisoformat(alarm["time"])
+    except (KeyError, TypeError, ValueError):
+        created_at = datetime.now()
+    return {
+        "user_id": alarm.get("user_id"),
+        "stock_code": alarm.get("stock_code"),
+        "stock_name": alarm.get("stock_name"),
+        "signal_type": alarm.get("signal_type"),
+        "priority": alarm.get("priority"),
+        "reason": alarm.get("reason"),
+        "value": alarm.get("value"),
+        "threshold": alarm.get("threshold"),
+        "price": alarm.get("price"),
+        "created_at": created_at,
+        "data_asof_ts": stages.get("data_asof"),
+        "computed_ts": stages.get("computed"),
+        "enqueued_ts": stages.get("enqueued"),
+        "dequeued_ts": stages.get("dequeued"),
+        "telegram_sent_ts": stages.get("sent_telegram"),
+        "email_sent_ts": stages.get("sent_email"),
+    }
+
+
+class AlarmHistoryWriter:
+    """
+    Buffers alarm rows and writes them with one executemany INSERT per batch.
+
+    A batch is flushed once it reaches ALARM_HISTORY_BATCH_SIZE rows or the
+    oldest buffered row is ALARM_HISTORY_FLUSH_SECONDS old, whichever comes first.
+    """
+    def __init__(self, batch_size: int = None, flush_seconds: float = None):
+        self.batch_size = batch_size or settings.ALARM_HISTORY_BATCH_SIZE
+        self.flush_seconds = flush_seconds if flush_seconds is not None else settings.ALARM_HISTORY_FLUSH_SECONDS
+        self._rows = []
+        self._first_added = None
+        self._lock = threading.Lock()
+
+    def add(self, alarm: dict):
+        with self._lock:
+            if not self._rows:
+                self._first_added = time.monotonic()
+            self._rows.append(alarm_to_row(alarm))
+
+    def pending(self) -> int:
+        return len(self._rows)
+
+    def due(self) -> bool:
+        if not self._rows:
+            return False
+        return (len(self._rows) >= self.batch_size
+                or time.monotonic() - self._first_added >= self.flush_seconds)
+
+    def maybe_flush(self, db: Session) -> int:
+        return self.flush(db) if self.due() else 0
+
+    def flush(self, db: Session) -> int:
+        """
+        Write all buffered rows in a single transaction. Returns rows written.
+        On failure the rows are put back so the next flush retries them.
+        """
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if not rows:
+            return 0
+        try:
+            db.execute(insert(AlarmEvent), rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            with self._lock:
+                self._rows = rows + self._rows
+                self._first_added = time.monotonic()
+            raise
+        return len(rows)
+
+
+history_writer = AlarmHistoryWriter()
+
+
+def encode_cursor(created_at: datetime, event_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{event_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str):
+    """
+    Returns (created_at, id). Raises ValueError on a malformed cursor.
+    """
+    try:
+        created_at, event_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(event_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def query_page(db: Session, user_id: int = None, stock_code: str = None,
+               since: datetime = None, until: datetime = None,
+               cursor: str = None, limit: int = 50):
+    """
+    One page of alarm events, newest first, using keyset pagination on
+    (created_at, id) so deep pages cost the same as the first one.
+    Returns (events, next_cursor).
+    """
+    query = db.query(AlarmEvent)
+    if user_id is not None:
+        query = query.filter(AlarmEvent.user_id == user_id)
+    if stock_code:
+        query = query.filter(AlarmEvent.stock_code == stock_code)
+    if since:
+        query = query.filter(AlarmEvent.created_at >= since)
+    if until:
+        query = query.filter(AlarmEvent.created_at < until)
+    if cursor:
+        cursor_time, cursor_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            AlarmEvent.created_at < cursor_time,
+            and_(AlarmEvent.created_at == cursor_time, AlarmEvent.id < cursor_id)
+        ))
+    events = query.order_by(AlarmEvent.created_at.desc(), AlarmEvent.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(events) > limit:
+        events = events[:limit]
+        next_cursor = encode_cursor(events[-1].created_at, events[-1].id)
+    return events, next_cursor
+
+
+def daily_counts(db: Session, since: datetime, user_id: int = None, stock_code: str = None):
+    """
+    Alarm counts grouped by symbol, day and signal type.
+    """
+    day = func.date(AlarmEvent.created_at)
+    query = db.query(
+        AlarmEvent.stock_code, day.label("day"), AlarmEvent.signal_type, func.count(AlarmEvent.id)
+    ).filter(AlarmEvent.created_at >= since)
+    if user_id is not None:
+        query = query.filter(AlarmEvent.user_id == user_id)
+    if stock_code:
+        query = query.filter(AlarmEvent.stock_code == stock_code)
+    rows = query.group_by(AlarmEvent.stock_code, day, AlarmEvent.signal_type) \
+        .order_by(day.desc(), AlarmEvent.stock_code).all()
+    return [
+        {"stock_code": code, "day": str(d), "signal_type": signal_type, "count": count}
+        for code, d, signal_type, count in rows
+    ]
+
+
+def _end_to_end(computed: float, *sent: float):
+    sent = [ts for ts in sent if ts]
+    if not sent or not computed:
+        return None
+    return max(sent) - computed
+
+
+def end_to_end_seconds(alarm: dict):
+    """
+    Seconds from signal computation to the last successful delivery, or None.
+    """
+    stages = alarm.get("stages") or {}
+    return _end_to_end(stages.get("computed"), stages.get("sent_telegram"), stages.get("sent_email"))
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """
+    Linear-interpolated percentile (q in 0..100) of an already sorted list.
+    """
+    if not sorted_values:
+        return None
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    pos = (len(sorted_values) - 1) * q / 100.0
+    lower = int(pos)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    frac = pos - lower
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * frac
+
+
+def latency_rows(db: Session, since: datetime, stock_code: str = None, limit: int = LATENCY_MAX_EVENTS) -> list:
+    """
+    Stage timestamp columns (not whole events) of the newest alarms since
+    `since`, at most `limit` of them.
+    """
+    columns = sorted({col for pair in STAGES.values() for col in pair})
+    query = db.query(*(getattr(AlarmEvent, col) for col in columns)).filter(AlarmEvent.created_at >= since)
+    if stock_code:
+        query = query.filter(AlarmEvent.stock_code == stock_code)
+    return query.order_by(AlarmEvent.created_at.desc()).limit(limit).all()
+
+
+def stage_latency_stats(events: list) -> dict:
+    """
+    p50/p95/p99 (seconds) per pipeline stage, plus end-to-end
+    (computed -> last delivery), over AlarmEvent rows (or latency_rows).
+    """
+    samples = {name: [] for name in STAGES}
+    samples["end_to_end"] = []
+    for event in events:
+        for name, (start_col, end_col) in STAGES.items():
+            start, end = getattr(event, start_col), getattr(event, end_col)
+            if start is not None and end is not None:
+                samples[name].append(end - start)
+        latency = _end_to_end(event.computed_ts, event.telegram_sent_ts, event.email_sent_ts)
+        if latency is not None:
+            samples["end_to_end"].append(latency)
+
+    stats = {}
+    for name, values in samples.items():
+        values.sort()
+        stats[name] = {
+            "count": len(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+        }
+    return stats
@@ -0,0 +1,160 @@
+"""
+In-process cache of history DataFrames keyed by (stock_code, period, stock_type).
+
+Entries are considered fresh for HISTORY_CACHE_TTL seconds during trading
+hours (the last bar is still moving) and HISTORY_CACHE_TTL_CLOSED otherwise.
+Cached frames are shared between callers and must be treated as read-only.
+Entry sizes count against the global memory budget (see memory_budget.py).
+"""
+import threading
+import time
+from app.core.config import settings
+from app.core.metrics import record_cache
+from app.services.memory_budget import estimate_bytes, memory_budget
+from app.services.trading_hours import TradingHours
+
+# Eviction cost relative to other pools: a series is refetched upstream
+EVICTION_COST = 1.0
+
+
+class BarCache:
+    def __init__(self):
+        # key -> {"df": DataFrame, "fetched_at": epoch, "source": base DataFrame,
+        #         "nbytes": estimated size, "used_at": epoch of the last hit}
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(stock_code: str, period: str, stock_type: str = "stock"):
+        return (stock_code, str(period), stock_type)
+
+    @staticmethod
+    def ttl() -> float:
+        if TradingHours.is_trading_time(include_call_auction=True):
+            return settings.HISTORY_CACHE_TTL
+        return settings.HISTORY_CACHE_TTL_CLOSED
+
+    def get(self, key, max_age: float = None):
+        """
+        Return the cached DataFrame if present and fresh, else None. With
+        SHARED_BARS_DIR set, a local miss is looked up in the host-wide
+        shared store (see shared_bars.py) before giving up.
+        """
+        max_age = self.ttl() if max_age is None else max_age
+        entry = self._entries.get(key)
+        hit = entry is not None and time.time() - entry["fetched_at"] <= max_age
+        if not hit and settings.SHARED_BARS_DIR:
+            entry = self._from_shared(key, max_age) or entry
+            hit = entry is not None and time.time() - entry["fetched_at"] <= max_age
+        record_cache("history", hit)
+        if not hit:
+            return None
+        entry["used_at"] = time.time()
+        return entry["df"]
+
+    def _from_shared(self, key, max_age: float):
+        from app.services.shared_bars import shared_bars
+        found = shared_bars.get(key)
+        if found is None or time.time() - found[1] > max_age:
+            return None
+        df, fetched_at = found
+        df.attrs.update(symbol=key[0], period=key[1], stock_type=key[2])
+        entry = self._entry(df, fetched_at)
+        with self._lock:
+            self._entries[key] = entry
+        return entry
+
+    def peek(self, key):
+        """
+        Return the raw entry regardless of age (or None), without counting a lookup.
+        """
+        return self._entries.get(key)
+
+    def get_derived(self, key, source):
+        """
+        Return a cached derived (resampled) frame if it was built from `source`,
+        i.e. the base series has not been refreshed since.
+        """
+        entry = self._entries.get(key)
+        hit = entry is not None and entry.get("source") is source
+        record_cache("resampled", hit)
+        if not hit:
+            return None
+        entry["used_at"] = time.time()
+        return entry["df"]
+
+    def put(self, key, df, source=None, fetched_at: float = None):
+        """
+        Cache `df` and return the frame now cached: in the shared store's
+        writer, base series are published and replaced by their shared view.
+        `fetched_at` defaults to now; pass it for data fetched earlier
+        elsewhere (e.g. by another node).
+        """
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        if source is None and settings.SHARED_BARS_DIR:
+            from app.services.shared_bars import shared_bars
+            df = shared_bars.publish(key, df, fetched_at=fetched_at)
+        entry = self._entry(df, fetched_at, source)
+        with self._lock:
+            previous = self._entries.get(key)
+            self._entries[key] = entry
+        memory_budget.note(entry["nbytes"] - (previous["nbytes"] if previous else 0))
+        return df
+
+    @staticmethod
+    def _entry(df, fetched_at: float, source=None, used_at: float = None) -> dict:
+        return {"df": df, "fetched_at": fetched_at, "source": source, "nbytes": estimate_bytes(df),
+                "used_at": time.time() if used_at is None else used_at}
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+        if settings.SHARED_BARS_DIR:
+            from app.services.shared_bars import shared_bars
+            shared_bars.remove(key)
+
+    def export(self) -> list:
+        """
+        (key, df, fetched_at) for base series; derived frames are rebuilt on demand.
+        """
+        with self._lock:
+            return [(key, e["df"], e["fetched_at"]) for key, e in self._entries.items() if e.get("source") is None]
+
+    def restore(self, entries: list):
+        """
+        Load exported entries, keeping their original fetch times so they are
+        refreshed (tail only) on first use. Existing entries win.
+        """
+        with self._lock:
+            for key, df, fetched_at in entries:
+                # Unused since the restart until a lookup hits it
+                self._entries.setdefault(key, self._entry(df, fetched_at, used_at=fetched_at))
+
+    def memory_entries(self) -> list:
+        with self._lock:
+            return [(key, key[0], key[1], e["nbytes"], e["used_at"]) for key, e in self._entries.items()]
+
+    def evict(self, key) -> int:
+        """
+        Drop an entry (and frames resampled from it, which keep it alive)
+        from this process only. Returns the bytes freed.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return 0
+            derived = [k for k, e in self._entries.items() if e.get("source") is entry["df"]]
+            return entry["nbytes"] + sum(self._entries.pop(k)["nbytes"] for k in derived)
+
+    def keys(self):
+        return list(self._entries.keys())
+
+    def __len__(self):
+        return len(self._entries)
+
+
+bar_cache = BarCache()
+memory_budget.register("bars", bar_cache, cost=EVICTION_COST)
@@ -0,0 +1,325 @@
+"""
+Cluster-wide cache of market data in Redis (L2) behind each process's
+in-memory caches (L1: bar_cache), so that several hosts make one upstream
+request per symbol and bar instead of one each.
+
+On an L1 miss, `bars()` reads the series from Redis. If it is missing or
+older than the caller's max_age, one node takes a fetch lock
+(SET NX with expiry), fetches upstream, writes the result to Redis and
+publishes the key on BARS_CHANNEL. Other nodes that want the same key wait
+for the result instead of fetching themselves, up to CLUSTER_LOCK_WAIT
+seconds. Within a process, concurrent callers for one key share a single
+flight before any of this happens.
+
+Subscribers drop their L1 entry for a published key, so their next read
+picks up the new bars from Redis instead of serving their older copy until
+it expires.
+
+Values are compact binary (zlib-compressed little-endian arrays, see
+encode_bars / encode_spot). The whole-market spot snapshot is shared the
+same way, without L1 or invalidation.
+
+If Redis is unreachable, callers fetch upstream directly, as without the
+cluster cache.
+"""
+import struct
+import threading
+import time
+import uuid
+import zlib
+import numpy as np
+import pandas as pd
+import redis
+from redis.backoff import NoBackoff
+from redis.retry import Retry
+from loguru import logger
+from app.core.config import settings
+from app.core.metrics import record_cache
+from app.services.resample import BAR_COLUMNS
+
+BARS_KEY = "bars:{}"
+BARS_LOCK_KEY = "bars_lock:{}"
+SPOT_KEY = "spot:{}"
+SPOT_LOCK_KEY = "spot_lock:{}"
+BARS_CHANNEL = "bars_invalidate"
+
+BARS_MAGIC = b"KB1"
+SPOT_MAGIC = b"KS1"
+SPOT_FIELDS = ("price", "open", "high", "low", "volume")
+VALUE_COLUMNS = BAR_COLUMNS[1:]
+# Seconds between polls of Redis while another node fetches
+WAIT_POLL = 0.05
+
+# KEYS[1] lock; ARGV[1] token. Deletes the lock only if this node still holds it.
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def encode_bars(df: pd.DataFrame, fetched_at: float) -> bytes:
+    dates = pd.to_datetime(df["date"]).to_numpy(dtype="datetime64[ns]").view("<i8")
+    values = df[VALUE_COLUMNS].to_numpy(dtype="<f8").T
+    body = np.ascontiguousarray(dates).tobytes() + np.ascontiguousarray(values).tobytes()
+    return BARS_MAGIC + struct.pack("<dI", fetched_at, len(df)) + zlib.compress(body, 1)
+
+
+def decode_bars(blob: bytes) -> tuple:
+    """(DataFrame, fetched_at) from encode_bars output."""
+    if blob[:3] != BARS_MAGIC:
+        raise ValueError("Not an encoded bar series")
+    fetched_at, rows = struct.unpack_from("<dI", blob, 3)
+    body = zlib.decompress(blob[15:])
+    dates = np.frombuffer(body, dtype="<i8", count=rows).view("datetime64[ns]")
+    values = np.frombuffer(body, dtype="<f8", offset=rows * 8).reshape(len(VALUE_COLUMNS), rows)
+    df = pd.DataFrame(values.T, columns=VALUE_COLUMNS)
+    df.insert(0, "date", dates)
+    return df, fetched_at
+
+
+def encode_spot(quotes: dict, fetched_at: float) -> bytes:
+    codes = list(quotes)
+    text = "\n".join(f"{code}\t{quotes[code].get('name') or ''}" for code in codes).encode()
+    values = np.array(
+        [[np.nan if quotes[code].get(field) is None else quotes[code][field] for code in codes]
+         for field in SPOT_FIELDS],
+        dtype="<f8",
+    )
+    body = struct.pack("<I", len(text)) + text + values.tobytes()
+    return SPOT_MAGIC + struct.pack("<dI", fetched_at, len(codes)) + zlib.compress(body, 1)
+
+
+def decode_spot(blob: bytes) -> tuple:
+    """({code: quote}, fetched_at) from encode_spot output."""
+    if blob[:3] != SPOT_MAGIC:
+        raise ValueError("Not an encoded spot snapshot")
+    fetched_at, count = struct.unpack_from("<dI", blob, 3)
+    body = zlib.decompress(blob[15:])
+    (text_len,) = struct.unpack_from("<I", body)
+    lines = body[4:4 + text_len].decode().split("\n") if count else []
+    values = np.frombuffer(body, dtype="<f8", offset=4 + text_len).reshape(len(SPOT_FIELDS), count)
+    quotes = {}
+    for i, line in enumerate(lines):
+        code, name = line.split("\t", 1)
+        quote = {"name": name}
+        for j, field in enumerate(SPOT_FIELDS):
+            value = values[j, i]
+            quote[field] = None if np.isnan(value) else float(value)
+        quotes[code] = quote
+    return quotes, fetched_at
+
+
+def _valid(value) -> bool:
+    if value is None:
+        return False
+    empty = getattr(value, "empty", None)
+    return not empty if empty is not None else len(value) > 0
+
+
+class ClusterCache:
+    RETRY_INTERVAL = 5.0
+
+    def __init__(self):
+        self.node_id = uuid.uuid4().hex
+        self._client = None
+        self._release = None
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+        self._inflight = {}  # key -> (Event, result holder)
+        self._listener = None
+        self.on_invalidate = None  # callable(key tuple), set by the L1 owner
+
+    @property
+    def enabled(self) -> bool:
+        return settings.CLUSTER_CACHE_ENABLED
+
+    @property
+    def client(self):
+        if self._client is None and time.time() >= self._retry_at:
+            with self._lock:
+                if self._client is None and time.time() >= self._retry_at:
+                    self._client = self._connect()
+                    if self._client is not None:
+                        self._start_listener()
+        return self._client
+
+    def _connect(self):
+        try:
+            # Binary values: no decode_responses (unlike the alarm queue).
+            # No retries with backoff: on failure, fetching directly is faster.
+            client = redis.Redis(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                db=0,
+                socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+                retry=Retry(NoBackoff(), 0)
+            )
+            client.ping()
+            self._release = client.register_script(RELEASE_SCRIPT)
+            return client
+        except Exception as e:
+            logger.warning(f"Cluster cache: Redis connection failed: {e}")
+            self._retry_at = time.time() + self.RETRY_INTERVAL
+            return None
+
+    def _disconnect(self, error):
+        logger.warning(f"Cluster cache: Redis error, fetching directly: {error}")
+        with self._lock:
+            self._client = None
+            self._retry_at = time.time() + self.RETRY_INTERVAL
+
+    # --- Single flight ---
+
+    def _local_flight(self, key, fn):
+        """
+        Run fn() once for concurrent callers of the same key in this process.
+        """
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = (threading.Event(), {})
+        event, holder = flight
+        if not leader:
+            event.wait()
+            if "error" in holder:
+                raise holder["error"]
+            return holder["value"]
+        try:
+            holder["value"] = fn()
+            return holder["value"]
+        except Exception as e:
+            holder["error"] = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    @staticmethod
+    def _read(client, key: str, decode, max_age: float) -> tuple:
+        """
+        (fresh, stale): the stored (value, fetched_at) in one of the two
+        slots depending on its age, or (None, None).
+        """
+        blob = client.get(key)
+        if blob is None:
+            return None, None
+        try:
+            entry = decode(blob)
+        except (ValueError, zlib.error) as e:
+            logger.warning(f"Cluster cache: undecodable value at {key}: {e}")
+            return None, None
+        if time.time() - entry[1] <= max_age:
+            return entry, None
+        return None, entry
+
+    def _shared_flight(self, cache: str, key: str, lock_key: str, max_age: float,
+                       fetch, encode, decode, channel: str = None):
+        """
+        (value, fetched_at) from Redis if fresh, else from fetch(stale) run by
+        one node while the others wait for it.
+        """
+        client = self.client
+        if client is None:
+            return fetch(None), time.time()
+        try:
+            fresh, stale = self._read(client, key, decode, max_age)
+            record_cache(cache, fresh is not None)
+            if fresh is not None:
+                return fresh
+            token = f"{self.node_id}:{threading.get_ident()}"
+            deadline = time.time() + settings.CLUSTER_LOCK_WAIT
+            while not client.set(lock_key, token, nx=True, px=int(settings.CLUSTER_LOCK_TIMEOUT * 1000)):
+                # Another node is fetching: wait for its result
+                time.sleep(WAIT_POLL)
+                fresh, stale = self._read(client, key, decode, max_age)
+                if fresh is not None:
+                    return fresh
+                if time.time() >= deadline:
+                    logger.warning(f"Cluster cache: gave up waiting for {key}, fetching directly")
+                    return fetch(stale[0] if stale else None), time.time()
+        except redis.RedisError as e:
+            self._disconnect(e)
+            return fetch(None), time.time()
+
+        try:
+            # Another node may have finished between our read and the lock
+            fresh, stale = self._read(client, key, decode, max_age)
+            if fresh is not None:
+                return fresh
+            value = fetch(stale[0] if stale else None)
+            fetched_at = time.time()
+            if _valid(value):
+                client.set(key, encode(value, fetched_at), ex=settings.CLUSTER_CACHE_TTL)
+                if channel:
+                    client.publish(channel, f"{self.node_id}|{key}")
+            return value, fetched_at
+        except redis.RedisError as e:
+            self._disconnect(e)
+            return fetch(None), time.time()
+        finally:
+            try:
+                self._release(keys=[lock_key], args=[token], client=client)
+            except redis.RedisError:
+                pass  # Expires after CLUSTER_LOCK_TIMEOUT
+
+    # --- Public API ---
+
+    @staticmethod
+    def _bars_id(cache_key) -> str:
+        return ":".join(str(part) for part in cache_key)
+
+    def bars(self, cache_key, max_age: float, fetch):
+        """
+        (DataFrame, fetched_at) for a bar_cache key. fetch(stale_df) loads
+        the series upstream; stale_df is an older cached copy or None.
+        """
+        ident = self._bars_id(cache_key)
+        return self._local_flight(("bars", ident), lambda: self._shared_flight(
+            "cluster_bars", BARS_KEY.format(ident), BARS_LOCK_KEY.format(ident), max_age,
+            fetch, encode_bars, decode_bars, channel=BARS_CHANNEL))
+
+    def spot(self, stock_type: str, max_age: float, fetch):
+        """Spot snapshot shared by all nodes; fetch() loads it upstream."""
+        value, _ = self._local_flight(("spot", stock_type), lambda: self._shared_flight(
+            "cluster_spot", SPOT_KEY.format(stock_type), SPOT_LOCK_KEY.format(stock_type), max_age,
+            lambda stale: fetch(), encode_spot, decode_spot))
+        return value
+
+    # --- Invalidation ---
+
+    def _start_listener(self):
+        if self._listener is None:
+            self._listener = threading.Thread(target=self._listen, daemon=True, name="cluster-cache")
+            self._listener.start()
+
+    def _listen(self):
+        while True:
+            client = self._client
+            if client is None:
+                time.sleep(self.RETRY_INTERVAL)
+                continue
+            try:
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(BARS_CHANNEL)
+                for message in pubsub.listen():
+                    self._handle(message.get("data"))
+            except Exception as e:
+                logger.warning(f"Cluster cache: invalidation listener error: {e}")
+                time.sleep(self.RETRY_INTERVAL)
+
+    def _handle(self, data):
+        if not data:
+            return
+        node, _, key = (data.decode() if isinstance(data, bytes) else data).partition("|")
+        if node == self.node_id or not self.on_invalidate:
+            return
+        # The L1 key is the first three parts (bar keys may carry a window)
+        code, period, stock_type = key[len(BARS_KEY.format("")):].split(":")[:3]
+        self.on_invalidate((code, period, stock_type))
+
+
+cluster_cache = ClusterCache()
@@ -0,0 +1,153 @@
+"""
+Hedged requests across redundant upstream sources.
+
+The same logical request (e.g. daily bars of one symbol) can be served by
+several sources (Sina, EastMoney, Tencent). `hedged()` starts the primary;
+if it has not answered within its own recent p90 latency, the next source is
+started as well, and so on. The first valid answer wins. Sources that fail
+or return nothing start the next one immediately.
+
+Losers that have not started are cancelled; ones already in flight cannot be
+interrupted (AkShare calls block), so they finish in the background and
+their results are discarded. Their latency still feeds the tracker.
+
+Only ~10% of requests (those slower than p90) are duplicated, so the extra
+upstream load is bounded while one slow source no longer sets the tail
+latency of a scan.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from loguru import logger
+from app.core.config import settings
+from app.core.metrics import UPSTREAM_HEDGES
+
+
+class LatencyTracker:
+    """
+    Rolling window of recent call latencies per (request, source).
+    """
+    def __init__(self, window: int = None):
+        self.window = window or settings.HEDGE_WINDOW
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def observe(self, key, seconds: float):
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def hedge_delay(self, key) -> float:
+        """
+        Seconds to wait on a source before hedging: its p90, clamped to
+        [HEDGE_MIN_DELAY, HEDGE_MAX_DELAY]; HEDGE_MAX_DELAY until it has
+        enough samples.
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < 20:
+            return settings.HEDGE_MAX_DELAY
+        p90 = samples[min(len(samples) - 1, int(len(samples) * settings.HEDGE_PERCENTILE))]
+        return min(settings.HEDGE_MAX_DELAY, max(settings.HEDGE_MIN_DELAY, p90))
+
+    def stats(self) -> dict:
+        with self._lock:
+            items = {key: sorted(samples) for key, samples in self._samples.items()}
+        return {
+            f"{request}:{source}": {
+                "samples": len(samples),
+                "p50": round(samples[len(samples) // 2], 4),
+                "p90": round(samples[min(len(samples) - 1, int(len(samples) * 0.9))], 4),
+            }
+            for (request, source), samples in items.items() if samples
+        }
+
+
+latency_tracker = LatencyTracker()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.HEDGE_MAX_WORKERS,
+                                               thread_name_prefix="hedge")
+    return _executor
+
+
+def _valid(result) -> bool:
+    if result is None:
+        return False
+    empty = getattr(result, "empty", None)
+    if empty is not None:
+        return not empty
+    return len(result) > 0
+
+
+def hedged(request: str, sources: list):
+    """
+    Run `sources` ([(name, fn), ...], primary first) as a hedged request and
+    return the first valid result. If none is valid, returns an empty result
+    if some source gave one, else raises the first error.
+    """
+    if not settings.HEDGE_ENABLED or len(sources) == 1:
+        name, fn = sources[0]
+        return _timed(request, name, fn)
+
+    executor = _get_executor()
+    pending = {}   # future -> source name
+    queue = list(sources)
+    errors = []
+    empty = None
+
+    def start_next():
+        name, fn = queue.pop(0)
+        future = executor.submit(_timed, request, name, fn)
+        pending[future] = name
+        return name
+
+    current = start_next()
+    primary = current
+    while pending:
+        timeout = latency_tracker.hedge_delay((request, current)) if queue else None
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            # Slower than p90: hedge with the next source
+            current = start_next()
+            logger.debug(f"Hedging {request}: {primary} slow, also trying {current}")
+            continue
+        for future in done:
+            name = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                errors.append(e)
+                continue
+            if _valid(result):
+                for loser in pending:
+                    loser.cancel()
+                UPSTREAM_HEDGES.labels(request=request, winner="primary" if name == primary else "alternate").inc()
+                return result
+            empty = result if empty is None else empty
+        if queue:
+            # A source failed or came back empty: fail over without waiting
+            current = start_next()
+
+    UPSTREAM_HEDGES.labels(request=request, winner="none").inc()
+    if errors and empty is None:
+        raise errors[0]
+    return empty
+
+
+def _timed(request: str, source: str, fn):
+    start = time.perf_counter()
+    try:
+        return fn()
+    finally:
+        latency_tracker.observe((request, source), time.perf_counter() - start)
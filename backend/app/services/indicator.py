@@ -1,8 +1,14 @@
 import pandas as pd
-import pandas_ta as ta
+from app.core.metrics import INDICATOR_LATENCY
+from app.core.startup import lazy_import
+from app.services.indicator_cache import memoized
+
+ta = lazy_import("pandas_ta")
 
 class IndicatorService:
     @staticmethod
+    @memoized("rsi")
+    @INDICATOR_LATENCY.labels(indicator="rsi").time()
     def calculate_rsi(df: pd.DataFrame, length: int = 6) -> float:
         """
         Calculate RSI. Assumes df has 'close' or '收盘' column.
@@ -24,6 +30,8 @@ class IndicatorService:
         return float(rsi.iloc[-1])
 
     @staticmethod
+    @memoized("macd")
+    @INDICATOR_LATENCY.labels(indicator="macd").time()
     def calculate_macd(df: pd.DataFrame, fast: int = 12, slow: int = 26, signal: int = 9):
         if '收盘' in df.columns:
             close = df['收盘']
@@ -42,6 +50,8 @@ class IndicatorService:
         return macd.iloc[-1].to_dict()
 
     @staticmethod
+    @memoized("ma")
+    @INDICATOR_LATENCY.labels(indicator="ma").time()
     def calculate_ma(df: pd.DataFrame, length: int = 60) -> float:
         """
         Calculate Moving Average (Simple).
@@ -61,6 +71,8 @@ class IndicatorService:
         return float(ma.iloc[-1])
 
     @staticmethod
+    @memoized("bbands")
+    @INDICATOR_LATENCY.labels(indicator="bbands").time()
     def calculate_bollinger_bands(df: pd.DataFrame, length: int = 20, std: float = 2.0):
         """
         Calculate Bollinger Bands.
@@ -92,3 +104,54 @@ class IndicatorService:
             "mid": float(last_row.iloc[1]),
             "upper": float(last_row.iloc[2])
         }
+
+    # --- Full-series variants (vectorized path used by rules and screeners) ---
+
+    @staticmethod
+    def _close_series(df: pd.DataFrame) -> pd.Series:
+        if '收盘' in df.columns:
+            close = df['收盘']
+        elif 'close' in df.columns:
+            close = df['close']
+        else:
+            raise ValueError("DataFrame must contain 'close' or '收盘' column")
+        return pd.to_numeric(close, errors='coerce')
+
+    @staticmethod
+    @memoized("rsi_series")
+    def rsi_series(df: pd.DataFrame, length: int = 14) -> pd.Series:
+        return ta.rsi(IndicatorService._close_series(df), length=length)
+
+    @staticmethod
+    @memoized("sma_series")
+    def sma_series(df: pd.DataFrame, length: int = 20) -> pd.Series:
+        return ta.sma(IndicatorService._close_series(df), length=length)
+
+    @staticmethod
+    @memoized("ema_series")
+    def ema_series(df: pd.DataFrame, length: int = 20) -> pd.Series:
+        return ta.ema(IndicatorService._close_series(df), length=length)
+
+    @staticmethod
+    @memoized("bbands_frame")
+    def bbands_frame(df: pd.DataFrame, length: int = 20, std: float = 2.0) -> pd.DataFrame:
+        """
+        Bollinger Bands as a DataFrame with columns lower, mid, upper.
+        """
+        bb = ta.bbands(IndicatorService._close_series(df), length=length, std=std)
+        if bb is None:
+            return None
+        # Positional access: pandas_ta column names depend on the params
+        return pd.DataFrame({"lower": bb.iloc[:, 0], "mid": bb.iloc[:, 1], "upper": bb.iloc[:, 2]})
+
+    @staticmethod
+    @memoized("macd_frame")
+    def macd_frame(df: pd.DataFrame, fast: int = 12, slow: int = 26, signal: int = 9) -> pd.DataFrame:
+        """
+        MACD as a DataFrame with columns macd, hist, signal.
+        """
+        macd = ta.macd(IndicatorService._close_series(df), fast=fast, slow=slow, signal=signal)
+        if macd is None:
+            return None
+        # pandas_ta order: MACD, MACDh, MACDs
+        return pd.DataFrame({"macd": macd.iloc[:, 0], "hist": macd.iloc[:, 1], "signal": macd.iloc[:, 2]})
@@ -0,0 +1,134 @@
+"""
+Memoization of indicator results keyed by a data fingerprint.
+
+Frames served by MarketDataService carry their symbol/period in
+`df.attrs`; the fingerprint adds the last bar's timestamp and close and the
+bar count, so a new or updated (provisional) bar produces a new key. Frames
+without attrs are computed uncached. Results count against the global
+memory budget (see memory_budget.py).
+"""
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+import pandas as pd
+from app.core.config import settings
+from app.core.metrics import record_cache
+from app.services.memory_budget import estimate_bytes, memory_budget
+
+# Eviction cost relative to other pools: a result is recomputed locally
+EVICTION_COST = 0.5
+
+
+def fingerprint(df: pd.DataFrame):
+    """
+    (symbol, period, stock_type, last bar time, bar count, last close) or None.
+    """
+    if df is None or df.empty:
+        return None
+    symbol = df.attrs.get("symbol")
+    if symbol is None:
+        return None
+    # Computed on every call (O(1)): attrs are copied onto derived frames, so
+    # nothing memoized in them can be trusted to describe this frame
+    columns = df.columns
+    last_time = df.iat[-1, columns.get_loc("date")] if "date" in columns else None
+    last_close = df.iat[-1, columns.get_loc("close")] if "close" in columns else None
+    return (symbol, df.attrs.get("period"), df.attrs.get("stock_type"), last_time, len(df), last_close)
+
+
+class IndicatorCache:
+    """
+    Bounded LRU of indicator results.
+    """
+    def __init__(self, max_entries: int = None):
+        self.max_entries = max_entries or settings.INDICATOR_CACHE_SIZE
+        self._entries = OrderedDict()
+        self._meta = {}  # key -> [estimated size, epoch of the last hit]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._meta[key][1] = time.time()
+                self.hits += 1
+                record_cache("indicator", True)
+                return self._entries[key]
+        # Compute outside the lock; a concurrent duplicate computation is harmless
+        value = compute()
+        nbytes = estimate_bytes(value)
+        with self._lock:
+            self.misses += 1
+            record_cache("indicator", False)
+            # Bytes released: a concurrently computed duplicate, LRU evictions
+            previous = self._meta.get(key)
+            freed = previous[0] if previous else 0
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._meta[key] = [nbytes, time.time()]
+            while len(self._entries) > self.max_entries:
+                oldest, _ = self._entries.popitem(last=False)
+                freed += self._meta.pop(oldest)[0]
+                self.evictions += 1
+        memory_budget.note(nbytes - freed)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._meta.clear()
+
+    def memory_entries(self) -> list:
+        # Keys start with the fingerprint: (symbol, period, ...)
+        with self._lock:
+            return [(key, key[0], key[1], nbytes, used_at) for key, (nbytes, used_at) in self._meta.items()]
+
+    def evict(self, key) -> int:
+        with self._lock:
+            self._entries.pop(key, None)
+            meta = self._meta.pop(key, None)
+        return meta[0] if meta else 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else None,
+        }
+
+
+indicator_cache = IndicatorCache()
+memory_budget.register("indicators", indicator_cache, cost=EVICTION_COST)
+
+
+def memoized(indicator: str):
+    """
+    Decorator for IndicatorService methods taking (df, **params).
+    Parameters are bound against the signature so positional and keyword
+    calls share a cache entry.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        def wrapper(df, *args, **kwargs):
+            fp = fingerprint(df)
+            if fp is None:
+                return func(df, *args, **kwargs)
+            bound = signature.bind(df, *args, **kwargs)
+            bound.apply_defaults()
+            params = tuple(item for item in bound.arguments.items() if item[0] != "df")
+            value = indicator_cache.get_or_compute(fp + (indicator, params), lambda: func(df, *args, **kwargs))
+            # Results are shared between callers; hand out copies of mutable ones
+            return dict(value) if isinstance(value, dict) else value
+        return wrapper
+    return decorator
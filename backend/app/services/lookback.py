@@ -0,0 +1,189 @@
+"""
+History windows derived from what the strategies actually compute.
+
+Indicators only look back a bounded number of bars: SMA / Bollinger(n)
+read n bars, and the recursive ones (Wilder RSI, EMA, MACD) forget their
+starting point geometrically: after k bars the truncated history carries
+a weight of (1 - alpha)^k. `indicator_bars` is the length plus the k at
+which that weight drops below LOOKBACK_TOLERANCE. With the default 1e-4,
+RSI on the window is within 0.01 points of RSI on the full history.
+
+`LookbackPolicy` takes the maximum over the strategies of watched stocks
+(RSI length, MA60 for the trend filter, BB(20) for the volatility filter,
+every indicator in rules), converts it to bars of the base series
+(daily / 1 / 5 minute) the strategy's period is resampled from, and rounds
+it up. get_history_data fetches and caches only that window, so every
+indicator computation runs on it too.
+"""
+import math
+import threading
+import time
+from datetime import date, timedelta
+from loguru import logger
+from app.core.config import settings
+from app.services.resample import INTRADAY_MINUTES, base_period
+
+# Trend filter MA and volatility filter BB (see SignalEngine.check_signal)
+TREND_MA_LENGTH = 60
+VOLATILITY_BB_LENGTH = 20
+# Windows are rounded up to a multiple of this, so small strategy changes
+# don't invalidate cached history
+WINDOW_STEP = 50
+# Trading days per calendar year, to turn a daily window into a start date
+TRADING_DAYS_PER_YEAR = 242
+
+
+def _decay_bars(alpha: float) -> int:
+    """Bars until a recursive filter's initial state weighs < tolerance."""
+    return math.ceil(math.log(settings.LOOKBACK_TOLERANCE) / math.log(1 - alpha))
+
+
+def indicator_bars(name: str, params: tuple) -> int:
+    """Bars an indicator needs to match its full-history value."""
+    if name == "rsi":
+        length = int(params[0])
+        return length + 1 + _decay_bars(1.0 / length)
+    if name == "ema":
+        length = int(params[0])
+        return length + _decay_bars(2.0 / (length + 1))
+    if name == "macd":
+        _, slow, signal = (int(p) for p in params)
+        return slow + _decay_bars(2.0 / (slow + 1)) + signal + _decay_bars(2.0 / (signal + 1))
+    # sma, bbands
+    return int(params[0])
+
+
+def strategy_bars(strategy) -> int:
+    """Bars of the strategy's own period it needs, including LOOKBACK_MARGIN."""
+    from app.services.rules import RuleError, compile_rule
+
+    needs = []
+    rules = [text for text in (getattr(strategy, "buy_rule", None), getattr(strategy, "sell_rule", None)) if text]
+    for text in rules:
+        try:
+            needs.extend(indicator_bars(node.name, node.params) for node in compile_rule(text).indicators)
+        except RuleError:
+            pass
+    if not rules:
+        needs.append(indicator_bars("rsi", (strategy.rsi_length or 14,)))
+        if strategy.enable_trend_filter:
+            needs.append(TREND_MA_LENGTH)
+        if strategy.enable_volatility_filter:
+            needs.append(VOLATILITY_BB_LENGTH)
+    return max(needs, default=0) + settings.LOOKBACK_MARGIN
+
+
+def base_bars_per_bar(period: str) -> int:
+    """Base-series bars in one bar of `period`."""
+    period = str(period)
+    if period == "weekly":
+        return 5
+    if period == "monthly":
+        return 23
+    if period.endswith("d") and period[:-1].isdigit():
+        return int(period[:-1])
+    if period in INTRADAY_MINUTES:
+        return INTRADAY_MINUTES[period] // INTRADAY_MINUTES.get(base_period(period), 1)
+    return 1
+
+
+def required_windows(strategies) -> dict:
+    """{base period: bars} over the given strategies."""
+    windows = {}
+    for strategy in strategies:
+        base = base_period(strategy.rsi_period)
+        if base is None:
+            continue
+        # +1 bar: the oldest resampled bar of a window is usually partial
+        bars = (strategy_bars(strategy) + 1) * base_bars_per_bar(strategy.rsi_period)
+        windows[base] = max(windows.get(base, 0), bars)
+    return windows
+
+
+def window_start(bars: int, today: date = None) -> str:
+    """YYYYMMDD start date covering `bars` daily bars (with holiday slack)."""
+    today = today or date.today()
+    days = math.ceil(bars * 365 / TRADING_DAYS_PER_YEAR) + 20
+    return (today - timedelta(days=days)).strftime("%Y%m%d")
+
+
+def trim_bars(df, bars: int):
+    """
+    The last `bars` rows as a new frame (a copy, so the full history can be
+    freed), or df itself if already short enough.
+    """
+    if df is None or len(df) <= bars:
+        return df
+    trimmed = df.iloc[-bars:].copy().reset_index(drop=True)
+    trimmed.attrs.update(df.attrs)
+    return trimmed
+
+
+class LookbackPolicy:
+    """
+    Current windows, recomputed from the strategy rows when they change
+    (checked every REFRESH_INTERVAL seconds in each process).
+    """
+    REFRESH_INTERVAL = 60.0
+
+    def __init__(self):
+        self._windows = None  # base period -> bars; None until loaded
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def window(self, base: str):
+        """
+        Bars of `base` to keep, or None to keep the full history (trimming
+        disabled or strategies not loaded).
+        """
+        if not settings.HISTORY_TRIM:
+            return None
+        if time.monotonic() - self._checked_at >= self.REFRESH_INTERVAL:
+            self.refresh()
+        if self._windows is None:
+            return None
+        bars = max(self._windows.get(base, 0), settings.LOOKBACK_MIN_BARS)
+        return math.ceil(bars / WINDOW_STEP) * WINDOW_STEP
+
+    def refresh(self, db=None):
+        from app.core.database import SessionLocal
+        from app.models import UserStock, UserStrategy
+        from app.services import versions
+
+        with self._lock:
+            self._checked_at = time.monotonic()
+            session = db or SessionLocal()
+            try:
+                version = versions.current(session, versions.STRATEGIES)
+                if version == self._version and self._windows is not None:
+                    return
+                strategies = (session.query(UserStrategy)
+                              .join(UserStock, UserStock.stock_code == UserStrategy.stock_code)
+                              .all())
+                windows = required_windows(strategies)
+            except Exception as e:
+                logger.warning(f"Lookback windows not refreshed: {e}")
+                return
+            finally:
+                if db is None:
+                    session.close()
+            previous = self._windows
+            self._windows, self._version = windows, version
+
+        grown = previous is not None and any(bars > previous.get(base, 0) for base, bars in windows.items())
+        if grown:
+            # Cached series are too short for the new strategies: refetch
+            from app.services.bar_cache import bar_cache
+            logger.info(f"History windows grew to {windows}, dropping cached bars")
+            bar_cache.invalidate()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": settings.HISTORY_TRIM,
+            "required": self._windows,
+            "windows": {base: self.window(base) for base in (self._windows or {})},
+        }
+
+
+lookback_policy = LookbackPolicy()
@@ -1,4 +1,3 @@
-import akshare as ak
 import pandas as pd
 from datetime import datetime
 from loguru import logger
@@ -7,6 +6,16 @@ from functools import wraps
 from http.client import RemoteDisconnected
 from requests.exceptions import ConnectionError, Timeout
 from app.services.trading_hours import TradingHours, get_market_status
+from app.core.metrics import log_sampled
+from app.core.config import settings
+from app.services.bar_cache import bar_cache
+from app.services.cluster_cache import cluster_cache
+from app.services.lookback import lookback_policy, trim_bars, window_start
+from app.services.resample import base_period, resample_bars
+from app.services.providers import get_provider, sina_symbol
+
+# Other nodes' fresh bars replace this process's older copies
+cluster_cache.on_invalidate = bar_cache.invalidate
 
 def retry_on_connection_error(max_retries=3, base_delay=3):
     """
@@ -52,18 +61,54 @@ def retry_on_connection_error(max_retries=3, base_delay=3):
     return decorator
 
 class MarketDataService:
+    # Symbol metadata (names) resolved so far: code -> {"code", "name"}
+    _symbol_info = {}
+
     @staticmethod
     def _get_stock_with_prefix(stock_code: str) -> str:
         """
         Add prefix to stock code for Sina API (sh/sz).
         """
-        if stock_code.startswith(('6', '5', '9')):
-            return f"sh{stock_code}"
-        elif stock_code.startswith(('0', '3', '1')):
-            return f"sz{stock_code}"
-        elif stock_code.startswith(('4', '8')):
-            return f"bj{stock_code}"
-        return stock_code
+        return sina_symbol(stock_code)
+
+    @staticmethod
+    def get_symbol_info(stock_code: str, stock_type: str = "stock") -> dict:
+        """
+        Symbol metadata from the provider, cached for the process lifetime.
+        Falls back to the code as name if the lookup fails (not cached).
+        """
+        info = MarketDataService._symbol_info.get(stock_code)
+        if info is None:
+            try:
+                info = get_provider().get_symbol_info(stock_code, stock_type)
+                MarketDataService._symbol_info[stock_code] = info
+            except Exception as e:
+                logger.debug(f"Symbol info lookup failed for {stock_code}: {e}")
+                return {"code": stock_code, "name": stock_code}
+        return info
+
+    @staticmethod
+    def get_bar_close_time(df: pd.DataFrame, period: str = "daily"):
+        """
+        Close time of the last bar in a history DataFrame.
+        Daily bars close at 15:00; minute bars are stamped with their end time.
+        A bar that has not closed yet (today's bar during trading) is capped at now.
+        Returns None if the frame has no recognizable date column.
+        """
+        if df is None or df.empty:
+            return None
+        for col in ('day', 'date', '日期', '时间'):
+            if col in df.columns:
+                break
+        else:
+            return None
+        try:
+            ts = pd.Timestamp(df.iloc[-1][col]).to_pydatetime()
+        except Exception:
+            return None
+        if base_period(period) == "daily":
+            ts = datetime.combine(ts.date(), TradingHours.AFTERNOON_END)
+        return min(ts, datetime.now())
 
     @staticmethod
     @retry_on_connection_error(max_retries=3, base_delay=3)
@@ -79,7 +124,7 @@ class MarketDataService:
         
         if not is_trading:
             market_status = get_market_status()
-            logger.info(
+            log_sampled(
                 f"Skipping real-time API call for {stock_code}. "
                 f"Market is currently {market_status}. "
                 f"Real-time data is only available during trading hours."
@@ -87,16 +132,15 @@ class MarketDataService:
             return None
         
         # Market is open, proceed with API call
-        logger.info(f"Fetching real-time price for {stock_code} (Market: {get_market_status()})")
+        log_sampled(f"Fetching real-time price for {stock_code} (Market: {get_market_status()})")
         
-        symbol = MarketDataService._get_stock_with_prefix(stock_code)
         df = None
         
         try:
             # Use minute data (period='1') to get latest price
-            df = ak.stock_zh_a_minute(symbol=symbol, period='1')
+            df = get_provider().get_minute(stock_code, period='1')
         except Exception as e:
-            logger.warning(f"Real-time fetch failed for {symbol}: {e}")
+            logger.warning(f"Real-time fetch failed for {stock_code}: {e}")
             pass
         
         if df is None or df.empty:
@@ -104,20 +148,10 @@ class MarketDataService:
             return None
             
         # Get the latest record
-        # Columns: day, open, high, low, close, volume
         latest = df.iloc[-1]
         price = float(latest['close'])
         
-        name = stock_code # Default
-        # Try to get name (optional) - keeping old method for now or could use new API if available
-        try:
-            if stock_type == "stock":
-                info_df = ak.stock_individual_info_em(symbol=stock_code)
-                name_row = info_df[info_df['item'] == "股票简称"]
-                if not name_row.empty:
-                    name = name_row.iloc[0]['value']
-        except:
-            pass
+        name = MarketDataService.get_symbol_info(stock_code, stock_type)["name"]
 
         logger.debug(f"Got price for {stock_code}: {price}")
         return {
@@ -128,51 +162,132 @@ class MarketDataService:
             "timestamp": datetime.now()
         }
 
+    @staticmethod
+    @retry_on_connection_error(max_retries=2, base_delay=1)
+    def get_spot_snapshot(stock_type: str = "stock") -> dict:
+        """
+        Get spot quotes for the whole market in one batched call.
+        Returns {code: {"name", "price", "open", "high", "low", "volume"}};
+        symbols without a current price (suspended) are omitted.
+        """
+        if cluster_cache.enabled:
+            return cluster_cache.spot(stock_type, settings.CLUSTER_SPOT_MAX_AGE,
+                                      lambda: get_provider().get_spot(stock_type))
+        return get_provider().get_spot(stock_type)
+
+    @staticmethod
+    def get_history_data(stock_code: str, period: str = "daily", stock_type: str = "stock",
+                         use_cache: bool = True, max_age: float = None):
+        """
+        Get history data for indicator calculation, in the normalized bar schema
+        (date, open, high, low, close, volume).
+        Period: daily, weekly, monthly, Nd (e.g. 3d), 1, 5, 15, 30, 60, 4h
+        Daily and minute periods (1, 5, 15, 30, 60) are fetched upstream; other
+        periods are resampled locally from the cached base series (see resample.py).
+        Served from the bar cache while fresh (max_age overrides the default
+        TTL); a stale daily series (e.g. restored from a snapshot) is refreshed
+        by fetching only its tail. The returned DataFrame may be shared with
+        other callers and must not be modified in place.
+        Cached series keep only the lookback window the strategies need (see
+        lookback.py); use_cache=False returns the full history.
+        """
+        base = base_period(period)
+        if base is None:
+            logger.error(f"Unsupported period: {period} for {stock_code}. "
+                         f"Supported: daily, weekly, monthly, Nd, 1, 5, 15, 30, 60, 4h")
+            return None
+
+        base_key = bar_cache.make_key(stock_code, base, stock_type)
+        base_df = bar_cache.get(base_key, max_age=max_age) if use_cache else None
+        if base_df is None:
+            stale = bar_cache.peek(base_key) if use_cache else None
+            window = lookback_policy.window(base) if use_cache else None
+
+            def load(older=None):
+                older = stale["df"] if stale is not None else older
+                if older is not None and base == "daily":
+                    return MarketDataService._refresh_tail(stock_code, older, stock_type=stock_type)
+                start_date = window_start(window) if window and base == "daily" else None
+                return MarketDataService._fetch_history_data(stock_code, period=base, stock_type=stock_type,
+                                                             start_date=start_date)
+
+            fetched_at = None
+            try:
+                if use_cache and cluster_cache.enabled:
+                    # Shared with the other nodes through Redis (see cluster_cache.py)
+                    # Keyed by window: nodes with other windows don't share a series
+                    base_df, fetched_at = cluster_cache.bars(
+                        base_key + (window,), bar_cache.ttl() if max_age is None else max_age, load)
+                else:
+                    base_df = load()
+            except Exception as e:
+                # Raised only after the retry decorator gave up (or for non-connection errors)
+                logger.error(f"Error fetching history for {stock_code}: {e}")
+                return None
+            if base_df is None or base_df.empty:
+                return base_df
+            if window:
+                base_df = trim_bars(base_df, window)
+            base_df.attrs.update(symbol=stock_code, period=base, stock_type=stock_type, trimmed=bool(window))
+            base_df = bar_cache.put(base_key, base_df, fetched_at=fetched_at)
+
+        if str(period) == base:
+            return base_df
+
+        # Derived timeframe: reuse the resampled frame while its base is unchanged
+        key = bar_cache.make_key(stock_code, period, stock_type)
+        df = bar_cache.get_derived(key, base_df)
+        if df is None:
+            df = resample_bars(base_df, period, base=base)
+            df.attrs.update(symbol=stock_code, period=str(period), stock_type=stock_type,
+                            trimmed=base_df.attrs.get("trimmed", False))
+            bar_cache.put(key, df, source=base_df)
+        return df
+
+    @staticmethod
+    def _refresh_tail(stock_code: str, cached: pd.DataFrame, stock_type: str = "stock"):
+        """
+        Update a cached daily series by fetching from its second-to-last bar on.
+        The overlapping completed bar must match, otherwise the history was
+        re-adjusted upstream (dividends under qfq) and is fetched in full.
+        """
+        if len(cached) < 2 or 'date' not in cached.columns:
+            return MarketDataService._fetch_history_data(stock_code, period="daily", stock_type=stock_type)
+        anchor = cached['date'].iloc[-2]
+        tail = MarketDataService._fetch_history_data(
+            stock_code, period="daily", stock_type=stock_type, start_date=anchor.strftime("%Y%m%d")
+        )
+        if (tail is None or tail.empty or tail['date'].iloc[0] != anchor
+                or abs(tail['close'].iloc[0] - cached['close'].iloc[-2]) > 1e-6):
+            logger.info(f"History tail for {stock_code} does not line up, refetching in full")
+            return MarketDataService._fetch_history_data(stock_code, period="daily", stock_type=stock_type)
+        log_sampled(f"Refreshed {len(tail)} tail rows for {stock_code}")
+        return pd.concat([cached.iloc[:-2], tail], ignore_index=True)
+
     @staticmethod
     @retry_on_connection_error(max_retries=3, base_delay=3)
-    def get_history_data(stock_code: str, period: str = "daily", stock_type: str = "stock"):
+    def _fetch_history_data(stock_code: str, period: str = "daily", stock_type: str = "stock",
+                            start_date: str = None):
         """
-        Get history data for indicator calculation.
-        Period: daily, weekly, monthly, 1, 5, 15, 30, 60
+        Fetch a base series (daily, 1/5/15/30/60 minute) upstream and normalize it.
         Stock Type: stock, etf
+        start_date (YYYYMMDD) limits daily fetches to the tail of the series.
         Uses retry decorator to handle connection errors.
         Note: Historical data is available regardless of trading hours.
         """
-        logger.info(f"Fetching history for {stock_code} ({stock_type}), period: {period}")
-        symbol = MarketDataService._get_stock_with_prefix(stock_code)
-        df = None
-        
-        try:
-            if period in ["daily", "weekly", "monthly"]:
-                # For daily data, use stock_zh_a_daily
-                try:
-                    df = ak.stock_zh_a_daily(symbol=symbol)
-                except Exception as e:
-                    # Always try ETF fallback, regardless of stock_type
-                    # This handles edge cases like commodity ETFs that fail with stock API
-                    logger.warning(f"Stock API failed for {stock_code}, trying ETF fallback: {str(e)[:50]}")
-                    try:
-                        df = ak.fund_etf_hist_em(symbol=stock_code, period=period, adjust="qfq")
-                        logger.info(f"✓ ETF fallback successful for {stock_code}")
-                    except Exception as e2:
-                        logger.error(f"Both APIs failed for {stock_code}. Stock API: {str(e)[:50]}, ETF API: {str(e2)[:50]}")
-                        raise e  # Raise original error
-
-            elif str(period) in ["1", "5", "15", "30", "60"]:
-                # For minute data: 1, 5, 15, 30, 60
-                # Ensure period is string
-                df = ak.stock_zh_a_minute(symbol=symbol, period=str(period))
-            else:
-                logger.error(f"Unsupported period: {period} for {stock_code}. Supported: daily, weekly, monthly, 1, 5, 15, 30, 60")
-                return None
-                
-            if df is not None and not df.empty:
-                logger.info(f"Successfully fetched {len(df)} rows for {stock_code}")
-            else:
-                logger.warning(f"No data returned for {stock_code}")
-                
-            return df
-            
-        except Exception as e:
-            logger.error(f"Error fetching history for {stock_code}: {e}")
+        log_sampled(f"Fetching history for {stock_code} ({stock_type}), period: {period}")
+        if period == "daily":
+            df = get_provider().get_daily(stock_code, stock_type=stock_type, start_date=start_date)
+        elif str(period) in ["1", "5", "15", "30", "60"]:
+            # For minute data; 4h bars are resampled from the 60-minute ones
+            df = get_provider().get_minute(stock_code, period=str(period))
+        else:
+            logger.error(f"Unsupported base period: {period} for {stock_code}. Supported: daily, 1, 5, 15, 30, 60")
             return None
+            
+        if df is not None and not df.empty:
+            log_sampled(f"Successfully fetched {len(df)} rows for {stock_code}")
+        else:
+            logger.warning(f"No data returned for {stock_code}")
+            
+        return df
@@ -0,0 +1,200 @@
+"""
+Global memory budget for in-process caches and per-symbol state.
+
+Pools (the bar cache, indicator cache, realtime tick buffers, screener
+closes, signal states) register here and report their entries as
+(key, symbol, period, bytes, used_at). Sizes are estimates of the arrays
+and frames held (see estimate_bytes).
+
+When the accounted total exceeds MEMORY_BUDGET_MB, entries are evicted down
+to MEMORY_LOW_WATERMARK of the budget. Symbols no pool has used for
+MEMORY_IDLE_SECONDS go first; within each group, the highest
+
+    bytes * period_weight * (1 + idle / MEMORY_IDLE_SECONDS) / pool cost
+
+goes first. period_weight grows with the bar length (1 for 5-minute bars,
+~6.6 for daily, ~11 for monthly): long-period frames are polled rarely and
+cheap to resample again. The pool cost is how expensive an entry is to get
+back (an indicator is recomputed, a series refetched, ticks are lost).
+Pools registered without a cost are reported but never evicted.
+
+The budget is checked every MEMORY_CHECK_INTERVAL seconds, and as soon as
+cache inserts push the running estimate over it, so a burst of fetches
+evicts cold data instead of growing the process until it is killed.
+"""
+import math
+import os
+import sys
+import threading
+import time
+from collections import deque
+from loguru import logger
+from app.core.config import settings
+from app.core.metrics import MEMORY_BYTES, MEMORY_EVICTIONS
+
+# Shortest spacing of insert-triggered checks after one found no overage
+# (the estimate only overcounts: replaced and invalidated entries aren't subtracted)
+NOTE_CHECK_INTERVAL = 1.0
+# Symbols listed in stats()
+TOP_SYMBOLS = 20
+
+
+def estimate_bytes(obj) -> int:
+    """
+    Bytes held by a cached value: array buffers of frames, series and
+    ndarrays (not deep object sizes), recursing into dicts and sequences.
+    """
+    if obj is None:
+        return 0
+    usage = getattr(obj, "memory_usage", None)
+    if usage is not None:
+        # DataFrame (per-column Series) or Series (int)
+        total = usage(index=True, deep=False)
+        return int(total.sum()) if hasattr(total, "sum") else int(total)
+    nbytes = getattr(obj, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(estimate_bytes(v) for v in obj.values())
+    if isinstance(obj, (list, tuple, deque)):
+        return sys.getsizeof(obj) + sum(estimate_bytes(v) for v in obj)
+    return sys.getsizeof(obj)
+
+
+def period_weight(period) -> float:
+    """Eviction weight of a period: 1 + log2(bar length / 5 minutes)."""
+    if period is None:
+        return 1.0
+    from app.services.scan_scheduler import bar_seconds
+    return 1.0 + max(0.0, math.log2(bar_seconds(period) / 300))
+
+
+def process_rss():
+    """Resident set size of this process in bytes, or None where unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class MemoryBudget:
+    def __init__(self):
+        self._pools = {}  # name -> (pool, cost or None)
+        self._lock = threading.Lock()  # one enforcement at a time
+        self._estimate = 0  # bytes at the last check plus bytes noted since
+        self._within_at = 0.0  # when a check last found the total within budget
+        self.evictions = {}  # pool name -> entries evicted
+        self.last_enforced = None
+
+    @property
+    def budget(self) -> int:
+        return int(settings.MEMORY_BUDGET_MB * 1024 * 1024)
+
+    def register(self, name: str, pool, cost: float = None):
+        """
+        Account `pool`, which provides memory_entries() and (if it has a cost)
+        evict(key) -> bytes freed.
+        """
+        self._pools[name] = (pool, cost)
+
+    def note(self, nbytes: int):
+        """Account bytes a pool just cached; enforces the budget once exceeded."""
+        self._estimate += nbytes
+        budget = self.budget
+        if budget and self._estimate > budget and time.monotonic() - self._within_at >= NOTE_CHECK_INTERVAL:
+            self.enforce()
+
+    def entries(self) -> list:
+        """[(pool name, key, symbol, period, bytes, used_at)] over all pools."""
+        rows = []
+        for name, (pool, _) in list(self._pools.items()):
+            rows.extend((name, *entry) for entry in pool.memory_entries())
+        return rows
+
+    def _ranked(self, rows: list, now: float) -> list:
+        """Evictable rows, first to evict first."""
+        idle_after = settings.MEMORY_IDLE_SECONDS
+        last_use = {}
+        for _, _, symbol, _, _, used_at in rows:
+            if symbol is not None and used_at is not None and used_at > last_use.get(symbol, 0.0):
+                last_use[symbol] = used_at
+        weights = {}
+
+        def rank(row):
+            name, _, symbol, period, nbytes, used_at = row
+            idle = now - last_use.get(symbol, used_at or 0.0)
+            if period not in weights:
+                weights[period] = period_weight(period)
+            score = nbytes * weights[period] * (1 + idle / idle_after) / self._pools[name][1]
+            return idle > idle_after, score
+
+        return sorted((row for row in rows if self._pools[row[0]][1]), key=rank, reverse=True)
+
+    def enforce(self, now: float = None) -> int:
+        """
+        Evict down to the low watermark if over budget. Returns bytes freed.
+        """
+        budget = self.budget
+        if not budget or not self._lock.acquire(blocking=False):
+            return 0
+        try:
+            now = time.time() if now is None else now
+            rows = self.entries()
+            total = sum(row[4] for row in rows)
+            self._estimate = total
+            if total <= budget:
+                self._within_at = time.monotonic()
+                return 0
+
+            target = budget * settings.MEMORY_LOW_WATERMARK
+            freed = 0
+            evicted = {}
+            for name, key, *_ in self._ranked(rows, now):
+                if total - freed <= target:
+                    break
+                freed += self._pools[name][0].evict(key)
+                evicted[name] = evicted.get(name, 0) + 1
+                MEMORY_EVICTIONS.labels(name).inc()
+            for name, count in evicted.items():
+                self.evictions[name] = self.evictions.get(name, 0) + count
+            self._estimate = total - freed
+            self.last_enforced = {"at": now, "before": total, "after": total - freed, "evicted": evicted}
+            logger.warning(f"Memory budget exceeded ({total / 2**20:.1f} of {budget / 2**20:.0f} MB), "
+                           f"evicted {evicted}, freed {freed / 2**20:.1f} MB")
+            return freed
+        finally:
+            self._lock.release()
+
+    def stats(self) -> dict:
+        rows = self.entries()
+        pools = {name: {"entries": 0, "bytes": 0, "evictable": cost is not None}
+                 for name, (_, cost) in self._pools.items()}
+        symbols = {}
+        for name, _, symbol, period, nbytes, _ in rows:
+            pools[name]["entries"] += 1
+            pools[name]["bytes"] += nbytes
+            if symbol is not None:
+                usage = symbols.setdefault(symbol, {"symbol": symbol, "bytes": 0, "periods": set()})
+                usage["bytes"] += nbytes
+                if period is not None:
+                    usage["periods"].add(str(period))
+        for name, pool in pools.items():
+            MEMORY_BYTES.labels(name).set(pool["bytes"])
+        top = sorted(symbols.values(), key=lambda usage: usage["bytes"], reverse=True)[:TOP_SYMBOLS]
+        used = sum(pool["bytes"] for pool in pools.values())
+        budget = self.budget
+        return {
+            "budget_bytes": budget,
+            "used_bytes": used,
+            "usage": used / budget if budget else None,
+            "rss_bytes": process_rss(),
+            "symbols": len(symbols),
+            "pools": pools,
+            "top_symbols": [dict(usage, periods=sorted(usage["periods"])) for usage in top],
+            "evictions": dict(self.evictions),
+            "last_enforced": self.last_enforced,
+        }
+
+
+memory_budget = MemoryBudget()
@@ -1,18 +1,58 @@
 import smtplib
+import threading
 from email.mime.text import MIMEText
 from email.header import Header
-import requests
+from app.core import http
 from app.core.config import settings
 from loguru import logger
+from app.core.metrics import NOTIFY_LATENCY, NOTIFY_RESULTS
+
+class RetryAfter(Exception):
+    """
+    The provider throttled the send (Telegram 429); retry after `seconds`.
+    """
+    def __init__(self, seconds: float):
+        super().__init__(f"Retry after {seconds}s")
+        self.seconds = seconds
 
 class NotificationService:
+    # SMTP connection kept open between sends (login once, not per message)
+    _smtp = None
+    _smtp_lock = threading.Lock()
+
+    @staticmethod
+    def _smtp_connection():
+        server = NotificationService._smtp
+        if server is not None:
+            try:
+                if server.noop()[0] == 250:
+                    return server
+            except smtplib.SMTPException:
+                pass
+            NotificationService._close_smtp()
+        server = smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=settings.SMTP_TIMEOUT)
+        server.starttls()
+        server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+        NotificationService._smtp = server
+        return server
+
+    @staticmethod
+    def _close_smtp():
+        server, NotificationService._smtp = NotificationService._smtp, None
+        if server is not None:
+            try:
+                server.quit()
+            except Exception:
+                pass
+
     @staticmethod
     def send_email(to_addr: str, subject: str, content: str):
         """
-        Send email using SMTP.
+        Send email using SMTP, reusing the open connection when it is still alive.
         """
         if not settings.SMTP_HOST or not settings.SMTP_USER:
             logger.warning("SMTP not configured")
+            NOTIFY_RESULTS.labels(channel="email", status="unconfigured").inc()
             return False
             
         try:
@@ -22,24 +62,30 @@ class NotificationService:
             message['To'] = Header(to_addr, 'utf-8')
             message['Subject'] = Header(subject, 'utf-8')
 
-            server = smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT)
-            server.starttls()
-            server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
-            server.sendmail(settings.SMTP_USER, [to_addr], message.as_string())
-            server.quit()
+            with NOTIFY_LATENCY.labels(channel="email").time(), NotificationService._smtp_lock:
+                try:
+                    NotificationService._smtp_connection().sendmail(settings.SMTP_USER, [to_addr], message.as_string())
+                except smtplib.SMTPServerDisconnected:
+                    # Dropped between the liveness check and the send: reconnect once
+                    NotificationService._close_smtp()
+                    NotificationService._smtp_connection().sendmail(settings.SMTP_USER, [to_addr], message.as_string())
             logger.success(f"Email sent to {to_addr}")
+            NOTIFY_RESULTS.labels(channel="email", status="sent").inc()
             return True
         except Exception as e:
             logger.error(f"Failed to send email: {e}")
+            NOTIFY_RESULTS.labels(channel="email", status="failed").inc()
             return False
 
     @staticmethod
     def send_telegram(chat_id: str, message: str):
         """
         Send Telegram message.
+        Raises RetryAfter when Telegram rate limits the chat (HTTP 429).
         """
         if not settings.TELEGRAM_BOT_TOKEN:
             logger.warning("Telegram token not configured")
+            NOTIFY_RESULTS.labels(channel="telegram", status="unconfigured").inc()
             return False
             
         try:
@@ -49,13 +95,27 @@ class NotificationService:
                 "chat_id": chat_id,
                 "text": message
             }
-            resp = requests.post(url, json=payload, timeout=200)
+            with NOTIFY_LATENCY.labels(channel="telegram").time():
+                resp = http.request("POST", url, json=payload, timeout=settings.TELEGRAM_TIMEOUT)
             if resp.status_code == 200:
                 logger.success(f"Telegram sent to {chat_id}")
+                NOTIFY_RESULTS.labels(channel="telegram", status="sent").inc()
                 return True
+            elif resp.status_code == 429:
+                try:
+                    retry_after = float(resp.json().get("parameters", {}).get("retry_after", 1))
+                except ValueError:
+                    retry_after = 1.0
+                logger.warning(f"Telegram rate limited for {chat_id}, retry after {retry_after}s")
+                NOTIFY_RESULTS.labels(channel="telegram", status="throttled").inc()
+                raise RetryAfter(retry_after)
             else:
                 logger.error(f"Telegram failed: {resp.text}")
+                NOTIFY_RESULTS.labels(channel="telegram", status="failed").inc()
                 return False
+        except RetryAfter:
+            raise
         except Exception as e:
             logger.error(f"Failed to send telegram: {e}")
+            NOTIFY_RESULTS.labels(channel="telegram", status="failed").inc()
             return False
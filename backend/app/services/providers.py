@@ -0,0 +1,387 @@
+"""
+Market data providers.
+
+MarketDataService talks to a MarketDataProvider instead of AkShare module
+functions directly. AkShareProvider is the live implementation;
+ReplayProvider serves recorded CSVs (or deterministic synthetic bars when no
+recording exists) with configurable latency and error injection, so scans
+can be load- and chaos-tested offline.
+
+Bars are returned in the normalized schema (see resample.normalize_bars).
+"""
+import os
+import random
+from abc import ABC, abstractmethod
+import time
+import zlib
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from loguru import logger
+from requests.exceptions import ConnectionError
+from app.core import http
+from app.core.config import settings
+from app.core.metrics import track_upstream
+from app.core.startup import lazy_import
+from app.services.hedging import hedged
+from app.services.resample import normalize_bars
+
+# AkShare takes seconds to import; loaded on the first live request
+ak = lazy_import("akshare")
+
+
+class MarketDataProvider(ABC):
+    """
+    Interface for market data sources.
+    """
+    name = "base"
+
+    @abstractmethod
+    def get_daily(self, stock_code: str, stock_type: str = "stock", start_date: str = None) -> pd.DataFrame:
+        """Daily bars, oldest first; from start_date (YYYYMMDD) if given."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_minute(self, stock_code: str, period: str = "1") -> pd.DataFrame:
+        """Intraday bars (period "1", "5", "15", "30" or "60"), oldest first."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_spot(self, stock_type: str = "stock") -> dict:
+        """Spot quotes for the whole market: {code: {"name", "price", "open", "high", "low", "volume"}}."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_symbol_info(self, stock_code: str, stock_type: str = "stock") -> dict:
+        """{"code", "name"} for a symbol."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_symbols(self, stock_type: str = "stock") -> dict:
+        """All listed symbols of a type: {code: name}."""
+        raise NotImplementedError
+
+
+def sina_symbol(stock_code: str) -> str:
+    """
+    Add prefix to stock code for Sina API (sh/sz/bj).
+    """
+    if stock_code.startswith(('6', '5', '9')):
+        return f"sh{stock_code}"
+    elif stock_code.startswith(('0', '3', '1')):
+        return f"sz{stock_code}"
+    elif stock_code.startswith(('4', '8')):
+        return f"bj{stock_code}"
+    return stock_code
+
+
+class AkShareProvider(MarketDataProvider):
+    """
+    Daily bars and spot quotes are hedged across redundant sources (see
+    hedging.py): Sina first, then EastMoney and Tencent for bars; EastMoney
+    first, then Sina for spot quotes. All sources are unadjusted and report
+    volume in shares (EastMoney's and Tencent's lots are converted).
+    """
+    name = "akshare"
+
+    # Spot snapshot column names per source and stock type
+    SPOT_COLUMNS = {
+        "stock": {"price": "最新价", "open": "今开", "high": "最高", "low": "最低", "volume": "成交量"},
+        "etf": {"price": "最新价", "open": "开盘价", "high": "最高价", "low": "最低价", "volume": "成交量"},
+        "sina": {"price": "最新价", "open": "今开", "high": "最高", "low": "最低", "volume": "成交量"},
+    }
+    LOT_SIZE = 100  # EastMoney and Tencent report volume in lots
+
+    def __init__(self):
+        # AkShare calls requests.get() per request; reuse pooled connections instead
+        http.install()
+
+    # --- Daily bar sources ---
+
+    def _daily_sina(self, stock_code: str, start_date: str) -> pd.DataFrame:
+        with track_upstream("stock_zh_a_daily"):
+            df = ak.stock_zh_a_daily(symbol=sina_symbol(stock_code), start_date=start_date)
+        return normalize_bars(df)
+
+    def _daily_eastmoney(self, stock_code: str, start_date: str, etf: bool = False) -> pd.DataFrame:
+        if etf:
+            with track_upstream("fund_etf_hist_em"):
+                df = ak.fund_etf_hist_em(symbol=stock_code, period="daily", start_date=start_date)
+        else:
+            with track_upstream("stock_zh_a_hist"):
+                df = ak.stock_zh_a_hist(symbol=stock_code, period="daily", start_date=start_date)
+        df = normalize_bars(df)
+        if df is not None and "volume" in df.columns:
+            df["volume"] = df["volume"] * self.LOT_SIZE
+        return df
+
+    def _daily_tencent(self, stock_code: str, start_date: str) -> pd.DataFrame:
+        with track_upstream("stock_zh_a_hist_tx"):
+            df = ak.stock_zh_a_hist_tx(symbol=sina_symbol(stock_code), start_date=start_date)
+        if df is None or df.empty:
+            return df
+        # No volume column: "amount" is the volume in lots (not turnover)
+        df = normalize_bars(df.rename(columns={"amount": "volume"}))
+        df["volume"] = df["volume"] * self.LOT_SIZE
+        return df
+
+    def get_daily(self, stock_code: str, stock_type: str = "stock", start_date: str = None) -> pd.DataFrame:
+        start_date = start_date or "19900101"
+        sources = [("sina", lambda: self._daily_sina(stock_code, start_date))]
+        if stock_type == "etf":
+            sources.append(("eastmoney", lambda: self._daily_eastmoney(stock_code, start_date, etf=True)))
+        else:
+            sources += [
+                ("eastmoney", lambda: self._daily_eastmoney(stock_code, start_date)),
+                ("tencent", lambda: self._daily_tencent(stock_code, start_date)),
+                # Last resort for funds registered as stocks (e.g. commodity ETFs)
+                ("eastmoney_etf", lambda: self._daily_eastmoney(stock_code, start_date, etf=True)),
+            ]
+        return hedged(f"daily_{stock_type}", sources)
+
+    def get_minute(self, stock_code: str, period: str = "1") -> pd.DataFrame:
+        with track_upstream("stock_zh_a_minute"):
+            df = ak.stock_zh_a_minute(symbol=sina_symbol(stock_code), period=str(period))
+        return normalize_bars(df)
+
+    # --- Spot sources ---
+
+    @staticmethod
+    def _spot_records(df: pd.DataFrame, columns: dict, volume_scale: float = 1) -> dict:
+        if df is None or df.empty:
+            return {}
+        df = df.dropna(subset=[columns["price"]])
+        records = df[["代码", "名称", *columns.values()]].to_dict("records")
+        quotes = {}
+        for r in records:
+            quote = {"name": r["名称"], **{field: r[col] for field, col in columns.items()}}
+            if quote["volume"] is not None:
+                quote["volume"] = quote["volume"] * volume_scale
+            # Sina codes carry the exchange prefix (sh600000)
+            quotes[str(r["代码"])[-6:]] = quote
+        return quotes
+
+    def _spot_eastmoney(self, stock_type: str) -> dict:
+        endpoint = "fund_etf_spot_em" if stock_type == "etf" else "stock_zh_a_spot_em"
+        with track_upstream(endpoint):
+            df = ak.fund_etf_spot_em() if stock_type == "etf" else ak.stock_zh_a_spot_em()
+        return self._spot_records(df, self.SPOT_COLUMNS["etf" if stock_type == "etf" else "stock"],
+                                  volume_scale=self.LOT_SIZE)
+
+    def _spot_sina(self, stock_type: str) -> dict:
+        endpoint = "fund_etf_category_sina" if stock_type == "etf" else "stock_zh_a_spot"
+        with track_upstream(endpoint):
+            df = ak.fund_etf_category_sina(symbol="ETF基金") if stock_type == "etf" else ak.stock_zh_a_spot()
+        return self._spot_records(df, self.SPOT_COLUMNS["sina"])
+
+    def get_spot(self, stock_type: str = "stock") -> dict:
+        return hedged(f"spot_{stock_type}", [
+            ("eastmoney", lambda: self._spot_eastmoney(stock_type)),
+            ("sina", lambda: self._spot_sina(stock_type)),
+        ])
+
+    def get_symbol_info(self, stock_code: str, stock_type: str = "stock") -> dict:
+        name = stock_code
+        if stock_type == "stock":
+            with track_upstream("stock_individual_info_em"):
+                info_df = ak.stock_individual_info_em(symbol=stock_code)
+            name_row = info_df[info_df['item'] == "股票简称"]
+            if not name_row.empty:
+                name = name_row.iloc[0]['value']
+        return {"code": stock_code, "name": name}
+
+    def list_symbols(self, stock_type: str = "stock") -> dict:
+        if stock_type == "etf":
+            with track_upstream("fund_etf_spot_em"):
+                df = ak.fund_etf_spot_em()
+            code_col, name_col = "代码", "名称"
+        else:
+            with track_upstream("stock_info_a_code_name"):
+                df = ak.stock_info_a_code_name()
+            code_col, name_col = "code", "name"
+        if df is None or df.empty:
+            return {}
+        return dict(zip(df[code_col].astype(str), df[name_col]))
+
+
+class ReplayProvider(MarketDataProvider):
+    """
+    Serves `<data_dir>/<code>_<period>.csv` (period: daily, 1, 5) when present,
+    otherwise deterministic synthetic bars seeded by the code. Every call
+    sleeps for an exponentially distributed latency with mean `latency_ms`
+    and fails with a ConnectionError with probability `error_rate`.
+    """
+    name = "replay"
+
+    SESSION_MINUTES = [
+        t for start, end in (("09:31", "11:30"), ("13:01", "15:00"))
+        for t in pd.date_range(f"2000-01-01 {start}", f"2000-01-01 {end}", freq="1min").time
+    ]
+
+    def __init__(self, data_dir: str = None, latency_ms: float = None, error_rate: float = None,
+                 seed: int = None, bars: int = None, universe_size: int = None):
+        self.data_dir = data_dir if data_dir is not None else settings.REPLAY_DATA_DIR
+        self.latency_ms = settings.REPLAY_LATENCY_MS if latency_ms is None else latency_ms
+        self.error_rate = settings.REPLAY_ERROR_RATE if error_rate is None else error_rate
+        self.seed = settings.REPLAY_SEED if seed is None else seed
+        self.bars = bars or settings.REPLAY_BARS
+        self.universe_size = universe_size or settings.REPLAY_UNIVERSE_SIZE
+        self._rng = random.Random(self.seed)
+
+    # --- simulation helpers ---
+
+    def _simulate_network(self, endpoint: str):
+        with track_upstream(f"replay_{endpoint}"):
+            if self.latency_ms > 0:
+                time.sleep(self._rng.expovariate(1000.0 / self.latency_ms))
+            if self.error_rate > 0 and self._rng.random() < self.error_rate:
+                raise ConnectionError(f"Connection error injected by replay ({endpoint})")
+
+    def _symbol_rng(self, stock_code: str, salt: str = "") -> np.random.Generator:
+        return np.random.default_rng([self.seed, zlib.crc32(f"{stock_code}{salt}".encode())])
+
+    def _load(self, stock_code: str, period: str):
+        path = os.path.join(self.data_dir, f"{stock_code}_{period}.csv")
+        if self.data_dir and os.path.exists(path):
+            return normalize_bars(pd.read_csv(path))
+        return None
+
+    def _synthetic(self, stock_code: str, index: pd.DatetimeIndex, salt: str) -> pd.DataFrame:
+        """
+        Geometric random walk OHLCV over the given timestamps.
+        """
+        rng = self._symbol_rng(stock_code, salt)
+        n = len(index)
+        start = 5 + (zlib.crc32(stock_code.encode()) % 9500) / 100.0
+        volatility = 0.02 if salt == "daily" else 0.002
+        close = start * np.exp(np.cumsum(rng.normal(0, volatility, n)))
+        open_ = np.concatenate(([start], close[:-1])) * (1 + rng.normal(0, volatility / 4, n))
+        spread = np.abs(rng.normal(0, volatility / 2, n))
+        return pd.DataFrame({
+            "date": index,
+            "open": open_.round(2),
+            "high": (np.maximum(open_, close) * (1 + spread)).round(2),
+            "low": (np.minimum(open_, close) * (1 - spread)).round(2),
+            "close": close.round(2),
+            "volume": rng.integers(10_000, 5_000_000, n).astype(float),
+        })
+
+    def _sessions(self, days: int) -> pd.DatetimeIndex:
+        end = pd.Timestamp(datetime.now().date())
+        return pd.bdate_range(end=end, periods=days)
+
+    # --- provider interface ---
+
+    def get_daily(self, stock_code: str, stock_type: str = "stock", start_date: str = None) -> pd.DataFrame:
+        self._simulate_network("daily")
+        df = self._load(stock_code, "daily")
+        if df is None:
+            df = self._synthetic(stock_code, self._sessions(self.bars), "daily")
+        if start_date:
+            df = df[df["date"] >= pd.Timestamp(start_date)].reset_index(drop=True)
+        return df
+
+    def get_minute(self, stock_code: str, period: str = "1") -> pd.DataFrame:
+        self._simulate_network(f"minute_{period}")
+        df = self._load(stock_code, str(period))
+        if df is None:
+            step = int(period)
+            minutes = self.SESSION_MINUTES[step - 1::step]
+            # Roughly the depth Sina serves: ~1970 bars
+            sessions = self._sessions(max(1, 1970 // len(minutes)))
+            index = pd.DatetimeIndex([datetime.combine(d.date(), t) for d in sessions for t in minutes])
+            df = self._synthetic(stock_code, index, f"minute_{period}")
+        return df
+
+    def universe(self, stock_type: str = "stock") -> list:
+        if stock_type == "etf":
+            return [f"{510000 + i}" for i in range(min(self.universe_size, 1000))]
+        return [f"{600000 + i}" for i in range(self.universe_size)]
+
+    def get_spot(self, stock_type: str = "stock") -> dict:
+        self._simulate_network(f"spot_{stock_type}")
+        # Deterministic per (code, minute) so repeated polls drift slowly
+        minute = int(time.time() // 60)
+        quotes = {}
+        for code in self.universe(stock_type):
+            base = 5 + (zlib.crc32(code.encode()) % 9500) / 100.0
+            drift = ((zlib.crc32(f"{code}{minute}".encode()) % 2001) - 1000) / 50000.0
+            price = round(base * (1 + drift), 2)
+            quotes[code] = {
+                "name": f"SYN{code}", "price": price, "open": base,
+                "high": max(base, price), "low": min(base, price), "volume": 1_000_000.0
+            }
+        return quotes
+
+    def get_symbol_info(self, stock_code: str, stock_type: str = "stock") -> dict:
+        self._simulate_network("symbol_info")
+        return {"code": stock_code, "name": f"SYN{stock_code}"}
+
+    def list_symbols(self, stock_type: str = "stock") -> dict:
+        self._simulate_network(f"list_{stock_type}")
+        return {code: f"SYN{code}" for code in self.universe(stock_type)}
+
+
+class RecordingProvider(MarketDataProvider):
+    """
+    Wraps a provider and writes every bar frame it returns to
+    `<record_dir>/<code>_<period>.csv`, the layout ReplayProvider reads.
+    """
+    def __init__(self, inner: MarketDataProvider, record_dir: str):
+        self.inner = inner
+        self.record_dir = record_dir
+        self.name = f"{inner.name}+record"
+        os.makedirs(record_dir, exist_ok=True)
+
+    def _save(self, df, stock_code: str, period: str):
+        if df is not None and not df.empty:
+            df.to_csv(os.path.join(self.record_dir, f"{stock_code}_{period}.csv"), index=False)
+        return df
+
+    def get_daily(self, stock_code: str, stock_type: str = "stock", start_date: str = None) -> pd.DataFrame:
+        df = self.inner.get_daily(stock_code, stock_type, start_date=start_date)
+        # Tail fetches would overwrite the recording with a fragment
+        return df if start_date else self._save(df, stock_code, "daily")
+
+    def get_minute(self, stock_code: str, period: str = "1") -> pd.DataFrame:
+        return self._save(self.inner.get_minute(stock_code, period), stock_code, str(period))
+
+    def get_spot(self, stock_type: str = "stock") -> dict:
+        return self.inner.get_spot(stock_type)
+
+    def get_symbol_info(self, stock_code: str, stock_type: str = "stock") -> dict:
+        return self.inner.get_symbol_info(stock_code, stock_type)
+
+    def list_symbols(self, stock_type: str = "stock") -> dict:
+        return self.inner.list_symbols(stock_type)
+
+
+PROVIDERS = {
+    "akshare": AkShareProvider,
+    "replay": ReplayProvider,
+}
+
+_provider = None
+
+def get_provider() -> MarketDataProvider:
+    """
+    The configured provider (MARKET_DATA_PROVIDER), created on first use.
+    """
+    global _provider
+    if _provider is None:
+        provider_cls = PROVIDERS.get(settings.MARKET_DATA_PROVIDER)
+        if provider_cls is None:
+            raise ValueError(f"Unknown MARKET_DATA_PROVIDER: {settings.MARKET_DATA_PROVIDER}. "
+                             f"Supported: {', '.join(PROVIDERS)}")
+        _provider = provider_cls()
+        if settings.MARKET_DATA_RECORD_DIR:
+            _provider = RecordingProvider(_provider, settings.MARKET_DATA_RECORD_DIR)
+        logger.info(f"Market data provider: {_provider.name}")
+    return _provider
+
+def set_provider(provider: MarketDataProvider):
+    """
+    Swap the provider at runtime (benchmarks, tests).
+    """
+    global _provider
+    _provider = provider
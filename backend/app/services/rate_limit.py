@@ -0,0 +1,123 @@
+"""
+Token-bucket rate limiting of notifications per user and channel.
+
+A user's `notify_rate_limit` (seconds) is the sustained spacing between
+messages on a channel: the bucket refills at 1/notify_rate_limit tokens per
+second and holds up to NOTIFY_BURST tokens, so short bursts go out at once.
+Buckets live in process memory, or in Redis (RATE_LIMIT_BACKEND=redis) when
+several workers deliver for the same users.
+"""
+import threading
+import time
+from loguru import logger
+from app.core.config import settings
+
+# KEYS[1] bucket; ARGV rate, capacity, now. Returns seconds to wait (0 = token taken).
+ACQUIRE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1]) or capacity
+local ts = tonumber(data[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate) + 60)
+return tostring(wait)
+"""
+
+
+class MemoryBuckets:
+    def __init__(self):
+        self._buckets = {}  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, rate: float, capacity: float, now: float) -> float:
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / rate
+
+    def block(self, key: str, rate: float, seconds: float, now: float):
+        with self._lock:
+            # Negative balance: the next token appears after `seconds`
+            self._buckets[key] = (1 - seconds * rate, now)
+
+
+class RedisBuckets:
+    def __init__(self, client):
+        self.client = client
+        self._acquire = client.register_script(ACQUIRE_SCRIPT)
+
+    def acquire(self, key: str, rate: float, capacity: float, now: float) -> float:
+        return float(self._acquire(keys=[f"ratelimit:{key}"], args=[rate, capacity, now]))
+
+    def block(self, key: str, rate: float, seconds: float, now: float):
+        pipe = self.client.pipeline()
+        pipe.hset(f"ratelimit:{key}", mapping={"tokens": 1 - seconds * rate, "ts": now})
+        pipe.expire(f"ratelimit:{key}", int(seconds) + 60)
+        pipe.execute()
+
+
+class RateLimiter:
+    # Refill rate used for unlimited channels, so blocks still apply to them
+    UNLIMITED_RATE = 1000.0
+
+    def __init__(self, burst: int = None):
+        self.burst = burst or settings.NOTIFY_BURST
+        self._memory = MemoryBuckets()
+        self._redis = None
+
+    def _backend(self):
+        if settings.RATE_LIMIT_BACKEND == "redis":
+            if self._redis is None:
+                from app.core.queue import alarm_queue
+                if alarm_queue.client is not None:
+                    self._redis = RedisBuckets(alarm_queue.client)
+            if self._redis is not None:
+                return self._redis
+        return self._memory
+
+    @staticmethod
+    def _key(user_id, channel: str) -> str:
+        return f"{user_id}:{channel}"
+
+    def _rate(self, interval: float) -> float:
+        return 1.0 / interval if interval and interval > 0 else self.UNLIMITED_RATE
+
+    def try_acquire(self, user_id, channel: str, interval: float) -> float:
+        """
+        Take a token if available. Returns 0, or the seconds until one is.
+        An interval of 0/None means unlimited (but blocks still apply).
+        """
+        args = (self._key(user_id, channel), self._rate(interval), self.burst, time.time())
+        try:
+            return self._backend().acquire(*args)
+        except Exception as e:
+            logger.warning(f"Rate limiter backend failed, using memory: {e}")
+            return self._memory.acquire(*args)
+
+    def block(self, user_id, channel: str, seconds: float, interval: float = None):
+        """
+        Hold a channel for `seconds` (e.g. Telegram retry_after). Pass the
+        same interval used with try_acquire.
+        """
+        args = (self._key(user_id, channel), self._rate(interval), seconds, time.time())
+        try:
+            self._backend().block(*args)
+        except Exception as e:
+            logger.warning(f"Rate limiter backend failed, using memory: {e}")
+            self._memory.block(*args)
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,252 @@
+"""
+Realtime ingestion: polls batched spot quotes during trading hours, keeps a
+ring buffer of ticks per symbol and evaluates strategies intrabar on a
+provisional current bar, so alerts fire within seconds of a threshold
+crossing instead of on the next scan cycle.
+"""
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, date
+import pandas as pd
+from loguru import logger
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import UserStock, UserStrategy
+from app.services.market_data import MarketDataService
+from app.services.signal import SignalEngine
+from app.services.trading_hours import TradingHours
+from app.services.scanner import build_alarm, emit_alarm
+from app.services.indicator import IndicatorService
+from app.services.signal_state import signal_state
+from app.services.trigger_levels import trigger_levels
+from app.services.resample import base_period, resample_bars
+from app.services.memory_budget import estimate_bytes, memory_budget
+
+# Estimated size of one buffered tick: a tuple of two floats and a volume
+TICK_BYTES = sys.getsizeof((0.0, 0.0, 0.0)) + 3 * sys.getsizeof(0.0)
+# Eviction cost relative to other pools: dropped ticks are not refetched
+EVICTION_COST = 4.0
+
+# Candidate column names per field (AkShare frames use English or Chinese headers)
+FIELD_COLUMNS = {
+    "date": ("date", "day", "日期"),
+    "open": ("open", "开盘"),
+    "high": ("high", "最高"),
+    "low": ("low", "最低"),
+    "close": ("close", "收盘"),
+    "volume": ("volume", "成交量"),
+}
+
+def _column(df: pd.DataFrame, field: str):
+    for col in FIELD_COLUMNS[field]:
+        if col in df.columns:
+            return col
+    return None
+
+
+class RealtimeIngestor:
+    def __init__(self, buffer_size: int = None):
+        self.buffer_size = buffer_size or settings.REALTIME_BUFFER_SIZE
+        self.ticks = {}   # code -> deque[(epoch, price, cumulative volume)]
+        self.quotes = {}  # code -> latest spot quote (with "ts")
+        self._lock = threading.Lock()
+
+    def ingest(self, quotes: dict, ts: float = None):
+        """
+        Append spot quotes ({code: {"price", "open", "high", "low", "volume"}})
+        to the per-symbol ring buffers.
+        """
+        ts = ts or time.time()
+        with self._lock:
+            for code, quote in quotes.items():
+                buf = self.ticks.get(code)
+                if buf is None:
+                    buf = self.ticks[code] = deque(maxlen=self.buffer_size)
+                buf.append((ts, float(quote["price"]), quote.get("volume")))
+                self.quotes[code] = dict(quote, ts=ts)
+
+    def latest(self, code: str):
+        return self.quotes.get(code)
+
+    def memory_entries(self) -> list:
+        with self._lock:
+            return [(code, code, None, len(buf) * TICK_BYTES + estimate_bytes(self.quotes.get(code)),
+                     buf[-1][0] if buf else None) for code, buf in self.ticks.items()]
+
+    def evict(self, code: str) -> int:
+        """Drop a symbol's ticks and quote; its buffer refills from the next quote."""
+        with self._lock:
+            buf = self.ticks.pop(code, None)
+            quote = self.quotes.pop(code, None)
+        return (len(buf) * TICK_BYTES if buf else 0) + estimate_bytes(quote)
+
+    def provisional_bar(self, code: str, period: str, bar_start: float = None):
+        """
+        The still-forming bar for a symbol, or None without ticks.
+        `period` is a base period: daily uses the session open/high/low from
+        the spot quote; minute periods aggregate buffered ticks newer than
+        bar_start (epoch).
+        """
+        quote = self.quotes.get(code)
+        if not quote:
+            return None
+        if str(period) == "daily":
+            return {
+                "open": quote.get("open"),
+                "high": quote.get("high"),
+                "low": quote.get("low"),
+                "close": quote["price"],
+                "volume": quote.get("volume"),
+                "time": datetime.fromtimestamp(quote["ts"])
+            }
+
+        ticks = [t for t in self.ticks.get(code, ()) if bar_start is None or t[0] > bar_start]
+        if not ticks:
+            return None
+        prices = [t[1] for t in ticks]
+        volume = None
+        if ticks[0][2] is not None and ticks[-1][2] is not None:
+            # Spot volume is cumulative for the session
+            volume = ticks[-1][2] - ticks[0][2]
+        return {
+            "open": prices[0],
+            "high": max(prices),
+            "low": min(prices),
+            "close": prices[-1],
+            "volume": volume,
+            "time": datetime.fromtimestamp(ticks[-1][0])
+        }
+
+    @staticmethod
+    def provisional_frame(df: pd.DataFrame, bar: dict, period: str) -> pd.DataFrame:
+        """
+        Copy of base-period df ending in the provisional bar. For daily bars a
+        last row from the same trading day is replaced; otherwise a row is appended.
+        """
+        date_col = _column(df, "date")
+        last_value = df.iloc[-1][date_col] if date_col else None
+        same_bar = (
+            str(period) == "daily"
+            and last_value is not None
+            and pd.Timestamp(last_value).date() == bar["time"].date()
+        )
+
+        row = df.iloc[-1].copy()
+        for field in ("open", "high", "low", "close", "volume"):
+            col = _column(df, field)
+            if col is not None and bar.get(field) is not None:
+                row[col] = bar[field]
+        if date_col:
+            # Keep the frame's own date representation
+            if isinstance(last_value, str):
+                row[date_col] = bar["time"].strftime("%Y-%m-%d %H:%M:%S")
+            elif isinstance(last_value, date) and not isinstance(last_value, datetime):
+                row[date_col] = bar["time"].date()
+            else:
+                row[date_col] = pd.Timestamp(bar["time"])
+
+        if same_bar:
+            frame = df.iloc[:-1]
+        else:
+            frame = df
+        out = pd.concat([frame, pd.DataFrame([row.to_dict()], columns=df.columns)], ignore_index=True)
+        out.attrs.update(df.attrs)
+        return out
+
+    def evaluate(self, db, stock, strategy):
+        """
+        Evaluate one strategy on the provisional bar and push an alarm if it
+        triggers. Returns the alarm dict or None.
+        """
+        period = strategy.rsi_period
+        base = base_period(period)
+        if base is None:
+            return None
+        daily = base == "daily"
+        # Work on the base series and resample after patching in the
+        # provisional bar, so weekly/30m/4h bars include the forming bar too.
+        # Completed daily bars do not change intraday, so a long max_age is safe
+        df = MarketDataService.get_history_data(
+            stock.stock_code, period=base, stock_type=stock.stock_type,
+            max_age=settings.HISTORY_CACHE_TTL_CLOSED if daily else None
+        )
+        if df is None or df.empty:
+            return None
+
+        bar_start = None
+        if not daily:
+            last_close = MarketDataService.get_bar_close_time(df, period=base)
+            bar_start = last_close.timestamp() if last_close else None
+        bar = self.provisional_bar(stock.stock_code, base, bar_start=bar_start)
+        if bar is None:
+            return None
+
+        # Daily RSI strategies: compare the spot price with the precomputed
+        # trigger prices and only rebuild the series when one is crossed
+        if str(period) == "daily":
+            levels = trigger_levels.get(strategy, df)
+            if levels is not None and levels.check(bar["close"]) is None:
+                signal_state.step(strategy, None, levels.rsi_at(bar["close"]),
+                                  levels.rsi_thresholds(strategy, bar["close"]))
+                return None
+
+        frame = self.provisional_frame(df, bar, base)
+        if str(period) != base:
+            frame = resample_bars(frame, period, base=base)
+            frame.attrs.update(df.attrs, period=str(period))
+        signal_result = SignalEngine.check_signal(frame, strategy)
+        computed_ts = time.time()
+        rsi = signal_result['rsi'] if signal_result else IndicatorService.calculate_rsi(frame, length=strategy.rsi_length)
+        if not signal_state.step(strategy, signal_result, rsi, SignalEngine.effective_thresholds(frame, strategy)):
+            return None
+
+        signal_result['reason'] += " (intrabar)"
+        alarm_data = build_alarm(stock, strategy, signal_result, frame, computed_ts)
+        alarm_data["intrabar"] = True
+        # Provisional until the bar closes: informational unless it is a strong
+        # signal. Under backpressure it is digested rather than dropped (see AlarmQueue)
+        if alarm_data["priority"] != "strong":
+            alarm_data["priority"] = "info"
+        return alarm_data if emit_alarm(db, strategy, alarm_data) else None
+
+    def poll_once(self):
+        """
+        Scheduler job: fetch spot quotes for all watched symbols (one batched
+        call per stock type) and evaluate their strategies intrabar.
+        """
+        if not TradingHours.is_trading_time():
+            return
+
+        db = SessionLocal()
+        try:
+            stocks = db.query(UserStock).all()
+            if not stocks:
+                return
+            strategies = {s.stock_code: s for s in db.query(UserStrategy).all()}
+
+            for stock_type in {s.stock_type or "stock" for s in stocks}:
+                codes = {s.stock_code for s in stocks if (s.stock_type or "stock") == stock_type}
+                try:
+                    snapshot = MarketDataService.get_spot_snapshot(stock_type)
+                except Exception as e:
+                    logger.warning(f"Spot snapshot failed for {stock_type}: {e}")
+                    continue
+                self.ingest({code: q for code, q in snapshot.items() if code in codes})
+
+            for stock in stocks:
+                strategy = strategies.get(stock.stock_code)
+                if not strategy:
+                    continue
+                try:
+                    self.evaluate(db, stock, strategy)
+                except Exception as e:
+                    logger.error(f"Intrabar evaluation failed for {stock.stock_code}: {e}")
+            signal_state.checkpoint(db)
+        finally:
+            db.close()
+
+
+realtime_ingestor = RealtimeIngestor()
+memory_budget.register("ticks", realtime_ingestor, cost=EVICTION_COST)
@@ -0,0 +1,110 @@
+"""
+Bar normalization and local timeframe resampling.
+
+Weekly, monthly and custom multi-day bars ("3d") are derived from cached
+daily bars and "4h" bars from cached 60-minute bars, so those timeframes
+cost a groupby instead of an upstream fetch.
+
+15/30/60-minute bars are fetched upstream as-is: minute sources serve a
+fixed number of bars (about 1970 on Sina) whatever the period, so 60-minute
+bars resampled from 5-minute ones would only reach back ~160 bars, less
+than an RSI warm-up plus the trend filter's MA60 needs.
+"""
+import re
+import numpy as np
+import pandas as pd
+
+BAR_COLUMNS = ["date", "open", "high", "low", "close", "volume"]
+
+# Source column names -> normalized names
+COLUMN_ALIASES = {
+    "day": "date", "日期": "date", "时间": "date",
+    "开盘": "open", "最高": "high", "最低": "low", "收盘": "close", "成交量": "volume",
+}
+
+AGGREGATIONS = {
+    "date": "last",
+    "open": "first",
+    "high": "max",
+    "low": "min",
+    "close": "last",
+    "volume": "sum",
+}
+
+# Periods fetched upstream as-is
+NATIVE_PERIODS = ("daily", "1", "5", "15", "30", "60")
+INTRADAY_BASE = "60"
+# Minutes per intraday bar
+INTRADAY_MINUTES = {"15": 15, "30": 30, "60": 60, "4h": 240}
+_MULTI_DAY = re.compile(r"^(\d+)d$")
+
+
+def normalize_bars(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Common bar schema: date (datetime64), open, high, low, close, volume (float).
+    Accepts Sina (English) and EastMoney (Chinese) column layouts.
+    """
+    if df is None or df.empty:
+        return df
+    out = df.rename(columns=COLUMN_ALIASES)
+    out = out[[c for c in BAR_COLUMNS if c in out.columns]].copy()
+    if "date" in out.columns:
+        out["date"] = pd.to_datetime(out["date"], errors="coerce")
+    for col in BAR_COLUMNS[1:]:
+        if col in out.columns:
+            out[col] = pd.to_numeric(out[col], errors="coerce")
+    return out.reset_index(drop=True)
+
+
+def base_period(period: str) -> str:
+    """
+    The upstream period a requested period is derived from (None if unsupported).
+    """
+    period = str(period)
+    if period in NATIVE_PERIODS:
+        return period
+    if period in ("weekly", "monthly") or _MULTI_DAY.match(period):
+        return "daily"
+    if period in INTRADAY_MINUTES:
+        return INTRADAY_BASE
+    return None
+
+
+def _aggregate(df: pd.DataFrame, keys) -> pd.DataFrame:
+    aggs = {col: how for col, how in AGGREGATIONS.items() if col in df.columns}
+    return df.groupby(keys, sort=True).agg(aggs).reset_index(drop=True)
+
+
+def resample_bars(df: pd.DataFrame, period: str, base: str = None) -> pd.DataFrame:
+    """
+    Aggregate normalized bars into `period`. Each output bar is stamped with
+    the date of its last constituent bar, so a still-forming week/month ends
+    on the latest bar rather than on a future period end.
+    """
+    period = str(period)
+    base = base or base_period(period)
+    if df is None or df.empty or period == base:
+        return df
+
+    dates = df["date"]
+    if period == "weekly":
+        iso = dates.dt.isocalendar()
+        return _aggregate(df, [iso["year"].values, iso["week"].values])
+    if period == "monthly":
+        return _aggregate(df, [dates.dt.year.values, dates.dt.month.values])
+
+    match = _MULTI_DAY.match(period)
+    if match:
+        # N trading days per bar, aligned so the last bar is the current one
+        n = int(match.group(1))
+        groups = -((len(df) - 1 - np.arange(len(df))) // n)
+        return _aggregate(df, groups)
+
+    if period in INTRADAY_MINUTES:
+        # N base bars per output bar, counted from each session's open
+        n = INTRADAY_MINUTES[period] // int(base)
+        day = dates.dt.normalize()
+        position = df.groupby(day).cumcount()
+        return _aggregate(df, [day.values, (position // n).values])
+
+    raise ValueError(f"Unsupported period: {period}")
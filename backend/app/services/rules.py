@@ -0,0 +1,445 @@
+"""
+Strategy rule DSL.
+
+    rsi(14) < 30 and close < bb_lower(20, 2) and macd_hist > 0
+
+Grammar (lowest to highest precedence):
+    or / and / not, comparisons (< <= > >= == !=), + -, * /, unary -,
+    numbers, bar columns (open high low close volume), indicator calls and
+    crosses_above(a, b) / crosses_below(a, b). Indicator calls may omit
+    their arguments to use the defaults (`macd_hist` == `macd_hist(12,26,9)`).
+
+A rule is parsed once (compile_rule is cached by its text) into a graph of
+nodes. Every node has a canonical key, so identical sub-expressions share a
+node: `bb_lower(20,2)` and `bb_upper(20,2)` both read one
+`bbands_frame(20,2.0)` node. Multi-output indicators have their own `_frame`
+keys, so an output named like its indicator (`macd`) is a distinct node.
+Nodes evaluate to whole Series; a rule fires when its value at the last bar
+is true. A RuleContext memoizes node values for one frame, and the
+indicator series themselves are memoized by data fingerprint, so every
+strategy watching a symbol shares the computation for the current bar.
+"""
+import math
+import operator
+import re
+from functools import lru_cache
+import pandas as pd
+from app.services.indicator import IndicatorService
+
+
+class RuleError(ValueError):
+    """Raised for rules that do not parse or type-check."""
+
+
+# Name -> (indicator, output field, default parameters)
+FUNCTIONS = {
+    "rsi": ("rsi", None, (14,)),
+    "ma": ("sma", None, (20,)),
+    "sma": ("sma", None, (20,)),
+    "ema": ("ema", None, (20,)),
+    "bb_lower": ("bbands", "lower", (20, 2.0)),
+    "bb_mid": ("bbands", "mid", (20, 2.0)),
+    "bb_upper": ("bbands", "upper", (20, 2.0)),
+    "macd": ("macd", "macd", (12, 26, 9)),
+    "macd_signal": ("macd", "signal", (12, 26, 9)),
+    "macd_hist": ("macd", "hist", (12, 26, 9)),
+}
+
+INDICATORS = {
+    "rsi": IndicatorService.rsi_series,
+    "sma": IndicatorService.sma_series,
+    "ema": IndicatorService.ema_series,
+    "bbands": IndicatorService.bbands_frame,
+    "macd": IndicatorService.macd_frame,
+}
+
+# Indicators returning a DataFrame of several outputs
+FRAME_INDICATORS = ("bbands", "macd")
+
+COLUMNS = ("open", "high", "low", "close", "volume")
+
+CROSSES = ("crosses_above", "crosses_below")
+
+COMPARISONS = {
+    "<": operator.lt, "<=": operator.le, ">": operator.gt,
+    ">=": operator.ge, "==": operator.eq, "!=": operator.ne,
+}
+
+ARITHMETIC = {
+    "+": operator.add, "-": operator.sub, "*": operator.mul, "/": operator.truediv,
+}
+
+TOKEN_RE = re.compile(r"\s*(?:(\d+\.\d*|\.\d+|\d+)|([A-Za-z_]\w*)|(<=|>=|==|!=|[<>+\-*/(),]))")
+
+
+def _shift(value):
+    return value.shift(1) if isinstance(value, pd.Series) else value
+
+
+def _as_bool(value):
+    return value.fillna(False).astype(bool) if isinstance(value, pd.Series) else bool(value)
+
+
+# --- Nodes ---
+
+class Node:
+    """
+    A vertex of the rule graph. `kind` is "number" or "bool"; `key` is the
+    canonical text of the sub-expression and identifies its value.
+    """
+    kind = "number"
+    key = ""
+    children = ()
+
+    def evaluate(self, ctx):
+        raise NotImplementedError
+
+
+class Const(Node):
+    def __init__(self, value: float):
+        self.value = value
+        self.key = repr(value)
+
+    def evaluate(self, ctx):
+        return self.value
+
+
+class Column(Node):
+    def __init__(self, name: str):
+        self.name = name
+        self.key = name
+
+    def evaluate(self, ctx):
+        df = ctx.df
+        if self.name == "close":
+            return IndicatorService._close_series(df)
+        if self.name not in df.columns:
+            raise RuleError(f"Bars have no '{self.name}' column")
+        return pd.to_numeric(df[self.name], errors="coerce")
+
+
+class Indicator(Node):
+    """
+    Full indicator output for one parameter set: a Series, or a DataFrame
+    for multi-output indicators (read through Output nodes).
+    """
+    def __init__(self, name: str, params: tuple):
+        self.name = name
+        self.params = params
+        suffix = "_frame" if name in FRAME_INDICATORS else ""
+        self.key = f"{name}{suffix}({','.join(map(str, params))})"
+
+    def evaluate(self, ctx):
+        value = INDICATORS[self.name](ctx.df, *self.params)
+        if value is None and self.name not in FRAME_INDICATORS:
+            # Not enough bars for the indicator: comparisons come out False
+            return math.nan
+        return value
+
+
+class Output(Node):
+    """One column of a multi-output indicator."""
+    def __init__(self, label: str, source: Indicator, field: str):
+        self.source = source
+        self.field = field
+        self.children = (source,)
+        self.key = f"{label}({','.join(map(str, source.params))})"
+
+    def evaluate(self, ctx):
+        value = ctx.value(self.source)
+        if value is None:
+            # Not enough bars for the indicator
+            return math.nan
+        return value[self.field]
+
+
+class Op(Node):
+    def __init__(self, op: str, kind: str, children: tuple, key: str):
+        self.op = op
+        self.kind = kind
+        self.children = children
+        self.key = key
+
+    def evaluate(self, ctx):
+        values = [ctx.value(child) for child in self.children]
+        if self.op in ARITHMETIC:
+            return ARITHMETIC[self.op](*values)
+        if self.op in COMPARISONS:
+            return COMPARISONS[self.op](*values)
+        if self.op == "neg":
+            return -values[0]
+        if self.op == "not":
+            return ~values[0] if isinstance(values[0], pd.Series) else not values[0]
+        if self.op == "and":
+            return _as_bool(values[0]) & _as_bool(values[1])
+        if self.op == "or":
+            return _as_bool(values[0]) | _as_bool(values[1])
+        a, b = values
+        if self.op == "crosses_above":
+            return (a > b) & (_shift(a) <= _shift(b))
+        return (a < b) & (_shift(a) >= _shift(b))
+
+
+# --- Parser ---
+
+class _Parser:
+    """
+    Recursive descent over the token list. Nodes are interned by key so a
+    repeated sub-expression is one node.
+    """
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = self._tokenize(text)
+        self.pos = 0
+        self.nodes = {}
+
+    def _tokenize(self, text: str) -> list:
+        tokens = []
+        pos = 0
+        text = text.rstrip()
+        while pos < len(text):
+            match = TOKEN_RE.match(text, pos)
+            if not match:
+                raise RuleError(f"Unexpected character {text[pos:].lstrip()[:1]!r} at position {pos}")
+            number, name, symbol = match.groups()
+            if number is not None:
+                tokens.append(("number", number))
+            elif name is not None:
+                tokens.append(("name", name.lower()))
+            else:
+                tokens.append(("op", symbol))
+            pos = match.end()
+        tokens.append(("end", ""))
+        return tokens
+
+    def _peek(self):
+        return self.tokens[self.pos]
+
+    def _next(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def _accept(self, value: str) -> bool:
+        kind, text = self._peek()
+        if kind in ("op", "name") and text == value:
+            self.pos += 1
+            return True
+        return False
+
+    def _expect(self, value: str):
+        if not self._accept(value):
+            found = self._peek()[1] or "end of rule"
+            raise RuleError(f"Expected '{value}' but found '{found}'")
+
+    def _intern(self, node: Node) -> Node:
+        return self.nodes.setdefault(node.key, node)
+
+    def _op(self, op: str, kind: str, operands: tuple, key: str, operand_kind: str) -> Node:
+        for operand in operands:
+            if operand.kind != operand_kind:
+                raise RuleError(f"'{op}' expects {operand_kind} operands, got '{operand.key}'")
+        return self._intern(Op(op, kind, operands, key))
+
+    def parse(self) -> Node:
+        if self._peek()[0] == "end":
+            raise RuleError("Rule is empty")
+        node = self._or()
+        if self._peek()[0] != "end":
+            raise RuleError(f"Unexpected '{self._peek()[1]}'")
+        if node.kind != "bool":
+            raise RuleError("Rule must be a condition (use a comparison such as 'rsi(14) < 30')")
+        return node
+
+    def _or(self) -> Node:
+        node = self._and()
+        while self._accept("or"):
+            right = self._and()
+            node = self._op("or", "bool", (node, right), f"({node.key} or {right.key})", "bool")
+        return node
+
+    def _and(self) -> Node:
+        node = self._not()
+        while self._accept("and"):
+            right = self._not()
+            node = self._op("and", "bool", (node, right), f"({node.key} and {right.key})", "bool")
+        return node
+
+    def _not(self) -> Node:
+        if self._accept("not"):
+            operand = self._not()
+            return self._op("not", "bool", (operand,), f"(not {operand.key})", "bool")
+        return self._comparison()
+
+    def _comparison(self) -> Node:
+        node = self._sum()
+        kind, text = self._peek()
+        if kind == "op" and text in COMPARISONS:
+            self._next()
+            right = self._sum()
+            node = self._op(text, "bool", (node, right), f"({node.key} {text} {right.key})", "number")
+        return node
+
+    def _sum(self) -> Node:
+        node = self._term()
+        while self._peek()[0] == "op" and self._peek()[1] in ("+", "-"):
+            op = self._next()[1]
+            right = self._term()
+            node = self._op(op, "number", (node, right), f"({node.key} {op} {right.key})", "number")
+        return node
+
+    def _term(self) -> Node:
+        node = self._unary()
+        while self._peek()[0] == "op" and self._peek()[1] in ("*", "/"):
+            op = self._next()[1]
+            right = self._unary()
+            node = self._op(op, "number", (node, right), f"({node.key} {op} {right.key})", "number")
+        return node
+
+    def _unary(self) -> Node:
+        if self._accept("-"):
+            operand = self._unary()
+            if isinstance(operand, Const):
+                return self._intern(Const(-operand.value))
+            return self._op("neg", "number", (operand,), f"(-{operand.key})", "number")
+        return self._atom()
+
+    def _atom(self) -> Node:
+        kind, text = self._next()
+        if kind == "number":
+            return self._intern(Const(float(text)))
+        if kind == "op" and text == "(":
+            node = self._or()
+            self._expect(")")
+            return node
+        if kind == "name":
+            if text in COLUMNS:
+                return self._intern(Column(text))
+            if text in FUNCTIONS:
+                return self._function(text)
+            if text in CROSSES:
+                return self._cross(text)
+            raise RuleError(f"Unknown name '{text}'. Known: {', '.join(COLUMNS + tuple(FUNCTIONS) + CROSSES)}")
+        raise RuleError(f"Unexpected '{text or 'end of rule'}'")
+
+    def _arguments(self) -> list:
+        args = []
+        if self._accept("("):
+            if not self._accept(")"):
+                args.append(self._or())
+                while self._accept(","):
+                    args.append(self._or())
+                self._expect(")")
+        return args
+
+    def _function(self, name: str) -> Node:
+        indicator, field, defaults = FUNCTIONS[name]
+        args = self._arguments()
+        if len(args) > len(defaults):
+            raise RuleError(f"{name}() takes at most {len(defaults)} arguments")
+        params = []
+        for i, default in enumerate(defaults):
+            if i >= len(args):
+                params.append(default)
+                continue
+            if not isinstance(args[i], Const):
+                raise RuleError(f"{name}() arguments must be numbers")
+            value = args[i].value
+            if isinstance(default, int):
+                if value != int(value) or value < 1:
+                    raise RuleError(f"{name}() lengths must be positive integers")
+                value = int(value)
+            params.append(value)
+        source = self._intern(Indicator(indicator, tuple(params)))
+        if field is None:
+            return source
+        return self._intern(Output(name, source, field))
+
+    def _cross(self, name: str) -> Node:
+        args = self._arguments()
+        if len(args) != 2:
+            raise RuleError(f"{name}() takes exactly 2 arguments")
+        a, b = args
+        return self._op(name, "bool", (a, b), f"{name}({a.key}, {b.key})", "number")
+
+
+class Rule:
+    """
+    A compiled rule: the root node, the indicators it computes and the
+    indicator outputs it reads (reported in alarm details).
+    """
+    def __init__(self, text: str, root: Node, nodes: dict):
+        self.text = text
+        self.root = root
+        self.indicators = [node for node in nodes.values() if isinstance(node, Indicator)]
+        self.outputs = [
+            node for node in nodes.values()
+            if isinstance(node, (Output, Column)) or (isinstance(node, Indicator) and node.name not in FRAME_INDICATORS)
+        ]
+
+    def __repr__(self):
+        return f"Rule({self.text!r})"
+
+
+@lru_cache(maxsize=1024)
+def compile_rule(text: str) -> Rule:
+    """
+    Parse and type-check a rule. Raises RuleError with a readable message.
+    """
+    if text is None or not text.strip():
+        raise RuleError("Rule is empty")
+    parser = _Parser(text)
+    root = parser.parse()
+    return Rule(text.strip(), root, parser.nodes)
+
+
+# --- Evaluation ---
+
+_MISSING = object()
+
+class RuleContext:
+    """
+    Node values for one bar frame. Share a context between all rules
+    evaluated against the same frame.
+    """
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.values = {}
+
+    def value(self, node: Node):
+        value = self.values.get(node.key, _MISSING)
+        if value is _MISSING:
+            value = node.evaluate(self)
+            self.values[node.key] = value
+        return value
+
+    @staticmethod
+    def _last(value):
+        if isinstance(value, pd.Series):
+            return value.iloc[-1] if len(value) else math.nan
+        return value
+
+    def test(self, rule: Rule) -> bool:
+        """
+        True if the rule holds at the last bar.
+        """
+        value = self._last(self.value(rule.root))
+        return bool(value) if not pd.isna(value) else False
+
+    def snapshot(self, rule: Rule) -> dict:
+        """
+        Last-bar values of the indicator outputs a rule reads.
+        """
+        values = {}
+        for node in rule.outputs:
+            value = self._last(self.value(node))
+            values[node.key] = None if pd.isna(value) else float(value)
+        return values
+
+
+def evaluate_rules(df: pd.DataFrame, rules: list) -> list:
+    """
+    Evaluate several rules against one frame, computing shared nodes once.
+    """
+    ctx = RuleContext(df)
+    return [ctx.test(rule) for rule in rules]
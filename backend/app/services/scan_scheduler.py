@@ -0,0 +1,169 @@
+"""
+Adaptive scan scheduling: poll each strategy as often as it could plausibly
+trigger.
+
+After every evaluation a strategy gets a poll interval from how far its RSI
+is from the nearest effective threshold, in units of its recent RSI
+volatility. RSI moves roughly like a random walk, so covering a distance of
+z standard deviations takes about z^2 bars:
+
+    interval = bar_seconds * (distance / (SCAN_SAFETY_SIGMAS * sigma_bar))^2
+
+clamped to [SCAN_MIN_INTERVAL, SCAN_MAX_INTERVAL]. With a typical daily RSI
+volatility of 4 points, a strategy 1 point from rsi_low is polled about
+every 100s, and one at RSI 50 only every SCAN_MAX_INTERVAL.
+Strategies without a distance (rule-based, no RSI yet, or already beyond a
+threshold) use the minimum interval, and so does a strategy whose settings
+changed since its last poll.
+
+Each cycle, strategies whose interval has elapsed are due and are polled
+most-overdue first (elapsed / interval, so staleness raises priority),
+up to SCAN_REQUEST_BUDGET per cycle. Due strategies over the budget stay
+due and move up on the next cycle.
+"""
+import threading
+import time
+import numpy as np
+from app.core.config import settings
+from app.services.indicator import IndicatorService
+from app.services.resample import INTRADAY_MINUTES
+from app.services.trigger_levels import TREND_ADJUSTMENT
+
+# Seconds of trading per daily bar (09:30-11:30, 13:00-15:00)
+SESSION_SECONDS = 4 * 3600
+# Bars of RSI changes used for the volatility estimate
+VOLATILITY_WINDOW = 20
+
+
+def bar_seconds(period: str) -> float:
+    """Trading seconds one bar of `period` spans."""
+    period = str(period)
+    if period.isdigit():
+        return int(period) * 60
+    if period in INTRADAY_MINUTES:
+        return INTRADAY_MINUTES[period] * 60
+    if period == "weekly":
+        return 5 * SESSION_SECONDS
+    if period == "monthly":
+        return 21 * SESSION_SECONDS
+    if period.endswith("d") and period[:-1].isdigit():
+        return int(period[:-1]) * SESSION_SECONDS
+    return SESSION_SECONDS
+
+
+def threshold_distance(strategy, rsi: float):
+    """
+    RSI points to the nearest threshold the strategy can trigger at, 0 if
+    already beyond one, None for rule-based strategies. With the trend filter
+    the buy threshold may be raised by TREND_ADJUSTMENT, so that bound is used.
+    """
+    if rsi is None or getattr(strategy, "buy_rule", None) or getattr(strategy, "sell_rule", None):
+        return None
+    low = strategy.rsi_low + (TREND_ADJUSTMENT if strategy.enable_trend_filter else 0)
+    return max(0.0, min(rsi - low, strategy.rsi_high - rsi))
+
+
+def rsi_volatility(df, length: int):
+    """Standard deviation of bar-to-bar RSI changes over the recent window."""
+    rsi = IndicatorService.rsi_series(df, length=length)
+    if rsi is None:
+        return None
+    moves = np.diff(rsi.dropna().to_numpy()[-(VOLATILITY_WINDOW + 1):])
+    if len(moves) < 2:
+        return None
+    return float(np.std(moves))
+
+
+def _settings_key(strategy) -> tuple:
+    return (strategy.rsi_low, strategy.rsi_high, strategy.rsi_period, strategy.rsi_length,
+            bool(strategy.enable_trend_filter),
+            getattr(strategy, "buy_rule", None), getattr(strategy, "sell_rule", None))
+
+
+def poll_interval(distance, sigma, period: str) -> float:
+    if distance is None or not sigma:
+        return settings.SCAN_MIN_INTERVAL
+    seconds = bar_seconds(period) * (distance / (settings.SCAN_SAFETY_SIGMAS * sigma)) ** 2
+    return min(settings.SCAN_MAX_INTERVAL, max(settings.SCAN_MIN_INTERVAL, seconds))
+
+
+class ScanScheduler:
+    def __init__(self):
+        # strategy id -> {"polled_at", "interval", "distance", "sigma", "key"}
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.last_cycle = {}
+
+    def plan(self, items: list, now: float = None) -> tuple:
+        """
+        Split [(stock, strategy), ...] into (due within budget, deferred),
+        the former ordered most-overdue first.
+        """
+        now = time.time() if now is None else now
+        scored = []
+        deferred = []
+        with self._lock:
+            for item in items:
+                entry = self._entries.get(item[1].id)
+                if entry is None or entry["key"] != _settings_key(item[1]):
+                    # Never polled with these settings: infinitely overdue
+                    scored.append((float("inf"), item))
+                    continue
+                overdue = (now - entry["polled_at"]) / entry["interval"]
+                if overdue >= 1:
+                    scored.append((overdue, item))
+                else:
+                    deferred.append(item)
+        scored.sort(key=lambda pair: pair[0], reverse=True)
+        budget = settings.SCAN_REQUEST_BUDGET
+        due = [item for _, item in scored[:budget]]
+        deferred.extend(item for _, item in scored[budget:])
+        self.last_cycle = {"due": len(scored), "polled": len(due), "deferred": len(deferred),
+                           "over_budget": max(0, len(scored) - budget)}
+        return due, deferred
+
+    def record(self, strategy, df=None, rsi: float = None, now: float = None) -> float:
+        """
+        Note a poll of `strategy` and set its next interval from the data.
+        Without data (fetch failed) it is retried at the minimum interval.
+        """
+        now = time.time() if now is None else now
+        distance = threshold_distance(strategy, rsi)
+        sigma = None
+        if distance and df is not None:
+            sigma = rsi_volatility(df, strategy.rsi_length or 14)
+        interval = poll_interval(distance, sigma, strategy.rsi_period)
+        with self._lock:
+            self._entries[strategy.id] = {"polled_at": now, "interval": interval,
+                                          "distance": distance, "sigma": sigma,
+                                          "key": _settings_key(strategy)}
+        return interval
+
+    def max_age(self, strategy):
+        """
+        Bar age acceptable when polling `strategy`: its interval, so data
+        another caller refreshed since the last poll is reused.
+        """
+        entry = self._entries.get(strategy.id)
+        return entry["interval"] if entry is not None else None
+
+    def forget(self, strategy_id=None):
+        with self._lock:
+            if strategy_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(strategy_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            intervals = sorted(entry["interval"] for entry in self._entries.values())
+        return {
+            "strategies": len(intervals),
+            "min_interval": intervals[0] if intervals else None,
+            "median_interval": intervals[len(intervals) // 2] if intervals else None,
+            "at_min_interval": sum(1 for i in intervals if i <= settings.SCAN_MIN_INTERVAL),
+            "last_cycle": self.last_cycle,
+        }
+
+
+scan_scheduler = ScanScheduler()
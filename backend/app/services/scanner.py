@@ -2,6 +2,7 @@ from app.services.market_data import MarketDataService
 from app.services.indicator import IndicatorService
 from app.services.signal import SignalEngine
 from app.core.queue import alarm_queue
+from app.core.config import settings
 from app.core.database import SessionLocal
 from app.models import UserStock, UserStrategy
 from datetime import datetime
@@ -9,6 +10,10 @@ from loguru import logger
 import time
 import random
 from app.services.trading_hours import TradingHours, get_market_status
+from app.services.signal_state import signal_state
+from app.services.scan_scheduler import scan_scheduler
+from app.services import versions
+from app.core.metrics import SCAN_CYCLE, SCAN_SYMBOLS, DB_LATENCY, ALARMS_PUSHED, log_sampled
 
 def scan_stocks():
     logger.info("Scanning stocks...")
@@ -29,37 +34,42 @@ def scan_stocks():
             f"Scanning will use historical data only (no real-time prices)."
         )
     
+    cycle_start = time.perf_counter()
     db = SessionLocal()
     try:
         # Get all monitored stocks
-        stocks = db.query(UserStock).all()
+        with DB_LATENCY.labels(operation="load_stocks").time():
+            stocks = db.query(UserStock).all()
         if not stocks:
             logger.info("No stocks to monitor.")
             return
 
+        items = []
         for stock in stocks:
             try:
-                # Get strategy
-                strategy = db.query(UserStrategy).filter_by(stock_code=stock.stock_code).first()
-                if not strategy:
-                    logger.warning(f"No strategy found for {stock.stock_code}, creating default.")
-                    strategy = UserStrategy(
-                        stock_code=stock.stock_code,
-                        rsi_low=30.0,
-                        rsi_high=70.0,
-                        rsi_period="daily",
-                        rsi_length=14,
-                        enable_push=True
-                    )
-                    db.add(strategy)
-                    db.commit()
-                    db.refresh(strategy)
-                    
+                items.append((stock, load_strategy(db, stock)))
+            except Exception as e:
+                logger.error(f"Error loading strategy for {stock.stock_code}: {e}")
+                SCAN_SYMBOLS.labels(status="error").inc()
+
+        if settings.SCAN_ADAPTIVE:
+            # Poll only strategies that could trigger soon (see scan_scheduler.py)
+            items, deferred = scan_scheduler.plan(items)
+            SCAN_SYMBOLS.labels(status="deferred").inc(len(deferred))
+            logger.info(f"Polling {len(items)} strategies, {len(deferred)} deferred")
+
+        for stock, strategy in items:
+            df = None
+            rsi = None
+            try:
                 # Get data
                 # For RSI, we need history.
-                df = MarketDataService.get_history_data(stock.stock_code, period=strategy.rsi_period, stock_type=stock.stock_type)
+                max_age = scan_scheduler.max_age(strategy) if settings.SCAN_ADAPTIVE and is_trading else None
+                df = MarketDataService.get_history_data(stock.stock_code, period=strategy.rsi_period,
+                                                        stock_type=stock.stock_type, max_age=max_age)
                 if df is None or df.empty:
                     logger.warning(f"No history data for {stock.stock_code} (period={strategy.rsi_period}), skipping.")
+                    SCAN_SYMBOLS.labels(status="no_data").inc()
                     continue
                     
                 # Calculate RSI
@@ -68,6 +78,7 @@ def scan_stocks():
                 rsi = IndicatorService.calculate_rsi(df, length=length)
                 if rsi is None:
                     logger.warning(f"Could not calculate RSI for {stock.stock_code}, skipping.")
+                    SCAN_SYMBOLS.labels(status="no_rsi").inc()
                     continue
                     
                 # Calculate change percent
@@ -84,49 +95,25 @@ def scan_stocks():
                 except Exception as e:
                     logger.warning(f"Failed to calculate change percent: {e}")
 
-                logger.info(f"Stock: {stock.stock_code}, RSI: {rsi:.2f} (Length: {length}), Change: {change_pct:+.2f}%")
+                log_sampled(f"Stock: {stock.stock_code}, RSI: {rsi:.2f} (Length: {length}), Change: {change_pct:+.2f}%")
 
                 # Check signal
                 # Pass the strategy object to check_signal
                 signal_result = SignalEngine.check_signal(df, strategy)
+                computed_ts = time.time()
+                SCAN_SYMBOLS.labels(status="ok").inc()
                 
-                if signal_result and signal_result['triggered']:
-                    # Check cooldown
-                    if strategy.last_notify_time:
-                        # Calculate minutes since last notify
-                        diff = datetime.now() - strategy.last_notify_time
-                        minutes_since = diff.total_seconds() / 60
-                        
-                        cooldown = getattr(strategy, 'cooldown_period', 30)
-                        if minutes_since < cooldown:
-                            logger.info(f"Skipping alert for {stock.stock_code} due to cooldown ({minutes_since:.1f}/{cooldown}m)")
-                            continue
-                    
+                # Alarms fire on state transitions only (see signal_state.py)
+                thresholds = SignalEngine.effective_thresholds(df, strategy)
+                if signal_state.step(strategy, signal_result, rsi, thresholds):
                     # Get real-time price for the alert (or use price from signal result)
                     price = signal_result.get('price', 0)
                     if price == 0:
                         rt_data = MarketDataService.get_real_time_price(stock.stock_code, stock_type=stock.stock_type)
                         price = rt_data['price'] if rt_data else 0
                     
-                    # Push to queue
-                    alarm_data = {
-                        "user_id": stock.user_id,
-                        "stock_code": stock.stock_code,
-                        "stock_name": stock.stock_name,
-                        "reason": signal_result['reason'],
-                        "detail": signal_result['detail'],
-                        "trend": signal_result['trend'],
-                        "value": signal_result['rsi'],
-                        "threshold": strategy.rsi_low if signal_result['signal_type'] == "buy" else strategy.rsi_high,
-                        "price": price,
-                        "time": datetime.now().isoformat()
-                    }
-                    alarm_queue.push_alarm(alarm_data)
-                    logger.info(f"Alarm pushed: {alarm_data}")
-                    
-                    # Update last notify time
-                    strategy.last_notify_time = datetime.now()
-                    db.commit()
+                    alarm_data = build_alarm(stock, strategy, signal_result, df, computed_ts, price=price)
+                    emit_alarm(db, strategy, alarm_data)
                 
                 # Add small delay to be nice to the API
                 # Reduced from 3-5s to 0.1-0.5s because we run every 15s globally
@@ -134,9 +121,90 @@ def scan_stocks():
                 time.sleep(delay)
             except Exception as e:
                 logger.error(f"Error scanning {stock.stock_code}: {e}")
+                SCAN_SYMBOLS.labels(status="error").inc()
                 continue
+            finally:
+                if settings.SCAN_ADAPTIVE:
+                    scan_scheduler.record(strategy, df, rsi)
                 
     except Exception as e:
         logger.error(f"Scan failed: {e}")
     finally:
+        try:
+            signal_state.checkpoint(db)
+        except Exception as e:
+            logger.error(f"Signal state checkpoint failed: {e}")
         db.close()
+        SCAN_CYCLE.observe(time.perf_counter() - cycle_start)
+
+def load_strategy(db, stock):
+    """
+    The stock's strategy, created with defaults if missing.
+    """
+    with DB_LATENCY.labels(operation="load_strategy").time():
+        strategy = db.query(UserStrategy).filter_by(stock_code=stock.stock_code).first()
+    if not strategy:
+        logger.warning(f"No strategy found for {stock.stock_code}, creating default.")
+        strategy = UserStrategy(
+            stock_code=stock.stock_code,
+            rsi_low=30.0,
+            rsi_high=70.0,
+            rsi_period="daily",
+            rsi_length=14,
+            enable_push=True
+        )
+        db.add(strategy)
+        versions.bump(db, versions.STRATEGIES)
+        db.commit()
+        db.refresh(strategy)
+    return strategy
+
+def build_alarm(stock, strategy, signal_result: dict, df, computed_ts: float, price: float = None) -> dict:
+    """
+    Build the alarm payload pushed to the queue for a triggered signal.
+    Rule-based strategies have no RSI threshold (the rule is in `reason`).
+    """
+    bar_close = MarketDataService.get_bar_close_time(df, period=strategy.rsi_period)
+    threshold = strategy.rsi_low if signal_result['signal_type'] == "buy" else strategy.rsi_high
+    if getattr(strategy, 'buy_rule', None) or getattr(strategy, 'sell_rule', None):
+        threshold = None
+    return {
+        "user_id": stock.user_id,
+        "stock_code": stock.stock_code,
+        "stock_name": stock.stock_name,
+        "signal_type": signal_result['signal_type'],
+        "reason": signal_result['reason'],
+        "detail": signal_result['detail'],
+        "trend": signal_result['trend'],
+        "value": signal_result['rsi'],
+        "threshold": threshold,
+        "price": signal_result.get('price', 0) if price is None else price,
+        # Queue lane: strong / normal / info (see AlarmQueue)
+        "priority": signal_result.get('priority', "normal"),
+        "time": datetime.now().isoformat(),
+        # Pipeline stage timestamps (epoch seconds); queue/worker add the rest
+        "stages": {
+            "data_asof": bar_close.timestamp() if bar_close else None,
+            "computed": computed_ts
+        }
+    }
+
+def emit_alarm(db, strategy, alarm_data: dict) -> bool:
+    """
+    Push an alarm to the queue and stamp the strategy's last_notify_time.
+    If it is not queued, the strategy's signal state is reverted so the next
+    evaluation fires again. Returns whether the alarm was queued.
+    """
+    if not alarm_queue.push_alarm(alarm_data):
+        signal_state.revert(strategy)
+        logger.warning(f"Alarm not queued, will retry: {alarm_data['stock_code']} {alarm_data['signal_type']}")
+        return False
+    ALARMS_PUSHED.inc()
+    logger.info(f"Alarm pushed: {alarm_data}")
+    
+    # Update last notify time
+    strategy.last_notify_time = datetime.now()
+    versions.bump(db, versions.STRATEGIES)
+    with DB_LATENCY.labels(operation="commit_notify_time").time():
+        db.commit()
+    return True
@@ -0,0 +1,314 @@
+"""
+Market-wide screener over the whole A-share and ETF universe.
+
+A close pass runs once per trading day after SCREENER_CLOSE_AFTER:
+    1. the universe comes from the listed-symbol index (watchlist.py),
+    2. SCREENER_FETCH_WORKERS threads fetch the last SCREENER_LOOKBACK_DAYS
+       of daily bars per symbol (I/O bound, bypassing the bar cache),
+    3. batches of close arrays go to a process pool that computes RSI(6),
+       RSI(14), MA20/60 and Bollinger(20, 2) with the vectorized series
+       functions of IndicatorService (CPU bound),
+    4. the table is replaced in one transaction.
+
+The close arrays are kept in memory, so intraday passes
+(SCREENER_INTRADAY_INTERVAL) only need the two spot snapshots: today's spot
+price becomes the last bar and indicators are recomputed. Under memory
+pressure the budget may evict them (see memory_budget.py); evicted symbols
+are left out of intraday passes until the next close pass.
+
+Results are queried with simple filters over the indexed columns, e.g.
+"rsi6 < 20 and price > ma60" (see build_filter).
+"""
+import multiprocessing
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from loguru import logger
+from sqlalchemy import delete, insert
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import SCREENER_PASS
+from app.models import ScreenerResult
+from app.services.memory_budget import memory_budget
+from app.services.trading_hours import TradingHours
+
+STOCK_TYPES = ("stock", "etf")
+# Columns usable in filters and ordering
+FILTER_COLUMNS = ("price", "change_pct", "rsi6", "rsi14", "ma20", "ma60", "bb_lower", "bb_mid", "bb_upper")
+FILTER_ALIASES = {"close": "price", "change": "change_pct"}
+_OPERATORS = {
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "=": lambda a, b: a == b,
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+}
+_CONDITION_RE = re.compile(r"^\s*([\w.\-]+)\s*(<=|>=|==|!=|<|>|=)\s*([\w.\-]+)\s*$")
+_AND_RE = re.compile(r"\s+and\s+", re.IGNORECASE)
+# Eviction cost relative to other pools: closes come back at the next close pass
+EVICTION_COST = 2.0
+
+
+class ScreenerError(ValueError):
+    pass
+
+
+def _last(series):
+    if series is None or len(series) == 0:
+        return None
+    value = series.iloc[-1]
+    return None if value != value else round(float(value), 4)  # NaN -> None
+
+
+def compute_batch(batch: list) -> list:
+    """
+    Indicator rows for a batch of (code, name, stock_type, bar_date, closes).
+    Runs in the worker processes.
+    """
+    import pandas as pd
+    from app.services.indicator import IndicatorService
+
+    rows = []
+    for code, name, stock_type, bar_date, closes in batch:
+        try:
+            df = pd.DataFrame({"close": closes})
+            bb = IndicatorService.bbands_frame(df, 20, 2.0)
+            previous = closes[-2] if len(closes) > 1 else None
+            rows.append({
+                "stock_code": code,
+                "stock_name": name,
+                "stock_type": stock_type,
+                "bar_date": bar_date,
+                "price": round(float(closes[-1]), 4),
+                "change_pct": round((closes[-1] / previous - 1) * 100, 4) if previous else None,
+                "rsi6": _last(IndicatorService.rsi_series(df, 6)),
+                "rsi14": _last(IndicatorService.rsi_series(df, 14)),
+                "ma20": _last(IndicatorService.sma_series(df, 20)),
+                "ma60": _last(IndicatorService.sma_series(df, 60)),
+                "bb_lower": _last(bb["lower"]) if bb is not None else None,
+                "bb_mid": _last(bb["mid"]) if bb is not None else None,
+                "bb_upper": _last(bb["upper"]) if bb is not None else None,
+            })
+        except Exception as e:
+            logger.debug(f"Screener indicators failed for {code}: {e}")
+    return rows
+
+
+class MarketScreener:
+    def __init__(self):
+        self._closes = {}  # code -> (name, stock_type, bar_date, closes ndarray)
+        self._closes_at = None  # epoch of the close pass that loaded them
+        self._pool = None
+        self._lock = threading.Lock()  # one pass at a time
+        self.last_close_date = None
+        self.last_run = {}  # source -> {"finished_at", "seconds", "symbols", "failed"}
+
+    def _get_pool(self):
+        if self._pool is None:
+            # spawn, not fork: this process runs scheduler and fetch threads
+            self._pool = ProcessPoolExecutor(
+                max_workers=settings.SCREENER_PROCESSES or None,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def _compute(self, items: list) -> list:
+        size = settings.SCREENER_BATCH_SIZE
+        if len(items) <= size:
+            return compute_batch(items)
+        pool = self._get_pool()
+        futures = [pool.submit(compute_batch, items[i:i + size]) for i in range(0, len(items), size)]
+        return [row for future in futures for row in future.result()]
+
+    @staticmethod
+    def _universe() -> list:
+        from app.services.watchlist import symbol_index
+        symbols = []
+        for stock_type in STOCK_TYPES:
+            listing = symbol_index.get(stock_type) or {}
+            symbols.extend((code, name, stock_type) for code, name in listing.items())
+        return symbols
+
+    @staticmethod
+    def _fetch(symbol):
+        from app.services.market_data import MarketDataService
+        code, name, stock_type = symbol
+        start = (datetime.now() - timedelta(days=settings.SCREENER_LOOKBACK_DAYS)).strftime("%Y%m%d")
+        try:
+            df = MarketDataService._fetch_history_data(code, period="daily", stock_type=stock_type, start_date=start)
+        except Exception as e:
+            logger.debug(f"Screener fetch failed for {code}: {e}")
+            return None
+        if df is None or df.empty:
+            return None
+        closes = df["close"].to_numpy(dtype="float64")
+        return code, name, stock_type, df["date"].iloc[-1].strftime("%Y-%m-%d"), closes
+
+    def run_close(self) -> int:
+        """
+        Full pass from daily bars. Returns the number of symbols screened.
+        """
+        with self._lock:
+            start = time.perf_counter()
+            symbols = self._universe()
+            if not symbols:
+                logger.warning("Screener: symbol listing unavailable, skipping pass")
+                return 0
+            items = []
+            with ThreadPoolExecutor(max_workers=settings.SCREENER_FETCH_WORKERS) as fetchers:
+                for item in fetchers.map(self._fetch, symbols):
+                    if item is not None:
+                        items.append(item)
+            self._closes = {item[0]: item[1:] for item in items}
+            self._closes_at = time.time()
+            rows = self._compute(items)
+            self._save(rows, "close")
+            self.last_close_date = datetime.now().date()
+            self._finish("close", start, len(rows), len(symbols) - len(rows))
+            return len(rows)
+
+    def memory_entries(self) -> list:
+        return [(code, code, "daily", item[3].nbytes, self._closes_at) for code, item in list(self._closes.items())]
+
+    def evict(self, code: str) -> int:
+        item = self._closes.pop(code, None)
+        return item[3].nbytes if item else 0
+
+    def run_intraday(self) -> int:
+        """
+        Recompute from spot quotes on top of the closes of the last close pass.
+        """
+        from app.services.market_data import MarketDataService
+        if not self._closes:
+            return 0
+        with self._lock:
+            start = time.perf_counter()
+            import numpy as np
+            today = datetime.now().strftime("%Y-%m-%d")
+            items = []
+            for stock_type in STOCK_TYPES:
+                try:
+                    spot = MarketDataService.get_spot_snapshot(stock_type)
+                except Exception as e:
+                    logger.warning(f"Screener: spot snapshot failed for {stock_type}: {e}")
+                    continue
+                for code, quote in spot.items():
+                    stored = self._closes.get(code)
+                    if stored is None:
+                        continue
+                    name, _, bar_date, closes = stored
+                    price = float(quote["price"])
+                    # Today's bar already closed (e.g. rerun after a close pass): replace it
+                    closes = np.append(closes[:-1] if bar_date == today else closes, price)
+                    items.append((code, name, stock_type, today, closes))
+            rows = self._compute(items)
+            if rows:
+                self._save(rows, "intraday")
+            self._finish("intraday", start, len(rows), len(items) - len(rows))
+            return len(rows)
+
+    @staticmethod
+    def _save(rows: list, source: str):
+        now = datetime.now()
+        for row in rows:
+            row["source"] = source
+            row["updated_at"] = now
+        db = SessionLocal()
+        try:
+            db.execute(delete(ScreenerResult).where(
+                ScreenerResult.stock_code.in_([row["stock_code"] for row in rows])
+            ) if source == "intraday" else delete(ScreenerResult))
+            if rows:
+                db.execute(insert(ScreenerResult), rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _finish(self, source: str, start: float, screened: int, failed: int):
+        seconds = time.perf_counter() - start
+        SCREENER_PASS.labels(source=source).observe(seconds)
+        self.last_run[source] = {
+            "finished_at": datetime.now().isoformat(),
+            "seconds": round(seconds, 2),
+            "symbols": screened,
+            "failed": failed,
+        }
+        logger.info(f"Screener {source} pass: {screened} symbols in {seconds:.1f}s ({failed} failed)")
+
+
+screener = MarketScreener()
+memory_budget.register("screener_closes", screener, cost=EVICTION_COST)
+
+
+def screener_close_job():
+    """
+    Scheduler job: run the close pass once per trading day after SCREENER_CLOSE_AFTER.
+    """
+    now = datetime.now()
+    if not TradingHours.is_trading_day(now) or now.strftime("%H:%M") < settings.SCREENER_CLOSE_AFTER:
+        return
+    if screener.last_close_date == now.date():
+        return
+    try:
+        screener.run_close()
+    except Exception as e:
+        logger.error(f"Screener close pass failed: {e}")
+
+
+def screener_intraday_job():
+    if not TradingHours.is_trading_time():
+        return
+    try:
+        screener.run_intraday()
+    except Exception as e:
+        logger.error(f"Screener intraday pass failed: {e}")
+
+
+def _operand(token: str):
+    token = FILTER_ALIASES.get(token.lower(), token.lower())
+    if token in FILTER_COLUMNS:
+        return getattr(ScreenerResult, token)
+    try:
+        return float(token)
+    except ValueError:
+        raise ScreenerError(f"Unknown column {token!r} (use one of {', '.join(FILTER_COLUMNS)})")
+
+
+def build_filter(text: str) -> list:
+    """
+    "rsi6 < 20 and price > ma60" -> SQLAlchemy conditions. Conditions are
+    joined with "and"; each side is a column or a number.
+    """
+    conditions = []
+    for part in _AND_RE.split(text.strip()):
+        match = _CONDITION_RE.match(part)
+        if not match:
+            raise ScreenerError(f"Cannot parse condition {part!r}")
+        left, op, right = match.groups()
+        left, right = _operand(left), _operand(right)
+        if isinstance(left, float) and isinstance(right, float):
+            raise ScreenerError(f"Condition {part!r} compares two numbers")
+        conditions.append(_OPERATORS[op](left, right))
+    return conditions
+
+
+def query_results(db, where: str = None, stock_type: str = None, order_by: str = "rsi6",
+                  descending: bool = False, limit: int = 100) -> list:
+    query = db.query(ScreenerResult)
+    if where:
+        query = query.filter(*build_filter(where))
+    if stock_type:
+        query = query.filter(ScreenerResult.stock_type == stock_type)
+    order_by = FILTER_ALIASES.get(order_by, order_by)
+    if order_by not in FILTER_COLUMNS:
+        raise ScreenerError(f"Cannot order by {order_by!r}")
+    column = getattr(ScreenerResult, order_by)
+    query = query.filter(column.isnot(None)).order_by(column.desc() if descending else column.asc())
+    return query.limit(limit).all()
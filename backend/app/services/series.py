@@ -0,0 +1,178 @@
+"""
+Chart series: aligned OHLC + indicator columns for a symbol and time range.
+
+Indicators are computed over the whole cached history (so the first bars of
+the range are warmed up) and then cut to the range. Long ranges can be
+downsampled server-side with Largest-Triangle-Three-Buckets on the close:
+LTTB keeps the bars that preserve the visual shape (peaks, troughs) of the
+line, and every column is taken at the same selected bars so the series stay
+aligned.
+
+Two encodings:
+- columnar JSON: {"columns": [...], "t": [...], "close": [...], ...} with
+  times in epoch seconds and gaps (indicator warm-up) as null;
+- binary (application/octet-stream), little-endian:
+      magic b"KAS1", uint32 rows, uint16 columns,
+      per column: uint8 name length + ASCII name,
+      then the time column as float64 and every other column as float32,
+      each stored contiguously (column-major). Gaps are NaN.
+"""
+import struct
+import numpy as np
+import pandas as pd
+from app.services.indicator import IndicatorService
+
+INDICATORS = ("rsi", "ma", "bb")
+BINARY_MAGIC = b"KAS1"
+
+
+class SeriesError(ValueError):
+    pass
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Indices of the `threshold` points LTTB selects from (x, y). The first and
+    last points are always kept; with threshold >= len(y) all are returned.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third corner of the triangle
+        next_start = int(np.floor((i + 1) * every)) + 1
+        next_end = min(int(np.floor((i + 2) * every)) + 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        start = int(np.floor(i * every)) + 1
+        end = int(np.floor((i + 1) * every)) + 1
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return selected
+
+
+def _parse_date(value, name: str):
+    if value in (None, ""):
+        return None
+    try:
+        return pd.Timestamp(value)
+    except (ValueError, TypeError):
+        raise SeriesError(f"Invalid {name}: {value!r}")
+
+
+def warmup_bars(indicators=INDICATORS, rsi_length: int = 14, ma_length: int = 60, bb_length: int = 20) -> int:
+    """
+    Bars of history before a range's first bar its indicators need to be
+    warmed up (build_series parameters).
+    """
+    from app.services.lookback import indicator_bars
+    lengths = {"rsi": indicator_bars("rsi", (rsi_length,)), "ma": ma_length, "bb": bb_length}
+    return max((lengths[name] for name in indicators if name in lengths), default=0)
+
+
+def build_series(df: pd.DataFrame, start=None, end=None, points: int = None,
+                 indicators=INDICATORS, rsi_length: int = 14, ma_length: int = 60,
+                 bb_length: int = 20, bb_std: float = 2.0) -> dict:
+    """
+    Columns (numpy arrays keyed by name, "t" first) for bars in [start, end].
+    """
+    unknown = set(indicators) - set(INDICATORS)
+    if unknown:
+        raise SeriesError(f"Unknown indicator(s): {', '.join(sorted(unknown))}")
+    start, end = _parse_date(start, "start"), _parse_date(end, "end")
+    if start is not None and end is not None and start > end:
+        raise SeriesError("start is after end")
+
+    frame = pd.DataFrame({
+        "t": pd.to_datetime(df["date"]),
+        "open": pd.to_numeric(df["open"], errors="coerce"),
+        "high": pd.to_numeric(df["high"], errors="coerce"),
+        "low": pd.to_numeric(df["low"], errors="coerce"),
+        "close": IndicatorService._close_series(df),
+        "volume": pd.to_numeric(df["volume"], errors="coerce"),
+    })
+    # Over the full history, then cut to the range
+    if "rsi" in indicators:
+        frame["rsi"] = IndicatorService.rsi_series(df, length=rsi_length)
+    if "ma" in indicators:
+        frame["ma"] = IndicatorService.sma_series(df, length=ma_length)
+    if "bb" in indicators:
+        bb = IndicatorService.bbands_frame(df, length=bb_length, std=bb_std)
+        for band in ("lower", "mid", "upper"):
+            frame[f"bb_{band}"] = bb[band] if bb is not None else np.nan
+
+    mask = frame["close"].notna()
+    if start is not None:
+        mask &= frame["t"] >= start
+    if end is not None:
+        if end == end.normalize():
+            # A bare date includes that whole day (intraday bars)
+            end += pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+        mask &= frame["t"] <= end
+    frame = frame[mask]
+
+    t = frame["t"].to_numpy(dtype="datetime64[ns]").astype(np.int64) / 1e9
+    columns = {"t": t}
+    for name in frame.columns[1:]:
+        columns[name] = frame[name].to_numpy(dtype=np.float64)
+
+    if points is not None and len(t) > points:
+        keep = lttb(t, columns["close"], points)
+        columns = {name: values[keep] for name, values in columns.items()}
+    return columns
+
+
+def to_json(columns: dict, decimals: int = 4) -> dict:
+    payload = {"columns": list(columns), "rows": len(columns["t"])}
+    for name, values in columns.items():
+        if name == "t":
+            payload[name] = values.astype(np.int64).tolist()
+        elif name == "volume":
+            payload[name] = [None if np.isnan(v) else int(v) for v in values]
+        else:
+            payload[name] = [None if np.isnan(v) else v for v in np.round(values, decimals).tolist()]
+    return payload
+
+
+def to_binary(columns: dict) -> bytes:
+    names = list(columns)
+    rows = len(columns["t"])
+    parts = [BINARY_MAGIC, struct.pack("<IH", rows, len(names))]
+    for name in names:
+        encoded = name.encode("ascii")
+        parts.append(struct.pack("<B", len(encoded)) + encoded)
+    for name in names:
+        dtype = "<f8" if name == "t" else "<f4"
+        parts.append(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+    return b"".join(parts)
+
+
+def from_binary(data: bytes) -> dict:
+    """Inverse of to_binary (float64 arrays), for clients and tests."""
+    if data[:4] != BINARY_MAGIC:
+        raise SeriesError("Not a series payload")
+    rows, count = struct.unpack_from("<IH", data, 4)
+    offset = 10
+    names = []
+    for _ in range(count):
+        length = data[offset]
+        names.append(data[offset + 1:offset + 1 + length].decode("ascii"))
+        offset += 1 + length
+    columns = {}
+    for name in names:
+        dtype = "<f8" if name == "t" else "<f4"
+        size = rows * np.dtype(dtype).itemsize
+        columns[name] = np.frombuffer(data, dtype=dtype, count=rows, offset=offset).astype(np.float64)
+        offset += size
+    return columns
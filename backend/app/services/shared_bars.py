@@ -0,0 +1,298 @@
+"""
+Host-wide bar store shared by processes through memory-mapped files.
+
+One writer (the process that runs the jobs) publishes every base series it
+fetches; any number of readers (API workers) map the same bytes read-only
+and build DataFrames on them without copying, so a symbol's history is held
+once per host instead of once per process, and readers don't refetch it.
+
+Files live in SHARED_BARS_DIR (a tmpfs such as /dev/shm in production):
+
+    index      64-byte header (magic, slot count, writer epoch), then
+               SHARED_BARS_SLOTS fixed-size slots, open-addressed by key:
+               seq, fetched_at, rows, generation, key, data file name
+    <slot>.<generation>
+               date as int64 ns [rows], then open/high/low/close/volume as
+               float64 [5][rows]
+
+Each slot is a seqlock: the writer makes `seq` odd, updates the slot, then
+makes it even again; a reader retries if it saw an odd or changed `seq`.
+Data files are never modified after publication. An update writes a new
+file, flips the slot to it and unlinks the old one; readers that still map
+the old file keep a valid (older) view until they drop it.
+
+A restarted writer recreates the index with a new epoch; readers notice the
+new file and remap.
+"""
+import mmap
+import os
+import re
+import threading
+import time
+import zlib
+import numpy as np
+import pandas as pd
+from loguru import logger
+from app.core.config import settings
+from app.core.metrics import record_cache
+from app.services.resample import BAR_COLUMNS
+
+MAGIC = 0x4B424152  # "KBAR"
+HEADER_SIZE = 64
+HEADER = np.dtype([("magic", "<u4"), ("slots", "<u4"), ("epoch", "<f8")])
+SLOT = np.dtype([
+    ("seq", "<u8"),
+    ("fetched_at", "<f8"),
+    ("rows", "<u4"),
+    ("generation", "<u4"),
+    ("key", "S40"),
+    ("data", "S24"),
+])
+VALUE_COLUMNS = BAR_COLUMNS[1:]
+# Seconds between checks of the index file for a restarted writer
+REATTACH_INTERVAL = 1.0
+READ_RETRIES = 8
+DATA_FILE = re.compile(r"^\d+\.\d+(\.tmp)?$")
+
+
+def encode_key(key) -> bytes:
+    return "|".join(str(part) for part in key).encode()[:SLOT["key"].itemsize]
+
+
+def _slot_of(encoded: bytes, slots: int) -> int:
+    return zlib.crc32(encoded) % slots
+
+
+def _map(path: str, writable: bool = False):
+    fd = os.open(path, os.O_RDWR if writable else os.O_RDONLY)
+    try:
+        return mmap.mmap(fd, 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+    finally:
+        os.close(fd)
+
+
+class SharedBars:
+    def __init__(self):
+        self.directory = None
+        self.writer = False
+        self._index = None      # mmap of the index file
+        self._slots = None      # structured view of the slots
+        self._epoch = None
+        self._inode = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(settings.SHARED_BARS_DIR)
+
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, "index")
+
+    def _bind(self, mm):
+        header = np.frombuffer(mm, dtype=HEADER, count=1)[0]
+        if header["magic"] != MAGIC:
+            raise ValueError("not a shared bar index")
+        self._index = mm
+        self._slots = np.frombuffer(mm, dtype=SLOT, count=int(header["slots"]), offset=HEADER_SIZE)
+        self._epoch = float(header["epoch"])
+
+    # --- Writer ---
+
+    def create(self, directory: str = None, slots: int = None):
+        """
+        Become the writer: create a fresh index (replacing one left by a
+        previous writer) in `directory`.
+        """
+        self.directory = directory or settings.SHARED_BARS_DIR
+        slots = slots or settings.SHARED_BARS_SLOTS
+        os.makedirs(self.directory, exist_ok=True)
+        for name in os.listdir(self.directory):
+            # Files of a previous writer; readers still mapping them keep their views
+            if name.startswith("index") or DATA_FILE.match(name):
+                os.unlink(os.path.join(self.directory, name))
+
+        size = HEADER_SIZE + slots * SLOT.itemsize
+        tmp = self._index_path() + ".tmp"
+        with open(tmp, "wb") as f:
+            f.truncate(size)
+        mm = _map(tmp, writable=True)
+        header = np.frombuffer(mm, dtype=HEADER, count=1)
+        header[0] = (MAGIC, slots, time.time())
+        os.rename(tmp, self._index_path())
+        self._bind(mm)
+        self.writer = True
+        logger.info(f"Shared bar store created in {self.directory} ({slots} slots)")
+
+    def _find_slot(self, encoded: bytes, insert: bool = False):
+        slots = self._slots
+        n = len(slots)
+        start = _slot_of(encoded, n)
+        for probe in range(n):
+            i = (start + probe) % n
+            key = slots["key"][i]
+            if key == encoded:
+                return i
+            if not key:
+                if insert:
+                    # Keys are set once and never cleared: probe chains stay intact
+                    slots["key"][i] = encoded
+                    return i
+                return None
+        return None
+
+    def publish(self, key, df: pd.DataFrame, fetched_at: float = None):
+        """
+        Write a base series and return a DataFrame on the published bytes
+        (callers cache that one, so the writer holds no private copy either).
+        Frames without the full bar schema are not shared and returned as-is.
+        """
+        if not self.writer or df is None or df.empty or any(c not in df.columns for c in BAR_COLUMNS):
+            return df
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        encoded = encode_key(key)
+        with self._lock:
+            i = self._find_slot(encoded, insert=True)
+            if i is None:
+                logger.warning("Shared bar store is full; raise SHARED_BARS_SLOTS")
+                return df
+            slot = self._slots[i:i + 1]
+            generation = (int(slot["generation"][0]) + 1) & 0xFFFFFFFF
+            name = f"{i}.{generation}"
+            path = os.path.join(self.directory, name)
+            rows = len(df)
+
+            dates = pd.to_datetime(df["date"]).to_numpy(dtype="datetime64[ns]").view("<i8")
+            values = df[VALUE_COLUMNS].to_numpy(dtype="<f8").T
+            with open(path + ".tmp", "wb") as f:
+                f.write(np.ascontiguousarray(dates).tobytes())
+                f.write(np.ascontiguousarray(values).tobytes())
+            os.rename(path + ".tmp", path)
+
+            old = slot["data"][0].decode()
+            slot["seq"] += 1   # odd: update in progress
+            slot["fetched_at"] = fetched_at
+            slot["rows"] = rows
+            slot["generation"] = generation
+            slot["data"] = name.encode()
+            slot["seq"] += 1   # even: consistent
+            if old:
+                try:
+                    os.unlink(os.path.join(self.directory, old))
+                except FileNotFoundError:
+                    pass
+            shared = self._frame(_map(path), rows)
+        shared.attrs.update(df.attrs)
+        return shared
+
+    def remove(self, key=None):
+        """Withdraw one series (or all) from readers."""
+        if not self.writer:
+            return
+        with self._lock:
+            if key is None:
+                indices = np.flatnonzero(self._slots["rows"])
+            else:
+                i = self._find_slot(encode_key(key))
+                indices = [] if i is None else [i]
+            for i in indices:
+                slot = self._slots[i:i + 1]
+                old = slot["data"][0].decode()
+                slot["seq"] += 1
+                slot["rows"] = 0
+                slot["data"] = b""
+                slot["seq"] += 1
+                if old:
+                    try:
+                        os.unlink(os.path.join(self.directory, old))
+                    except FileNotFoundError:
+                        pass
+
+    # --- Readers ---
+
+    def _attach(self) -> bool:
+        """
+        Map the writer's index, or remap it if a restarted writer replaced it.
+        """
+        now = time.monotonic()
+        if self._index is not None and now - self._checked_at < REATTACH_INTERVAL:
+            return True
+        self._checked_at = now
+        self.directory = self.directory or settings.SHARED_BARS_DIR
+        try:
+            inode = os.stat(self._index_path()).st_ino
+            if inode != self._inode:
+                self._bind(_map(self._index_path()))
+                self._inode = inode
+        except (OSError, ValueError):
+            return self._index is not None
+        return True
+
+    def get(self, key):
+        """
+        (DataFrame, fetched_at) of a published series, or None. The frame
+        maps the shared file read-only.
+        """
+        if self.writer or not self.enabled:
+            return None
+        with self._lock:
+            if not self._attach():
+                return None
+            i = self._find_slot(encode_key(key))
+        if i is None:
+            record_cache("shared_bars", False)
+            return None
+
+        slot = self._slots[i:i + 1]
+        for _ in range(READ_RETRIES):
+            seq = int(slot["seq"][0])
+            if seq & 1:
+                time.sleep(0)
+                continue
+            fetched_at = float(slot["fetched_at"][0])
+            rows = int(slot["rows"][0])
+            name = slot["data"][0].decode()
+            if int(slot["seq"][0]) != seq:
+                continue
+            if not rows:
+                break
+            try:
+                mm = _map(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                # Replaced between reading the slot and opening the file
+                continue
+            record_cache("shared_bars", True)
+            return self._frame(mm, rows), fetched_at
+        record_cache("shared_bars", False)
+        return None
+
+    @staticmethod
+    def _frame(mm, rows: int) -> pd.DataFrame:
+        """
+        Zero-copy DataFrame over a data file: the float columns share one
+        block, the date column another. Both reference `mm`, which stays
+        mapped for as long as the frame (or any view of it) is alive.
+        """
+        dates = np.frombuffer(mm, dtype="<i8", count=rows).view("datetime64[ns]")
+        values = np.frombuffer(mm, dtype="<f8", count=rows * len(VALUE_COLUMNS), offset=rows * 8)
+        df = pd.DataFrame(values.reshape(len(VALUE_COLUMNS), rows).T, columns=VALUE_COLUMNS, copy=False)
+        df.insert(0, "date", pd.Series(dates, copy=False))
+        return df
+
+    def stats(self) -> dict:
+        if self._slots is None:
+            return {"enabled": self.enabled, "attached": False}
+        used = self._slots["rows"] > 0
+        return {
+            "enabled": self.enabled,
+            "attached": True,
+            "writer": self.writer,
+            "directory": self.directory,
+            "epoch": self._epoch,
+            "slots": len(self._slots),
+            "series": int(used.sum()),
+            "bytes": int((self._slots["rows"][used].astype(np.int64) * 8 * len(BAR_COLUMNS)).sum()),
+        }
+
+
+shared_bars = SharedBars()
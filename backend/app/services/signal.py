@@ -1,9 +1,12 @@
 from app.services.indicator import IndicatorService
 import pandas as pd
 from loguru import logger
+from app.core.metrics import SIGNAL_LATENCY
+from app.services.rules import RuleContext, compile_rule
 
 class SignalEngine:
     @staticmethod
+    @SIGNAL_LATENCY.time()
     def check_signal(df: pd.DataFrame, strategy):
         """
         Check signals based on strategy configuration.
@@ -12,6 +15,10 @@ class SignalEngine:
         if df is None or df.empty:
             return None
 
+        # Strategies with rules replace the RSI threshold logic below
+        if getattr(strategy, 'buy_rule', None) or getattr(strategy, 'sell_rule', None):
+            return SignalEngine.check_rules(df, strategy)
+
         # 1. Calculate Base RSI
         rsi = IndicatorService.calculate_rsi(df, length=strategy.rsi_length)
         if rsi is None:
@@ -25,29 +32,22 @@ class SignalEngine:
         current_price = float(df.iloc[-1]['close']) if 'close' in df.columns else float(df.iloc[-1]['收盘'])
 
         # --- Filter 1: Trend Filter (MA) ---
-        # Default thresholds
-        effective_low = strategy.rsi_low
-        effective_high = strategy.rsi_high
+        effective_low, effective_high = SignalEngine.effective_thresholds(df, strategy)
         trend_status = "Unknown"
 
         if strategy.enable_trend_filter:
-            ma60 = IndicatorService.calculate_ma(df, length=60)
-            if ma60:
-                if current_price > ma60:
-                    trend_status = "Uptrend (Price > MA60)"
-                    # Uptrend: Relax buy threshold (easier to buy), strict sell
-                    effective_low = strategy.rsi_low + 5 
-                    detail.append(f"Trend: Bullish. Adj Low: {effective_low}")
-                else:
-                    trend_status = "Downtrend (Price < MA60)"
-                    # Downtrend: Strict buy threshold (harder to buy), relax sell
-                    effective_low = strategy.rsi_low - 5
-                    detail.append(f"Trend: Bearish. Adj Low: {effective_low}")
-                
-                logger.debug(f"Trend Filter: {trend_status}, RSI: {rsi:.2f}, Eff Low: {effective_low}, Eff High: {effective_high}")
+            if effective_low > strategy.rsi_low:
+                trend_status = "Uptrend (Price > MA60)"
+                # Uptrend: Relax buy threshold (easier to buy), strict sell
+                detail.append(f"Trend: Bullish. Adj Low: {effective_low}")
+            elif effective_low < strategy.rsi_low:
+                trend_status = "Downtrend (Price < MA60)"
+                # Downtrend: Strict buy threshold (harder to buy), relax sell
+                detail.append(f"Trend: Bearish. Adj Low: {effective_low}")
             else:
                 detail.append("Trend: MA60 N/A")
                 logger.debug("Trend Filter: MA60 not available (insufficient data?)")
+            logger.debug(f"Trend Filter: {trend_status}, RSI: {rsi:.2f}, Eff Low: {effective_low}, Eff High: {effective_high}")
 
         # --- Check Base Signal with Effective Thresholds ---
         if rsi < effective_low:
@@ -66,13 +66,17 @@ class SignalEngine:
             return None
 
         # --- Filter 2: Volatility Filter (Bollinger Bands) ---
+        # A band touch confirming the RSI signal ("resonance") is a strong alarm
+        priority = "normal"
         if strategy.enable_volatility_filter:
             bb = IndicatorService.calculate_bollinger_bands(df)
             if bb:
                 if signal_type == "buy" and current_price <= bb['lower']:
                     reason.append("Price touched BB Lower Band")
+                    priority = "strong"
                 elif signal_type == "sell" and current_price >= bb['upper']:
                     reason.append("Price touched BB Upper Band")
+                    priority = "strong"
                 else:
                     # If filter is enabled but condition not met, should we suppress?
                     # For now, let's just NOT add the "Strong" tag, but still allow signal.
@@ -90,5 +94,52 @@ class SignalEngine:
             "detail": "; ".join(detail),
             "rsi": rsi,
             "price": current_price,
-            "trend": trend_status
+            "trend": trend_status,
+            "priority": priority
         }
+
+    @staticmethod
+    def effective_thresholds(df: pd.DataFrame, strategy) -> tuple:
+        """
+        (buy, sell) RSI thresholds check_signal applies at the last bar: with
+        the trend filter, rsi_low is raised by 5 above MA60 and lowered by 5
+        below it (unchanged while MA60 is not available).
+        """
+        low = strategy.rsi_low
+        if strategy.enable_trend_filter and df is not None and not df.empty:
+            ma60 = IndicatorService.calculate_ma(df, length=60)
+            if ma60:
+                current_price = float(df.iloc[-1]['close']) if 'close' in df.columns else float(df.iloc[-1]['收盘'])
+                low = strategy.rsi_low + 5 if current_price > ma60 else strategy.rsi_low - 5
+        return low, strategy.rsi_high
+
+    @staticmethod
+    def check_rules(df: pd.DataFrame, strategy, ctx: RuleContext = None):
+        """
+        Evaluate the strategy's buy_rule / sell_rule (see rules.py) at the last bar.
+        Pass a shared RuleContext to reuse node values across strategies on the same frame.
+        Returns the same dict shape as check_signal, or None.
+        """
+        ctx = ctx or RuleContext(df)
+        for signal_type, text in (("buy", getattr(strategy, "buy_rule", None)), ("sell", getattr(strategy, "sell_rule", None))):
+            if not text:
+                continue
+            rule = compile_rule(text)
+            if not ctx.test(rule):
+                continue
+
+            values = ctx.snapshot(rule)
+            rsi = IndicatorService.calculate_rsi(df, length=strategy.rsi_length)
+            current_price = float(IndicatorService._close_series(df).iloc[-1])
+            return {
+                "signal_type": signal_type,
+                "triggered": True,
+                "reason": f"Rule: {rule.text}",
+                "detail": "; ".join(f"{key}={value:.2f}" if value is not None else f"{key}=N/A"
+                                    for key, value in values.items()),
+                "rsi": rsi,
+                "price": current_price,
+                "trend": "N/A",
+                "priority": "normal"
+            }
+        return None
@@ -0,0 +1,180 @@
+"""
+Edge-triggered signal state per strategy.
+
+check_signal is level-triggered: it reports a buy for every scan while RSI
+sits below rsi_low. The state machine turns that into one alarm per
+episode:
+
+    idle   -> armed   value entered the approach band (within the hysteresis
+                      of a threshold); no alarm
+    *      -> fired   signal triggered on a new side: emit one alarm (if it
+                      cannot be queued, revert() undoes the transition and the
+                      next evaluation fires again)
+    fired  -> reset   signal cleared but the value is still within the
+                      hysteresis band of the threshold; re-triggering from
+                      here returns to fired silently
+    reset  -> idle    value moved back past threshold +/- SIGNAL_HYSTERESIS
+
+The thresholds are the ones the signal fired on: with the trend filter,
+rsi_low moved by the trend (SignalEngine.effective_thresholds).
+
+Rule-based strategies (buy_rule/sell_rule) have no scalar to band on and
+reset as soon as their rule is false.
+
+States live in memory and are checkpointed to the strategy rows
+(signal_state, signal_side, signal_state_at) once per scan cycle. They are
+accounted in the memory budget but never evicted: dropping one could repeat
+an alarm.
+"""
+import threading
+from datetime import datetime
+from loguru import logger
+from sqlalchemy import update
+from app.core.config import settings
+from app.core.metrics import DB_LATENCY
+from app.models import UserStrategy
+from app.services import versions
+from app.services.memory_budget import estimate_bytes, memory_budget
+
+IDLE = "idle"
+ARMED = "armed"
+FIRED = "fired"
+RESET = "reset"
+
+
+class SignalStateMachine:
+    def __init__(self, hysteresis: float = None):
+        self.hysteresis = settings.SIGNAL_HYSTERESIS if hysteresis is None else hysteresis
+        # strategy id -> (state, side, since)
+        self._states = {}
+        # Snapshot states not yet reconciled with their rows
+        self._restored = {}
+        self._dirty = set()
+        # strategy id -> state before its last firing step, for revert()
+        self._before_fired = {}
+        self._lock = threading.Lock()
+
+    def get(self, strategy) -> tuple:
+        """
+        (state, side, since) for a strategy, seeded on first use from its row
+        or from a restored snapshot, whichever changed last.
+        """
+        current = self._states.get(strategy.id)
+        if current is None:
+            current = (
+                getattr(strategy, 'signal_state', None) or IDLE,
+                getattr(strategy, 'signal_side', None),
+                getattr(strategy, 'signal_state_at', None)
+            )
+            restored = self._restored.pop(strategy.id, None)
+            if restored and restored[2] and (current[2] is None or restored[2] > current[2]):
+                current = restored
+                self._dirty.add(strategy.id)
+            self._states[strategy.id] = current
+        return current
+
+    def _band_side(self, strategy, value, thresholds: tuple = None):
+        """
+        Side whose threshold `value` is within the hysteresis band of, or None.
+        """
+        if value is None or getattr(strategy, 'buy_rule', None) or getattr(strategy, 'sell_rule', None):
+            return None
+        low, high = thresholds or (strategy.rsi_low, strategy.rsi_high)
+        if value < low + self.hysteresis:
+            return "buy"
+        if value > high - self.hysteresis:
+            return "sell"
+        return None
+
+    def step(self, strategy, signal_result, value: float = None, thresholds: tuple = None) -> bool:
+        """
+        Advance the strategy's state with this evaluation's signal result and
+        indicator value (RSI). `thresholds` are the (buy, sell) levels the
+        signal was checked against, by default rsi_low / rsi_high. Returns True
+        if an alarm should be emitted.
+        """
+        side = signal_result['signal_type'] if signal_result and signal_result.get('triggered') else None
+        band = self._band_side(strategy, value, thresholds)
+        with self._lock:
+            state, current_side, since = self.get(strategy)
+            emit = False
+            if side:
+                new = (FIRED, side)
+                emit = not (state in (FIRED, RESET) and current_side == side)
+            elif state in (FIRED, RESET) and band == current_side:
+                new = (RESET, current_side)
+            elif band:
+                new = (ARMED, band)
+            else:
+                new = (IDLE, None)
+
+            if emit:
+                self._before_fired[strategy.id] = (state, current_side, since)
+            if new != (state, current_side):
+                logger.debug(f"Signal state {strategy.stock_code}: {state}/{current_side} -> {new[0]}/{new[1]}")
+                self._states[strategy.id] = (*new, datetime.now())
+                self._dirty.add(strategy.id)
+            return emit
+
+    def revert(self, strategy):
+        """
+        Undo the last firing step of a strategy whose alarm was not queued
+        (Redis unavailable, dropped by backpressure).
+        """
+        with self._lock:
+            previous = self._before_fired.pop(strategy.id, None)
+            if previous is not None:
+                self._states[strategy.id] = previous
+                self._dirty.add(strategy.id)
+
+    def reset(self, strategy_id: int):
+        """
+        Forget a strategy's state (e.g. after its thresholds or rules changed).
+        """
+        with self._lock:
+            self._states[strategy_id] = (IDLE, None, datetime.now())
+            self._dirty.add(strategy_id)
+
+    def export(self) -> dict:
+        with self._lock:
+            return dict(self._states)
+
+    def restore(self, states: dict):
+        """
+        Load exported states; each is used only if newer than its row's checkpoint.
+        """
+        with self._lock:
+            self._restored.update(states)
+
+    def memory_entries(self) -> list:
+        with self._lock:
+            return [(sid, None, None, estimate_bytes(state), None) for sid, state in self._states.items()]
+
+    def checkpoint(self, db) -> int:
+        """
+        Write changed states to the strategy rows in one commit. Returns the
+        number of rows written.
+        """
+        with self._lock:
+            rows = [
+                {"id": sid, "signal_state": state, "signal_side": side, "signal_state_at": since}
+                for sid, (state, side, since) in ((sid, self._states[sid]) for sid in self._dirty)
+            ]
+            self._dirty.clear()
+        if not rows:
+            return 0
+        try:
+            with DB_LATENCY.labels(operation="checkpoint_signal_state").time():
+                db.execute(update(UserStrategy), rows)
+                versions.bump(db, versions.STRATEGIES)
+                db.commit()
+        except Exception:
+            db.rollback()
+            with self._lock:
+                self._dirty.update(row["id"] for row in rows)
+            raise
+        return len(rows)
+
+
+signal_state = SignalStateMachine()
+memory_budget.register("signal_states", signal_state)
@@ -0,0 +1,98 @@
+"""
+Warm-start snapshot of in-process working state.
+
+Saved periodically and at shutdown, loaded at startup before the scheduler
+starts:
+    - base bar series from the bar cache (derived timeframes are rebuilt),
+    - signal states (see signal_state.py),
+    - symbol metadata (names).
+
+Restored bars keep their original fetch time, so the first scan refreshes
+them by fetching only the missing tail (MarketDataService._refresh_tail).
+Indicator results are not stored: they are recomputed from the restored bars
+and memoized again on first use.
+
+The file is a gzip-compressed pickle written atomically (temp file +
+rename). It is only ever read from the path this process writes to.
+"""
+import gzip
+import os
+import pickle
+import time
+from loguru import logger
+from app.core.config import settings
+from app.services.bar_cache import bar_cache
+from app.services.market_data import MarketDataService
+from app.services.signal_state import signal_state
+
+SNAPSHOT_VERSION = 1
+
+
+def save_snapshot(path: str = None) -> int:
+    """
+    Write the snapshot. Returns the file size in bytes (0 if disabled).
+    """
+    path = path or settings.SNAPSHOT_PATH
+    if not path:
+        return 0
+    state = {
+        "version": SNAPSHOT_VERSION,
+        "saved_at": time.time(),
+        "bars": bar_cache.export(),
+        "signal_states": signal_state.export(),
+        "symbol_info": dict(MarketDataService._symbol_info),
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    start = time.perf_counter()
+    tmp = f"{path}.tmp"
+    with gzip.open(tmp, "wb", compresslevel=3) as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+    size = os.path.getsize(path)
+    logger.info(f"Snapshot saved: {len(state['bars'])} series, {len(state['signal_states'])} signal states, "
+                f"{size / 1024:.0f} KiB in {time.perf_counter() - start:.2f}s")
+    return size
+
+
+def load_snapshot(path: str = None) -> bool:
+    """
+    Restore state from the snapshot if present, compatible and recent enough.
+    Never raises: a bad snapshot only means a cold start.
+    """
+    path = path or settings.SNAPSHOT_PATH
+    if not path or not os.path.exists(path):
+        return False
+    try:
+        with gzip.open(path, "rb") as f:
+            state = pickle.load(f)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable snapshot {path}: {e}")
+        return False
+
+    if state.get("version") != SNAPSHOT_VERSION:
+        logger.warning(f"Ignoring snapshot {path}: version {state.get('version')} != {SNAPSHOT_VERSION}")
+        return False
+    age = time.time() - state.get("saved_at", 0)
+    if age > settings.SNAPSHOT_MAX_AGE:
+        logger.info(f"Ignoring snapshot {path}: {age / 3600:.1f}h old")
+        return False
+
+    bar_cache.restore(state["bars"])
+    signal_state.restore(state["signal_states"])
+    for code, info in state["symbol_info"].items():
+        MarketDataService._symbol_info.setdefault(code, info)
+    logger.info(f"Snapshot loaded ({age / 60:.0f} min old): {len(state['bars'])} series, "
+                f"{len(state['signal_states'])} signal states, {len(state['symbol_info'])} symbols")
+    return True
+
+
+def save_snapshot_job():
+    """
+    Scheduler job wrapper: log instead of raising.
+    """
+    try:
+        save_snapshot()
+    except Exception as e:
+        logger.error(f"Snapshot save failed: {e}")
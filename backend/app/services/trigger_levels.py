@@ -0,0 +1,235 @@
+"""
+Trigger prices for daily RSI strategies.
+
+For a daily strategy the only unknown intraday is today's close. RSI is
+built from Wilder averages of up/down moves,
+    avg_t = w_t * move_t + (1 - w_t) * avg_{t-1},
+so given the averages of the last completed bar, RSI as a function of
+today's price has a closed form and can be inverted: the price at which the
+forming bar takes RSI across rsi_low / rsi_high is computed once per
+completed bar, and intraday evaluation is a comparison against the spot
+price.
+
+With the trend filter the buy threshold is rsi_low +/- 5 depending on price
+vs MA60, and MA60 includes today's price: price > (sum59 + price) / 60 is
+price > sum59 / 59, so the crossing price is the mean of the last 59 closes.
+
+The averages follow the same definition as pandas_ta's RSI (EWM with
+alpha = 1/length, bias-corrected weights w_t = alpha / (1 - (1-alpha)^n)).
+"""
+import threading
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from app.services.indicator import IndicatorService
+from app.services.trading_hours import TradingHours
+
+# Same threshold adjustments as SignalEngine.check_signal
+TREND_ADJUSTMENT = 5.0
+MA_LENGTH = 60
+
+
+class WilderState:
+    """
+    RSI averages after the last completed bar.
+    """
+    def __init__(self, avg_up: float, avg_down: float, count: int, length: int, prev_close: float):
+        self.avg_up = avg_up
+        self.avg_down = avg_down
+        self.count = count  # moves included so far
+        self.length = length
+        self.prev_close = prev_close
+
+    @classmethod
+    def from_closes(cls, close: pd.Series, length: int):
+        close = close.dropna()
+        if len(close) <= length:
+            return None
+        delta = close.diff()
+        alpha = 1.0 / length
+        avg_up = delta.clip(lower=0).ewm(alpha=alpha).mean().iloc[-1]
+        avg_down = (-delta).clip(lower=0).ewm(alpha=alpha).mean().iloc[-1]
+        return cls(float(avg_up), float(avg_down), len(close) - 1, length, float(close.iloc[-1]))
+
+    @property
+    def weight(self) -> float:
+        """Weight of the next move."""
+        alpha = 1.0 / self.length
+        return alpha / (1 - (1 - alpha) ** (self.count + 1))
+
+    def rsi_at(self, price: float):
+        """RSI if the forming bar closed at `price`."""
+        w = self.weight
+        move = price - self.prev_close
+        up = w * max(move, 0.0) + (1 - w) * self.avg_up
+        down = w * max(-move, 0.0) + (1 - w) * self.avg_down
+        if up + down == 0:
+            return None
+        return 100.0 * up / (up + down)
+
+    def price_for(self, target: float):
+        """
+        Price at which RSI equals `target`: RSI is below it at lower prices
+        and above it at higher ones. None if unreachable at a positive price.
+        """
+        if not 0 < target < 100:
+            return None
+        w = self.weight
+        up = (1 - w) * self.avg_up
+        down = (1 - w) * self.avg_down
+        if up + down == 0:
+            return None
+        if target >= 100.0 * up / (up + down):
+            # Needs a rise: 100 * (up + w*m) / (up + w*m + down) = target
+            move = (target * down / (100.0 - target) - up) / w
+        else:
+            # Needs a fall: 100 * up / (up + down + w*m) = target
+            move = -(100.0 * up / target - up - down) / w
+        price = self.prev_close + move
+        return price if price > 0 else None
+
+
+class TriggerLevels:
+    """
+    Trigger prices of one strategy for the forming daily bar.
+    Buy fires below buy_price (buy_price_uptrend above ma_cross with the trend
+    filter), sell fires above sell_price.
+    """
+    def __init__(self, bar_date, state: WilderState, buy_price, sell_price,
+                 ma_cross=None, buy_price_uptrend=None):
+        self.bar_date = bar_date
+        self.state = state
+        self.buy_price = buy_price
+        self.sell_price = sell_price
+        self.ma_cross = ma_cross
+        self.buy_price_uptrend = buy_price_uptrend
+
+    def buy_threshold(self, price: float):
+        if self.ma_cross is not None and price > self.ma_cross:
+            return self.buy_price_uptrend
+        return self.buy_price
+
+    def check(self, price: float):
+        """
+        "buy", "sell" or None for a spot price, as SignalEngine would decide.
+        """
+        buy = self.buy_threshold(price)
+        if buy is not None and price < buy:
+            return "buy"
+        if self.sell_price is not None and price > self.sell_price:
+            return "sell"
+        return None
+
+    def rsi_at(self, price: float):
+        return self.state.rsi_at(price)
+
+    def rsi_thresholds(self, strategy, price: float) -> tuple:
+        """
+        (buy, sell) RSI thresholds at a spot price, as SignalEngine.effective_thresholds.
+        """
+        if self.ma_cross is None:
+            return strategy.rsi_low, strategy.rsi_high
+        adjust = TREND_ADJUSTMENT if price > self.ma_cross else -TREND_ADJUSTMENT
+        return strategy.rsi_low + adjust, strategy.rsi_high
+
+    def to_dict(self) -> dict:
+        def _round(value):
+            return round(value, 4) if value is not None else None
+        return {
+            "last_bar_date": str(self.bar_date) if self.bar_date is not None else None,
+            "prev_close": _round(self.state.prev_close),
+            "rsi_length": self.state.length,
+            "buy_price": _round(self.buy_price),
+            "buy_price_uptrend": _round(self.buy_price_uptrend),
+            "ma60_cross": _round(self.ma_cross),
+            "sell_price": _round(self.sell_price),
+        }
+
+
+def completed_bars(df: pd.DataFrame, now: datetime = None) -> pd.DataFrame:
+    """
+    Daily bars without today's bar while the session is still open. After
+    the close, today's bar is complete and the levels apply to the next one.
+    """
+    now = now or datetime.now()
+    if ("date" in df.columns and len(df) and now.time() < TradingHours.AFTERNOON_END
+            and pd.Timestamp(df["date"].iloc[-1]).date() >= now.date()):
+        return df.iloc[:-1]
+    return df
+
+
+def compute_levels(df: pd.DataFrame, strategy, now: datetime = None):
+    """
+    TriggerLevels for a daily strategy from its history, or None with too
+    little data. Rule-based strategies have no closed form.
+    """
+    if getattr(strategy, "buy_rule", None) or getattr(strategy, "sell_rule", None):
+        return None
+    bars = completed_bars(df, now)
+    close = IndicatorService._close_series(bars)
+    length = strategy.rsi_length or 14
+    state = WilderState.from_closes(close, length)
+    if state is None:
+        return None
+
+    bar_date = bars["date"].iloc[-1] if "date" in bars.columns else None
+    sell_price = state.price_for(strategy.rsi_high)
+    if not strategy.enable_trend_filter:
+        return TriggerLevels(bar_date, state, state.price_for(strategy.rsi_low), sell_price)
+
+    recent = close.dropna().to_numpy()[-(MA_LENGTH - 1):]
+    if len(recent) < MA_LENGTH - 1:
+        # MA60 not available yet: check_signal uses the base threshold
+        return TriggerLevels(bar_date, state, state.price_for(strategy.rsi_low), sell_price)
+    return TriggerLevels(
+        bar_date, state,
+        buy_price=state.price_for(strategy.rsi_low - TREND_ADJUSTMENT),
+        sell_price=sell_price,
+        ma_cross=float(np.mean(recent)),
+        buy_price_uptrend=state.price_for(strategy.rsi_low + TREND_ADJUSTMENT),
+    )
+
+
+class TriggerCache:
+    """
+    Levels per strategy, recomputed when a bar completes or the strategy changes.
+    """
+    def __init__(self):
+        self._entries = {}  # strategy id -> (key, levels)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(df: pd.DataFrame, strategy, now: datetime):
+        bars = completed_bars(df, now)
+        last = bars.iloc[-1] if len(bars) else None
+        return (
+            len(bars),
+            str(last["date"]) if last is not None and "date" in bars.columns else None,
+            # History re-adjusted upstream changes closes without adding bars
+            float(last["close"]) if last is not None and "close" in bars.columns else None,
+            strategy.rsi_low, strategy.rsi_high, strategy.rsi_length,
+            bool(strategy.enable_trend_filter),
+            getattr(strategy, "buy_rule", None), getattr(strategy, "sell_rule", None),
+        )
+
+    def get(self, strategy, df: pd.DataFrame, now: datetime = None):
+        now = now or datetime.now()
+        key = self._key(df, strategy, now)
+        with self._lock:
+            entry = self._entries.get(strategy.id)
+            if entry is not None and entry[0] == key:
+                return entry[1]
+        levels = compute_levels(df, strategy, now)
+        with self._lock:
+            self._entries[strategy.id] = (key, levels)
+        return levels
+
+    def invalidate(self, strategy_id=None):
+        with self._lock:
+            if strategy_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(strategy_id, None)
+
+
+trigger_levels = TriggerCache()
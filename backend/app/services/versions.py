@@ -0,0 +1,44 @@
+"""
+Version counters of API resources.
+
+Writers bump the counter of what they changed in the same transaction, so
+readers in any process can tell whether a resource changed from one small
+query and answer conditional requests with 304 (see core/etag.py).
+"""
+from sqlalchemy import update
+from app.models import ResourceVersion
+
+STOCKS = "stocks"
+STRATEGIES = "strategies"
+NAMES = (STOCKS, STRATEGIES)
+
+
+def seed(db):
+    """
+    Create the missing counter rows (at 0) so bump only ever updates:
+    two first bumps in concurrent transactions would both insert.
+    """
+    existing = {name for (name,) in db.query(ResourceVersion.name)}
+    for name in NAMES:
+        if name not in existing:
+            db.add(ResourceVersion(name=name, version=0))
+
+
+def bump(db, *names: str):
+    """
+    Increment the counters; takes effect when the caller commits.
+    Rows are seeded by init_db; the insert only covers unseeded databases.
+    """
+    for name in names:
+        result = db.execute(
+            update(ResourceVersion)
+            .where(ResourceVersion.name == name)
+            .values(version=ResourceVersion.version + 1)
+        )
+        if result.rowcount == 0:
+            db.add(ResourceVersion(name=name, version=1))
+
+
+def current(db, name: str) -> int:
+    version = db.query(ResourceVersion.version).filter(ResourceVersion.name == name).scalar()
+    return version or 0
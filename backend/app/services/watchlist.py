@@ -0,0 +1,299 @@
+"""
+Bulk watchlist import / export.
+
+Imports accept CSV (header row required) or JSON (a list of codes or of
+objects) with the columns:
+    stock_code, stock_name, stock_type, plus any strategy field
+    (rsi_low, rsi_high, rsi_period, rsi_length, enable_push, ...).
+
+All codes are validated in one pass against the listed-symbol index (one
+listing call per stock type, refreshed every SYMBOL_INDEX_TTL seconds), then
+stocks and strategies are upserted with bulk statements in one transaction.
+Exports produce the same columns, so an export can be imported elsewhere.
+"""
+import csv
+import io
+import json
+import re
+import threading
+import time
+from loguru import logger
+from sqlalchemy import insert, update
+from app.core.config import settings
+from app.models import UserStock, UserStrategy
+from app.services import versions
+from app.services.providers import get_provider
+
+STOCK_TYPES = ("stock", "etf")
+STOCK_FIELDS = ("stock_code", "stock_name", "stock_type")
+# Strategy columns that can be imported/exported, with their parser
+STRATEGY_FIELDS = {
+    "rsi_low": float,
+    "rsi_high": float,
+    "rsi_period": str,
+    "rsi_length": int,
+    "enable_push": "bool",
+    "enable_trend_filter": "bool",
+    "enable_volatility_filter": "bool",
+    "buy_rule": str,
+    "sell_rule": str,
+}
+# Same defaults as POST /api/stock/add
+DEFAULT_STRATEGY = {
+    "rsi_low": 30.0,
+    "rsi_high": 70.0,
+    "rsi_period": "daily",
+    "rsi_length": 14,
+    "enable_push": True,
+}
+EXPORT_FIELDS = STOCK_FIELDS + tuple(STRATEGY_FIELDS)
+
+_CODE_RE = re.compile(r"^(?:sh|sz|bj)?(\d{6})(?:\.(?:sh|sz|bj|ss))?$")
+
+
+class WatchlistError(ValueError):
+    pass
+
+
+class SymbolIndex:
+    """
+    Listed symbols per stock type ({code: name}), loaded in one call each.
+    A failed refresh keeps the previous listing; with none, lookups return
+    None and callers fall back to format-only validation.
+    """
+    def __init__(self, ttl: int = None):
+        self.ttl = ttl if ttl is not None else settings.SYMBOL_INDEX_TTL
+        self._symbols = {}    # stock_type -> {code: name}
+        self._loaded_at = {}  # stock_type -> time
+        self._lock = threading.Lock()
+
+    def get(self, stock_type: str):
+        with self._lock:
+            if time.time() - self._loaded_at.get(stock_type, 0) > self.ttl:
+                try:
+                    symbols = get_provider().list_symbols(stock_type)
+                    if symbols:
+                        self._symbols[stock_type] = symbols
+                except Exception as e:
+                    logger.warning(f"Symbol listing failed for {stock_type}: {e}")
+                # Failed refreshes are retried after the TTL as well
+                self._loaded_at[stock_type] = time.time()
+            return self._symbols.get(stock_type)
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at.clear()
+
+
+symbol_index = SymbolIndex()
+
+
+def normalize_code(raw) -> str:
+    """
+    "600519", "sh600519", "600519.SH" -> "600519"; None if not a code.
+    """
+    match = _CODE_RE.match(str(raw or "").strip().lower())
+    return match.group(1) if match else None
+
+
+def _parse_bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ("1", "true", "yes", "y", "on"):
+        return True
+    if text in ("0", "false", "no", "n", "off"):
+        return False
+    raise ValueError(f"not a boolean: {value!r}")
+
+
+def parse_rows(body: bytes, content_type: str = "") -> list:
+    """
+    Decode an import body into a list of dicts. JSON if the content type
+    says so or the body starts with "[", otherwise CSV.
+    """
+    text = body.decode("utf-8-sig").strip()
+    if not text:
+        return []
+    if "json" in (content_type or "") or text.startswith("["):
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            raise WatchlistError(f"Invalid JSON: {e}")
+        if not isinstance(data, list):
+            raise WatchlistError("JSON body must be a list")
+        rows = [item if isinstance(item, dict) else {"stock_code": item} for item in data]
+    else:
+        reader = csv.DictReader(io.StringIO(text))
+        if not reader.fieldnames or "stock_code" not in [f.strip() for f in reader.fieldnames]:
+            raise WatchlistError("CSV header must include stock_code")
+        rows = [{(k or "").strip(): v for k, v in row.items()} for row in reader]
+    if len(rows) > settings.IMPORT_MAX_ROWS:
+        raise WatchlistError(f"Too many rows ({len(rows)} > {settings.IMPORT_MAX_ROWS})")
+    return rows
+
+
+def _strategy_values(row: dict) -> dict:
+    values = {}
+    for field, parser in STRATEGY_FIELDS.items():
+        value = row.get(field)
+        if value is None or value == "":
+            continue
+        values[field] = _parse_bool(value) if parser == "bool" else parser(value)
+    if values.get("rsi_length") is not None and values["rsi_length"] < 2:
+        raise ValueError("rsi_length must be >= 2")
+    if values.get("rsi_period") is not None:
+        from app.services.resample import base_period
+        if base_period(values["rsi_period"]) is None:
+            raise ValueError(f"unsupported rsi_period {values['rsi_period']!r}")
+    for field in ("buy_rule", "sell_rule"):
+        if values.get(field):
+            from app.services.rules import compile_rule
+            compile_rule(values[field])
+    return values
+
+
+def validate_rows(rows: list, default_type: str = "stock"):
+    """
+    Validate and normalize rows in one pass. Returns (valid, errors): valid
+    is {code: {"stock_name", "stock_type", "strategy", "given"}} (later rows
+    win; "given" lists the stock columns the row set), errors a list of
+    {"row", "stock_code", "error"}.
+    """
+    listings = {}
+    valid, errors = {}, []
+    for number, row in enumerate(rows, start=1):
+        raw_code = row.get("stock_code")
+        code = normalize_code(raw_code)
+        if code is None:
+            errors.append({"row": number, "stock_code": raw_code, "error": "invalid code"})
+            continue
+        requested = (row.get("stock_type") or "").strip().lower() or None
+        if requested is not None and requested not in STOCK_TYPES:
+            errors.append({"row": number, "stock_code": code, "error": f"unknown stock_type {requested}"})
+            continue
+
+        # Explicit type first; without one, an ETF listing match wins over the default
+        candidates = [requested] if requested else [t for t in ("etf", default_type) if t in STOCK_TYPES]
+        stock_type, name, unchecked = None, None, False
+        for candidate in dict.fromkeys(candidates):
+            if candidate not in listings:
+                listings[candidate] = symbol_index.get(candidate)
+            listing = listings[candidate]
+            if listing is None:
+                unchecked = True
+            elif code in listing:
+                stock_type, name = candidate, listing[code]
+                break
+        if stock_type is None:
+            if not unchecked:
+                errors.append({"row": number, "stock_code": code, "error": "unknown symbol"})
+                continue
+            # Listing unavailable: accept on format alone
+            stock_type = requested or default_type
+
+        try:
+            strategy = _strategy_values(row)
+        except Exception as e:
+            errors.append({"row": number, "stock_code": code, "error": str(e)})
+            continue
+        valid[code] = {
+            "stock_name": (row.get("stock_name") or "").strip() or name or code,
+            "stock_type": stock_type,
+            "strategy": strategy,
+            "given": [field for field in ("stock_name", "stock_type") if (row.get(field) or "").strip()],
+        }
+    return valid, errors
+
+
+def upsert(db, valid: dict, user_id: int = 1) -> dict:
+    """
+    Insert new stocks (with default strategies) and update existing ones,
+    using bulk statements and a single commit. Existing stocks only take the
+    name / type columns present in the import. Updated strategies start a
+    new signal episode, as with POST /api/strategies/update.
+    """
+    codes = list(valid)
+    stocks = {s.stock_code: s.id for s in db.query(UserStock.id, UserStock.stock_code)
+              .filter(UserStock.user_id == user_id, UserStock.stock_code.in_(codes))}
+    strategies = {s.stock_code: s.id for s in db.query(UserStrategy.id, UserStrategy.stock_code)
+                  .filter(UserStrategy.user_id == user_id, UserStrategy.stock_code.in_(codes))}
+
+    new_stocks, stock_updates, new_strategies, strategy_updates = [], [], [], []
+    for code, item in valid.items():
+        if code in stocks:
+            given = {field: item[field] for field in item.get("given", ())}
+            if given:
+                stock_updates.append({"id": stocks[code], **given})
+        else:
+            new_stocks.append({"user_id": user_id, "stock_code": code,
+                               "stock_name": item["stock_name"], "stock_type": item["stock_type"]})
+        if code in strategies:
+            if item["strategy"]:
+                strategy_updates.append({"id": strategies[code], **item["strategy"]})
+        else:
+            new_strategies.append({"user_id": user_id, "stock_code": code,
+                                   **DEFAULT_STRATEGY, **item["strategy"]})
+
+    try:
+        if new_stocks:
+            db.execute(insert(UserStock), new_stocks)
+        if stock_updates:
+            db.execute(update(UserStock), stock_updates)
+        if new_strategies:
+            db.execute(insert(UserStrategy), new_strategies)
+        if strategy_updates:
+            db.execute(update(UserStrategy), strategy_updates)
+        versions.bump(db, versions.STOCKS, versions.STRATEGIES)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    if strategy_updates:
+        # Thresholds or rules may have changed; start a new signal episode
+        from app.services.signal_state import signal_state
+        for row in strategy_updates:
+            signal_state.reset(row["id"])
+        signal_state.checkpoint(db)
+    return {
+        "added": [s["stock_code"] for s in new_stocks],
+        "updated": [code for code in codes if code in stocks],
+    }
+
+
+def warm_history(symbols: list):
+    """
+    Prefetch daily history for newly imported symbols (run in the background).
+    """
+    from app.services.market_data import MarketDataService
+    start = time.time()
+    warmed = 0
+    for code, stock_type in symbols:
+        try:
+            df = MarketDataService.get_history_data(code, "daily", stock_type)
+            if df is not None and not df.empty:
+                warmed += 1
+        except Exception as e:
+            logger.debug(f"History warm-up failed for {code}: {e}")
+    logger.info(f"Warmed history for {warmed}/{len(symbols)} imported symbols in {time.time() - start:.1f}s")
+
+
+def export_rows(db, user_id: int = 1) -> list:
+    strategies = {s.stock_code: s for s in db.query(UserStrategy).filter(UserStrategy.user_id == user_id)}
+    rows = []
+    for stock in db.query(UserStock).filter(UserStock.user_id == user_id).order_by(UserStock.id):
+        row = {field: getattr(stock, field) for field in STOCK_FIELDS}
+        strategy = strategies.get(stock.stock_code)
+        for field in STRATEGY_FIELDS:
+            row[field] = getattr(strategy, field) if strategy is not None else None
+        rows.append(row)
+    return rows
+
+
+def to_csv(rows: list) -> str:
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow({k: "" if v is None else v for k, v in row.items()})
+    return out.getvalue()
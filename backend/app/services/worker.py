@@ -1,50 +1,219 @@
 from app.core.queue import alarm_queue
-from app.services.notification import NotificationService
+from app.services.notification import NotificationService, RetryAfter
+from app.services.rate_limit import rate_limiter
 from app.core.database import SessionLocal
 from app.models import UserNotify
 from app.core.config import settings
+from app.core.metrics import DB_LATENCY, ALARM_LATENCY
+from app.services.alarm_history import history_writer, end_to_end_seconds
 import time
+from collections import OrderedDict
+
+TELEGRAM_MAX_LENGTH = 4096
 
 def process_alarms():
     print("Processing alarms...")
     db = SessionLocal()
+    last_digest = time.time()
     try:
         # Process all pending alarms
         while True:
+            # Alarms deferred by queue backpressure go out as one digest per user
+            if time.time() - last_digest >= settings.ALARM_DIGEST_INTERVAL:
+                last_digest = time.time()
+                for digest in alarm_queue.pop_digests():
+                    _deliver(db, digest)
+
+            # Batches held back by the rate limiter
+            send_ready(db)
+
             alarm = alarm_queue.pop_alarm()
             if not alarm:
+                _flush_history(db)
                 time.sleep(1) # Wait 1s before next poll (prevents busy loop if Redis is down)
                 continue
             
-            print(f"Processing alarm: {alarm}")
-            # Get user notify settings
-            user_id = alarm.get("user_id")
-            notify_settings = db.query(UserNotify).filter_by(user_id=user_id).first()
-            
-            # Prepare message
-            message = f"Stock Alert: {alarm['stock_name']} ({alarm['stock_code']})\n" \
-                      f"Reason: {alarm['reason']}\n" \
-                      f"Value: {alarm['value']:.2f}\n" \
-                      f"Price: {alarm['price']}\n" \
-                      f"Time: {alarm['time']}"
-
-            # 1. Telegram Notification
-            tg_id = None
-            if notify_settings and notify_settings.telegram_id:
-                tg_id = notify_settings.telegram_id
-            elif settings.TELEGRAM_CHAT_ID:
-                tg_id = settings.TELEGRAM_CHAT_ID
-            
-            if tg_id:
-                NotificationService.send_telegram(tg_id, message)
-            else:
-                print(f"No Telegram ID configured for user {user_id} or global fallback")
-
-            # 2. Email Notification
-            if notify_settings and notify_settings.email:
-                NotificationService.send_email(notify_settings.email, "Stock Alert", message)
+            _deliver(db, alarm)
             
     except Exception as e:
         print(f"Worker failed: {e}")
     finally:
+        _flush_history(db, force=True)
         db.close()
+
+def _deliver(db, alarm: dict):
+    """
+    deliver_alarm, logging instead of raising: one bad alarm must not stop the worker.
+    """
+    try:
+        deliver_alarm(db, alarm)
+    except Exception as e:
+        db.rollback()
+        print(f"Failed to deliver alarm {alarm.get('stock_code')}: {e}")
+
+def _number(value) -> str:
+    return f"{value:.2f}" if value is not None else "N/A"
+
+def format_message(alarm: dict) -> str:
+    if alarm.get("digest"):
+        lines = [
+            f"{item['stock_name']} ({item['stock_code']}) {item.get('signal_type') or ''}: "
+            f"{item['reason']} @ {item['price']}"
+            for item in alarm["items"]
+        ]
+        return f"Stock Alert Digest: {len(lines)} alerts\n" + "\n".join(lines)
+    return f"Stock Alert: {alarm['stock_name']} ({alarm['stock_code']})\n" \
+           f"Reason: {alarm['reason']}\n" \
+           f"Value: {_number(alarm.get('value'))}\n" \
+           f"Price: {alarm['price']}\n" \
+           f"Time: {alarm['time']}"
+
+class Outbox:
+    """
+    Messages waiting for a rate-limit token, per (user, channel, target).
+    When a token frees up, everything waiting for it goes out as one message.
+    """
+    def __init__(self):
+        self._waiting = OrderedDict()  # (user_id, channel, target) -> {"interval", "items": [(alarm, message)]}
+
+    def add(self, user_id, channel: str, target: str, interval: float, alarm: dict, message: str):
+        entry = self._waiting.setdefault((user_id, channel, target), {"interval": interval, "items": []})
+        entry["interval"] = interval
+        entry["items"].append((alarm, message))
+
+    def requeue(self, key, entry: dict):
+        """Put a batch back at the front (e.g. after a 429)."""
+        waiting = self._waiting.pop(key, None)
+        if waiting:
+            entry["items"].extend(waiting["items"])
+        self._waiting[key] = entry
+        self._waiting.move_to_end(key, last=False)
+
+    def ready(self) -> list:
+        """
+        Pop the batches whose channel has a token available.
+        """
+        batches = []
+        for key in list(self._waiting):
+            user_id, channel, _ = key
+            if rate_limiter.try_acquire(user_id, channel, self._waiting[key]["interval"]) == 0:
+                batches.append((key, self._waiting.pop(key)))
+        return batches
+
+    def __len__(self):
+        return sum(len(entry["items"]) for entry in self._waiting.values())
+
+
+outbox = Outbox()
+
+def combine_messages(messages: list) -> str:
+    """
+    One message for a batch that waited on the rate limit, within Telegram's 4096 chars.
+    """
+    if len(messages) == 1:
+        return messages[0]
+    text = f"Stock Alerts ({len(messages)}, batched by rate limit)"
+    for i, message in enumerate(messages):
+        if len(text) + len(message) + 2 > TELEGRAM_MAX_LENGTH - 40:
+            text += f"\n\n... and {len(messages) - i} more"
+            break
+        text += "\n\n" + message
+    return text
+
+def deliver_alarm(db, alarm: dict):
+    """
+    Queue an alarm (or digest) for the user's channels. Sends go through the
+    per-user/channel rate limiter; the alarm is recorded in the history once
+    every channel has been attempted.
+    """
+    print(f"Processing alarm: {alarm}")
+    # Get user notify settings
+    user_id = alarm.get("user_id")
+    with DB_LATENCY.labels(operation="load_notify").time():
+        notify_settings = db.query(UserNotify).filter_by(user_id=user_id).first()
+    
+    # Prepare message
+    message = format_message(alarm)
+    interval = notify_settings.notify_rate_limit if notify_settings else settings.NOTIFY_RATE_LIMIT_DEFAULT
+    targets = []
+
+    # 1. Telegram Notification
+    tg_id = None
+    if notify_settings and notify_settings.telegram_id:
+        tg_id = notify_settings.telegram_id
+    elif settings.TELEGRAM_CHAT_ID:
+        tg_id = settings.TELEGRAM_CHAT_ID
+    
+    if tg_id:
+        targets.append(("telegram", tg_id))
+    else:
+        print(f"No Telegram ID configured for user {user_id} or global fallback")
+
+    # 2. Email Notification
+    if notify_settings and notify_settings.email:
+        targets.append(("email", notify_settings.email))
+
+    alarm.setdefault("stages", {})
+    alarm["pending_channels"] = len(targets)
+    if not targets:
+        _finish_alarm(db, alarm)
+    for channel, target in targets:
+        outbox.add(user_id, channel, target, interval, alarm, message)
+    send_ready(db)
+
+def send_ready(db):
+    """
+    Send every outbox batch whose rate-limit token is available.
+    """
+    for key, entry in outbox.ready():
+        user_id, channel, target = key
+        alarms = [alarm for alarm, _ in entry["items"]]
+        message = combine_messages([message for _, message in entry["items"]])
+        try:
+            if channel == "telegram":
+                sent = NotificationService.send_telegram(target, message)
+            else:
+                sent = NotificationService.send_email(target, "Stock Alert", message)
+        except RetryAfter as e:
+            # Honor the provider's backoff, then retry the whole batch
+            rate_limiter.block(user_id, channel, e.seconds, entry["interval"])
+            outbox.requeue(key, entry)
+            continue
+
+        sent_at = time.time()
+        for alarm in alarms:
+            if sent:
+                alarm["stages"][f"sent_{channel}"] = sent_at
+            alarm["pending_channels"] -= 1
+            if alarm["pending_channels"] <= 0:
+                _finish_alarm(db, alarm)
+
+def _finish_alarm(db, alarm: dict):
+    """
+    Record latency and persist an alarm whose channels have all been attempted.
+    """
+    stages = alarm["stages"]
+    latency = end_to_end_seconds(alarm)
+    if latency is not None:
+        ALARM_LATENCY.observe(latency)
+
+    # 3. Persist to alarm history (with stage timestamps), written in batches
+    if alarm.get("digest"):
+        # Each digested alarm was delivered by the digest message
+        for item in alarm["items"]:
+            item.setdefault("stages", {}).update(
+                {k: v for k, v in stages.items() if k in ("dequeued", "sent_telegram", "sent_email")}
+            )
+            history_writer.add(item)
+    else:
+        history_writer.add(alarm)
+    _flush_history(db)
+
+def _flush_history(db, force: bool = False):
+    if not force and not history_writer.due():
+        return
+    try:
+        with DB_LATENCY.labels(operation="flush_alarm_history").time():
+            history_writer.flush(db)
+    except Exception as e:
+        print(f"Failed to write alarm history ({history_writer.pending()} pending): {e}")
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.models import Base
+
+def random_walk(n=1000, seed=3, start="2020-01-01", ohlcv=True):
+    """Daily bars of a seeded log-normal walk from 10; date and close only unless ohlcv."""
+    rng = np.random.default_rng(seed)
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    df = pd.DataFrame({"date": pd.date_range(start, periods=n), "close": close})
+    if ohlcv:
+        df = df.assign(open=close, high=close * 1.01, low=close * 0.99,
+                       volume=rng.integers(1000, 5000, n).astype(float))
+        df = df[["date", "open", "high", "low", "close", "volume"]]
+    return df
+
+@pytest.fixture
+def walk():
+    return random_walk
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
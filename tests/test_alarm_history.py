@@ -0,0 +1,69 @@
+from datetime import datetime
+import pytest
+from fastapi import HTTPException
+from app.api.alarms import list_alarms
+from app.models import AlarmEvent
+from app.services.alarm_history import (AlarmHistoryWriter, decode_cursor, encode_cursor, end_to_end_seconds,
+                                        latency_rows, query_page, stage_latency_stats)
+
+def alarm(code, time, signal_type="buy"):
+    return {"user_id": 1, "stock_code": code, "signal_type": signal_type, "reason": "rsi",
+            "value": 25.0, "threshold": 30.0, "price": 10.0, "time": time,
+            "stages": {"computed": 100.0, "enqueued": 100.5}}
+
+def test_cursor_round_trip():
+    at = datetime(2024, 3, 1, 9, 30, 5, 120000)
+    assert decode_cursor(encode_cursor(at, 42)) == (at, 42)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+def test_malformed_cursor_is_a_400(db):
+    with pytest.raises(HTTPException) as exc:
+        list_alarms(user_id=None, stock_code=None, since=None, until=None, cursor="bm9waXBl", limit=50, db=db)
+    assert exc.value.status_code == 400
+
+def test_partial_batch_flush(db):
+    writer = AlarmHistoryWriter(batch_size=10, flush_seconds=3600)
+    writer.add(alarm("600519", "2024-03-01T10:00:00"))
+    writer.add(alarm("000001", "2024-03-01T10:00:01"))
+    assert writer.pending() == 2 and not writer.due()
+    assert writer.maybe_flush(db) == 0
+    assert writer.flush(db) == 2
+    assert writer.pending() == 0 and writer.flush(db) == 0
+    rows = db.query(AlarmEvent).order_by(AlarmEvent.id).all()
+    assert [r.stock_code for r in rows] == ["600519", "000001"]
+    assert rows[0].created_at == datetime(2024, 3, 1, 10, 0)
+    assert rows[0].computed_ts == 100.0 and rows[0].enqueued_ts == 100.5
+
+def test_pages_cover_ties_without_gaps(db):
+    writer = AlarmHistoryWriter(batch_size=100)
+    # Five events share a timestamp, so a page boundary falls inside the tie
+    times = ["2024-03-01T10:00:00"] * 2 + ["2024-03-01T10:05:00"] * 5 + ["2024-03-01T10:10:00"] * 3
+    for i, time in enumerate(times):
+        writer.add(alarm(f"{600000 + i}", time))
+    writer.flush(db)
+
+    seen, cursor = [], None
+    while True:
+        events, cursor = query_page(db, user_id=1, cursor=cursor, limit=3)
+        seen.extend(events)
+        if cursor is None:
+            break
+    assert len(seen) == 10 and len({e.id for e in seen}) == 10
+    keys = [(e.created_at, e.id) for e in seen]
+    assert keys == sorted(keys, reverse=True)
+
+def test_latency_from_stage_columns(db):
+    writer = AlarmHistoryWriter()
+    sent = alarm("600519", "2024-03-01T10:00:00")
+    sent["stages"].update(dequeued=101.0, sent_telegram=102.0, sent_email=103.5)
+    assert end_to_end_seconds(sent) == 3.5
+    writer.add(sent)
+    writer.add(alarm("000001", "2024-03-01T10:01:00"))
+    writer.add(alarm("000002", "2024-02-01T10:00:00"))  # outside the window
+    writer.flush(db)
+    rows = latency_rows(db, datetime(2024, 3, 1))
+    assert len(rows) == 2 and len(latency_rows(db, datetime(2024, 3, 1), limit=1)) == 1
+    stats = stage_latency_stats(rows)
+    assert stats["enqueue"]["count"] == 2 and stats["enqueue"]["p50"] == 0.5
+    assert stats["end_to_end"] == {"count": 1, "p50": 3.5, "p95": 3.5, "p99": 3.5}
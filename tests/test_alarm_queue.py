@@ -0,0 +1,24 @@
+from app.core.config import settings
+from app.core.queue import AlarmQueue
+
+def test_weighted_lanes_drain_in_proportion():
+    queue = AlarmQueue()
+    picks = [queue._next_lane(["strong", "normal", "info"]) for _ in range(100)]
+    weights = settings.ALARM_LANE_WEIGHTS
+    total = sum(weights.values())
+    for lane, weight in weights.items():
+        assert abs(picks.count(lane) - 100 * weight / total) <= 1
+    # A single busy lane is drained continuously
+    assert {queue._next_lane(["info"]) for _ in range(5)} == {"info"}
+
+def test_overflow_policy():
+    queue = AlarmQueue()
+    limit = settings.ALARM_USER_MAX_DEPTH
+    assert queue._overflow_action("normal", limit - 1, 0) is None
+    assert queue._overflow_action("normal", limit, 0) == "digest"
+    assert queue._overflow_action("info", limit, 0) == "drop"
+    # Intrabar alarms are the only alarm of their episode: digested, not dropped
+    assert queue._overflow_action("info", limit, 0, intrabar=True) == "digest"
+    assert queue._overflow_action("normal", 0, settings.ALARM_BACKLOG_THRESHOLD) == "digest"
+    # Strong alarms are never held back
+    assert queue._overflow_action("strong", limit * 10, settings.ALARM_BACKLOG_THRESHOLD * 10) is None
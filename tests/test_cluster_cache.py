@@ -0,0 +1,108 @@
+import threading
+import time
+import numpy as np
+import pandas as pd
+from app.core.config import settings
+from app.services.cluster_cache import (
+    ClusterCache, decode_bars, decode_spot, encode_bars, encode_spot, RELEASE_SCRIPT,
+)
+
+class FakeRedis:
+    """Just enough of redis.Redis for the cache: GET/SET NX/PUBLISH and the release script."""
+    def __init__(self):
+        self.data = {}
+        self.published = []
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, nx=False, px=None, ex=None):
+        with self._lock:
+            if nx and key in self.data:
+                return None
+            self.data[key] = value
+            return True
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+
+    def register_script(self, script):
+        assert script == RELEASE_SCRIPT
+        def release(keys, args, client=None):
+            with self._lock:
+                if self.data.get(keys[0]) == args[0]:
+                    del self.data[keys[0]]
+        return release
+
+def node(redis):
+    cache = ClusterCache()
+    cache._client = redis
+    cache._release = redis.register_script(RELEASE_SCRIPT)
+    return cache
+
+def bars(n=300):
+    close = np.linspace(10, 12, n)
+    return pd.DataFrame({
+        "date": pd.date_range("2023-01-02", periods=n),
+        "open": close, "high": close + 0.1, "low": close - 0.1, "close": close,
+        "volume": np.full(n, 5e5),
+    })
+
+def test_encodings_round_trip():
+    df = bars()
+    decoded, fetched_at = decode_bars(encode_bars(df, 42.0))
+    assert fetched_at == 42.0
+    pd.testing.assert_frame_equal(decoded, df, check_dtype=False)
+    quotes = {"600519": {"name": "贵州茅台", "price": 1500.5, "open": 1490.0, "high": 1510.0,
+                         "low": 1480.0, "volume": None}}
+    assert decode_spot(encode_spot(quotes, 7.0)) == (quotes, 7.0)
+    assert decode_spot(encode_spot({}, 7.0)) == ({}, 7.0)
+
+def test_one_upstream_fetch_across_nodes(monkeypatch):
+    monkeypatch.setattr(settings, "CLUSTER_LOCK_WAIT", 5.0)
+    redis = FakeRedis()
+    nodes = [node(redis) for _ in range(3)]
+    calls = []
+
+    def fetch(stale):
+        calls.append(stale)
+        time.sleep(0.2)
+        return bars()
+
+    results = []
+    threads = [threading.Thread(target=lambda n=n: results.append(n.bars(("600519", "daily", "stock"), 60, fetch)))
+               for n in nodes for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert len(results) == 9 and all(len(df) == 300 for df, _ in results)
+    # The fetching node announced the new bars; the lock is released
+    assert [message.split("|")[1] for _, message in redis.published] == ["bars:600519:daily:stock"]
+    assert "bars_lock:600519:daily:stock" not in redis.data
+
+def test_stale_entry_is_refreshed_from_its_copy():
+    redis = FakeRedis()
+    cache = node(redis)
+    redis.data["bars:600519:daily:stock"] = encode_bars(bars(), time.time() - 3600)
+    stale_seen = []
+    df, fetched_at = cache.bars(("600519", "daily", "stock"), 60,
+                                lambda stale: stale_seen.append(stale) or bars(301))
+    assert len(stale_seen[0]) == 300 and len(df) == 301
+    assert time.time() - fetched_at < 5
+
+def test_invalidation_from_other_nodes_only():
+    cache = ClusterCache()
+    dropped = []
+    cache.on_invalidate = dropped.append
+    cache._handle(f"{cache.node_id}|bars:600519:daily:stock".encode())
+    cache._handle(b"othernode|bars:000001:5:etf")
+    assert dropped == [("000001", "5", "etf")]
+
+def test_without_redis_fetches_directly():
+    cache = ClusterCache()
+    cache._retry_at = float("inf")  # As after a failed connect
+    df, _ = cache.bars(("600519", "daily", "stock"), 60, lambda stale: bars())
+    assert len(df) == 300
@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+from app.core.etag import make_etag, not_modified
+from app.services import versions
+from app.models import ResourceVersion
+
+def request_with(header=None):
+    return SimpleNamespace(headers={"if-none-match": header} if header else {})
+
+def test_etag_matching():
+    etag = make_etag("stocks", 3)
+    assert etag.startswith('W/"')
+    assert etag == make_etag("stocks", 3)
+    assert etag != make_etag("stocks", 4)
+    assert not not_modified(request_with(), etag)
+    assert not_modified(request_with(etag), etag)
+    # Weak comparison, lists and wildcard
+    assert not_modified(request_with(etag[2:]), etag)
+    assert not_modified(request_with(f'"other", {etag}'), etag)
+    assert not_modified(request_with("*"), etag)
+    assert not not_modified(request_with(make_etag("stocks", 4)), etag)
+
+def test_version_counters(db):
+    assert versions.current(db, versions.STOCKS) == 0
+    versions.bump(db, versions.STOCKS, versions.STRATEGIES)
+    db.commit()
+    versions.bump(db, versions.STOCKS)
+    db.commit()
+    assert versions.current(db, versions.STOCKS) == 2
+    assert versions.current(db, versions.STRATEGIES) == 1
+    # Uncommitted bumps are rolled back with the transaction
+    versions.bump(db, versions.STRATEGIES)
+    db.rollback()
+    assert versions.current(db, versions.STRATEGIES) == 1
+
+def test_seeded_counters_are_only_updated(db):
+    versions.seed(db)
+    versions.seed(db)
+    db.commit()
+    assert db.query(ResourceVersion).count() == len(versions.NAMES)
+    assert versions.current(db, versions.STOCKS) == 0
+    # Pending inserts would show up in the session; seeded rows are updated in place
+    versions.bump(db, versions.STOCKS)
+    assert not db.new
+    db.commit()
+    assert versions.current(db, versions.STOCKS) == 1
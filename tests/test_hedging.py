@@ -0,0 +1,43 @@
+import time
+import pytest
+from app.core.config import settings
+from app.services.hedging import hedged, LatencyTracker
+
+def source(value, delay=0.0, error=None):
+    def fn():
+        time.sleep(delay)
+        if error:
+            raise error
+        return value
+    return fn
+
+@pytest.fixture(autouse=True)
+def fast_hedging(monkeypatch):
+    monkeypatch.setattr(settings, "HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "HEDGE_MAX_DELAY", 0.05)
+    monkeypatch.setattr(settings, "HEDGE_MIN_DELAY", 0.01)
+
+def test_slow_primary_is_hedged():
+    start = time.perf_counter()
+    result = hedged("test_slow", [("a", source([1], delay=1.0)), ("b", source([2], delay=0.01))])
+    assert result == [2]
+    assert time.perf_counter() - start < 0.5
+
+def test_fast_primary_wins():
+    assert hedged("test_fast", [("a", source([1])), ("b", source([2], delay=0.2))]) == [1]
+
+def test_failure_and_empty_fail_over():
+    sources = [("a", source(None, error=ConnectionError("down"))), ("b", source([])), ("c", source([3]))]
+    assert hedged("test_failover", sources) == [3]
+
+def test_all_failed():
+    with pytest.raises(ConnectionError):
+        hedged("test_failed", [("a", source(None, error=ConnectionError("down"))), ("b", source(None, error=ValueError()))])
+    assert hedged("test_empty", [("a", source([])), ("b", source(None, error=ValueError()))]) == []
+
+def test_hedge_delay_tracks_p90():
+    tracker = LatencyTracker(window=100)
+    assert tracker.hedge_delay("k") == settings.HEDGE_MAX_DELAY
+    for i in range(100):
+        tracker.observe("k", 0.001 * (i + 1) / 100)
+    assert tracker.hedge_delay("k") == settings.HEDGE_MIN_DELAY
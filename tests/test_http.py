@@ -0,0 +1,48 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import requests
+from app.core import http
+from app.core.config import settings
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    wbufsize = 65536
+    connections = 0
+
+    def setup(self):
+        Handler.connections += 1
+        super().setup()
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+def serve():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/"
+
+def test_requests_get_reuses_connections():
+    server, url = serve()
+    Handler.connections = 0
+    http.install()
+    try:
+        for _ in range(20):
+            assert requests.get(url).text == "ok"
+        assert Handler.connections == 1
+
+        # Concurrent callers share at most HTTP_MAX_PER_HOST connections
+        with ThreadPoolExecutor(32) as pool:
+            assert set(pool.map(lambda _: requests.get(url).status_code, range(200))) == {200}
+        assert Handler.connections <= settings.HTTP_MAX_PER_HOST + 1
+        assert http.transport.stats()[url.rstrip("/")]["requests"] == 220
+    finally:
+        http.uninstall()
+        http.transport.close()
+        server.shutdown()
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.services import indicator_cache as cache_module
+from app.services.indicator import IndicatorService
+from app.services.indicator_cache import IndicatorCache, fingerprint
+from app.services.realtime import RealtimeIngestor
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = IndicatorCache(max_entries=100)
+    monkeypatch.setattr(cache_module, "indicator_cache", cache)
+    return cache
+
+def daily(n=200):
+    close = np.linspace(8.0, 10.0, n)
+    df = pd.DataFrame({"date": pd.date_range(end="2024-03-01", periods=n), "open": close,
+                       "high": close + 0.2, "low": close - 0.2, "close": close, "volume": np.full(n, 5e5)})
+    df.attrs.update(symbol="600519", period="daily", stock_type="stock")
+    return df
+
+def test_repeated_lookups_hit(cache):
+    df = daily()
+    ma = IndicatorService.calculate_ma(df, 5)
+    assert IndicatorService.calculate_ma(df, length=5) == ma
+    assert (cache.hits, cache.misses) == (1, 1)
+    df.attrs.clear()
+    IndicatorService.calculate_ma(df, 5)
+    assert fingerprint(df) is None and cache.misses == 1
+
+def test_updated_provisional_bar_misses(cache):
+    df = daily()
+    bar = {"open": 10.0, "high": 10.5, "low": 9.5, "close": 10.2, "volume": 1e6,
+           "time": df["date"].iloc[-1].to_pydatetime().replace(hour=10)}
+    first = RealtimeIngestor.provisional_frame(df, bar, "daily")
+    ma = IndicatorService.calculate_ma(first, 5)
+    # Same length and last date, only the close moved
+    second = RealtimeIngestor.provisional_frame(df, dict(bar, close=10.7, time=bar["time"].replace(hour=11)), "daily")
+    assert len(second) == len(first) and second["date"].iloc[-1].date() == first["date"].iloc[-1].date()
+    assert fingerprint(second) != fingerprint(first)
+    assert IndicatorService.calculate_ma(second, 5) == pytest.approx(ma + 0.5 / 5)
+    assert cache.hits == 0 and cache.misses == 2
+
+def test_derived_frames_get_their_own_fingerprint(cache):
+    df = daily(50)
+    IndicatorService.calculate_ma(df, 5)
+    # Derived frames copy attrs; with the base gone, one may even reuse its id()
+    derived = [df.iloc[:-10].copy(), df.iloc[-20:].reset_index(drop=True)]
+    del df
+    for frame in derived:
+        assert fingerprint(frame)[4] == len(frame)
+        assert IndicatorService.calculate_ma(frame, 5) == pytest.approx(frame["close"].iloc[-5:].mean())
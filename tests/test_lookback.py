@@ -0,0 +1,76 @@
+import numpy as np
+from app.core.config import settings
+from app.services.indicator import IndicatorService
+from app.services.lookback import (LookbackPolicy, indicator_bars, required_windows,
+                                   strategy_bars, trim_bars)
+from app.services.signal import SignalEngine
+
+class MockStrategy:
+    def __init__(self, rsi_length=14, rsi_period="daily", trend=False, volatility=False,
+                 buy_rule=None, sell_rule=None):
+        self.rsi_low = 30.0
+        self.rsi_high = 70.0
+        self.rsi_length = rsi_length
+        self.rsi_period = rsi_period
+        self.enable_trend_filter = trend
+        self.enable_volatility_filter = volatility
+        self.buy_rule = buy_rule
+        self.sell_rule = sell_rule
+
+def test_strategy_windows():
+    rsi14 = indicator_bars("rsi", (14,))
+    assert rsi14 > 14
+    assert indicator_bars("rsi", (24,)) > rsi14
+    assert indicator_bars("sma", (60,)) == 60
+    assert indicator_bars("macd", (12, 26, 9)) > indicator_bars("ema", (26,))
+
+    margin = settings.LOOKBACK_MARGIN
+    assert strategy_bars(MockStrategy(rsi_length=6)) == indicator_bars("rsi", (6,)) + margin
+    # Trend filter MA60 outweighs a short RSI
+    assert strategy_bars(MockStrategy(rsi_length=2, trend=True)) == 60 + margin
+    rule = MockStrategy(buy_rule="rsi(6) < 20 and macd_hist > 0", sell_rule="close > sma(120)")
+    assert strategy_bars(rule) == max(indicator_bars("macd", (12, 26, 9)), 120) + margin
+
+    windows = required_windows([MockStrategy(rsi_period="weekly"), MockStrategy(rsi_period="30"),
+                                MockStrategy(rsi_period="daily", rsi_length=6)])
+    assert windows["daily"] == (strategy_bars(MockStrategy()) + 1) * 5
+    assert windows["30"] == strategy_bars(MockStrategy()) + 1
+    assert required_windows([MockStrategy(rsi_period="4h")])["60"] == (strategy_bars(MockStrategy()) + 1) * 4
+
+def test_policy_rounds_and_disables(monkeypatch):
+    policy = LookbackPolicy()
+    policy._checked_at = float("inf")  # no DB refresh
+    assert policy.window("daily") is None  # not loaded: keep full history
+    policy._windows = {"daily": 333}
+    assert policy.window("daily") == 350
+    assert policy.window("5") == 150  # LOOKBACK_MIN_BARS (120), rounded up
+    monkeypatch.setattr(settings, "HISTORY_TRIM", False)
+    assert policy.window("daily") is None
+
+def test_trimmed_history_matches_full(walk):
+    full = walk(3000, seed=11, start="2010-01-01")
+    strategies = [MockStrategy(rsi_length=length, trend=True, volatility=True) for length in (6, 14, 24)]
+    window = max(required_windows(strategies)["daily"], settings.LOOKBACK_MIN_BARS)
+    trimmed = trim_bars(full, window)
+    assert len(trimmed) == window and trimmed["close"].iloc[-1] == full["close"].iloc[-1]
+    # A copy: the full history's arrays are not kept alive by the window
+    assert not np.shares_memory(trimmed["close"].to_numpy(), full["close"].to_numpy())
+
+    for length in (6, 14, 24):
+        a = IndicatorService.rsi_series(full, length=length).iloc[-1]
+        b = IndicatorService.rsi_series(trimmed, length=length).iloc[-1]
+        assert abs(a - b) < 0.01
+    assert np.isclose(IndicatorService.sma_series(full, 60).iloc[-1], IndicatorService.sma_series(trimmed, 60).iloc[-1], rtol=1e-12)
+    bb_full = IndicatorService.bbands_frame(full, 20).iloc[-1]
+    bb_trim = IndicatorService.bbands_frame(trimmed, 20).iloc[-1]
+    assert np.allclose(bb_full.to_numpy(), bb_trim.to_numpy(), rtol=1e-12)
+
+    for strategy in strategies:
+        assert SignalEngine.check_signal(full, strategy) == SignalEngine.check_signal(trimmed, strategy)
+
+    rule = MockStrategy(buy_rule="macd_hist > 0 and rsi(14) < 60")
+    trimmed = trim_bars(full, strategy_bars(rule) + 1)
+    macd_full = IndicatorService.macd_frame(full).iloc[-1]
+    macd_trim = IndicatorService.macd_frame(trimmed).iloc[-1]
+    scale = full["close"].iloc[-1]
+    assert np.all(np.abs(macd_full.to_numpy() - macd_trim.to_numpy()) < 1e-5 * scale)
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+from app.core.config import settings
+from app.services.bar_cache import BarCache
+from app.services.memory_budget import MemoryBudget, estimate_bytes, period_weight
+
+class FakePool:
+    def __init__(self, entries):
+        self.entries = {entry[0]: entry for entry in entries}
+
+    def memory_entries(self):
+        return list(self.entries.values())
+
+    def evict(self, key):
+        entry = self.entries.pop(key, None)
+        return entry[3] if entry else 0
+
+def frame(n=100):
+    return pd.DataFrame({"date": pd.date_range("2024-01-01", periods=n), "close": np.arange(n, dtype="float64")})
+
+def test_estimate_bytes():
+    df = frame(1000)
+    assert estimate_bytes(df) >= 16000
+    assert estimate_bytes(np.zeros(500)) == 4000
+    assert estimate_bytes({"rsi": df["close"]}) > estimate_bytes(df["close"])
+    assert estimate_bytes(None) == 0
+    assert period_weight("5") == 1 < period_weight("60") < period_weight("daily") < period_weight("monthly")
+
+def test_evicts_idle_symbols_then_long_periods(monkeypatch):
+    monkeypatch.setattr(settings, "MEMORY_BUDGET_MB", 5000 / 2**20)
+    monkeypatch.setattr(settings, "MEMORY_LOW_WATERMARK", 0.5)
+    now = 100000.0
+    budget = MemoryBudget()
+    bars = FakePool([
+        (("A", "5"), "A", "5", 1000, now),
+        (("A", "monthly"), "A", "monthly", 1000, now),
+        (("B", "5"), "B", "5", 1000, now - 7200),       # idle symbol
+        (("C", "daily"), "C", "daily", 1000, now - 7200),
+    ])
+    ticks = FakePool([("C", "C", None, 1000, now)])  # C is still being quoted
+    states = FakePool([(1, None, None, 1500, None)])
+    budget.register("bars", bars, cost=1.0)
+    budget.register("ticks", ticks, cost=4.0)
+    budget.register("signal_states", states)
+
+    assert budget.enforce(now=now) == 4000
+    # 6500 bytes -> at most 2500: B goes first (idle), then A's monthly, C's daily, A's 5 minute;
+    # C's ticks cost the most to lose and stay
+    assert bars.entries == {} and list(ticks.entries) == ["C"]
+    assert states.entries  # not evictable
+    assert budget.evictions == {"bars": 4}
+    assert budget.last_enforced["after"] == 2500
+
+    bars.entries = {("A", "5"): (("A", "5"), "A", "5", 1000, now), ("B", "5"): (("B", "5"), "B", "5", 1000, now - 7200)}
+    monkeypatch.setattr(settings, "MEMORY_BUDGET_MB", 4000 / 2**20)
+    monkeypatch.setattr(settings, "MEMORY_LOW_WATERMARK", 0.9)
+    assert budget.enforce(now=now) == 1000  # 4500 -> at most 3600
+    assert list(bars.entries) == [("A", "5")]
+
+def test_within_budget_and_stats(monkeypatch):
+    monkeypatch.setattr(settings, "MEMORY_BUDGET_MB", 1)
+    budget = MemoryBudget()
+    budget.register("bars", FakePool([(("A", "daily"), "A", "daily", 3000, 0.0), (("B", "5"), "B", "5", 500, 0.0)]), cost=1.0)
+    budget.register("signal_states", FakePool([(7, None, None, 100, None)]))
+    assert budget.enforce() == 0
+    stats = budget.stats()
+    assert stats["used_bytes"] == 3600 and stats["symbols"] == 2
+    assert stats["pools"]["signal_states"] == {"entries": 1, "bytes": 100, "evictable": False}
+    assert stats["top_symbols"][0] == {"symbol": "A", "bytes": 3000, "periods": ["daily"]}
+
+def test_bar_cache_eviction_drops_derived():
+    cache = BarCache()
+    base = frame(1000)
+    cache.put(("A", "daily", "stock"), base)
+    cache.put(("A", "weekly", "stock"), frame(200), source=base)
+    cache.put(("B", "daily", "stock"), frame(10))
+    entries = {entry[0]: entry for entry in cache.memory_entries()}
+    assert entries[("A", "daily", "stock")][3] == estimate_bytes(base)
+    freed = cache.evict(("A", "daily", "stock"))
+    assert freed == estimate_bytes(base) + estimate_bytes(frame(200))
+    assert cache.keys() == [("B", "daily", "stock")]
+    assert cache.evict(("A", "weekly", "stock")) == 0
@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+from types import SimpleNamespace
+from app.core.config import settings
+from app.services import providers
+from app.services.resample import BAR_COLUMNS
+
+# One upstream frame per daily / minute source, in its own column layout and volume unit
+SINA = pd.DataFrame({"date": ["2024-01-02", "2024-01-03"], "open": [10.0, 10.2], "high": [10.5, 10.6],
+                     "low": [9.9, 10.1], "close": [10.2, 10.4], "volume": [120000.0, 98000.0],
+                     "outstanding_share": [1e9, 1e9], "turnover": [0.0001, 0.0001]})
+EASTMONEY = pd.DataFrame({"日期": ["2024-01-02", "2024-01-03"], "股票代码": ["600519", "600519"],
+                          "开盘": [10.0, 10.2], "收盘": [10.2, 10.4], "最高": [10.5, 10.6], "最低": [9.9, 10.1],
+                          "成交量": [1200, 980], "成交额": [1.2e6, 1.0e6], "振幅": [6.0, 4.9]})
+TENCENT = pd.DataFrame({"date": ["2024-01-02", "2024-01-03"], "open": [10.0, 10.2], "close": [10.2, 10.4],
+                        "high": [10.5, 10.6], "low": [9.9, 10.1], "amount": [1200.0, 980.0]})
+MINUTE = pd.DataFrame({"day": ["2024-01-03 09:35:00", "2024-01-03 09:40:00"], "open": ["10.2", "10.3"],
+                       "high": ["10.3", "10.4"], "low": ["10.1", "10.2"], "close": ["10.3", "10.4"],
+                       "volume": ["50000", "48000"]})
+
+@pytest.fixture
+def provider(monkeypatch):
+    monkeypatch.setattr(settings, "HTTP_POOLING", False)
+    monkeypatch.setattr(providers, "ak", SimpleNamespace(
+        stock_zh_a_daily=lambda **kw: SINA.copy(),
+        stock_zh_a_hist=lambda **kw: EASTMONEY.copy(),
+        fund_etf_hist_em=lambda **kw: EASTMONEY.copy(),
+        stock_zh_a_hist_tx=lambda **kw: TENCENT.copy(),
+        stock_zh_a_minute=lambda **kw: MINUTE.copy(),
+    ))
+    return providers.AkShareProvider()
+
+def test_daily_sources_normalize_to_shares(provider):
+    frames = {
+        "sina": provider._daily_sina("600519", "20240101"),
+        "eastmoney": provider._daily_eastmoney("600519", "20240101"),
+        "eastmoney_etf": provider._daily_eastmoney("510300", "20240101", etf=True),
+        "tencent": provider._daily_tencent("600519", "20240101"),
+    }
+    for source, df in frames.items():
+        assert list(df.columns) == BAR_COLUMNS, source
+        assert pd.api.types.is_datetime64_any_dtype(df["date"]), source
+        assert df["close"].tolist() == [10.2, 10.4], source
+        assert df["volume"].tolist() == [120000.0, 98000.0], source
+
+def test_minute_source_normalizes(provider):
+    df = provider.get_minute("600519", period="5")
+    assert list(df.columns) == BAR_COLUMNS
+    assert df["date"].iloc[-1] == pd.Timestamp("2024-01-03 09:40")
+    assert df["volume"].tolist() == [50000.0, 48000.0]
+
+def test_providers_implement_the_interface():
+    with pytest.raises(TypeError):
+        providers.MarketDataProvider()
+    assert providers.sina_symbol("600519") == "sh600519" and providers.sina_symbol("000001") == "sz000001"
@@ -0,0 +1,20 @@
+from app.services.rate_limit import MemoryBuckets, RateLimiter
+
+def test_token_bucket_burst_then_spacing():
+    buckets = MemoryBuckets()
+    rate = 1 / 30.0  # notify_rate_limit = 30s
+    # Burst of 3 goes out at once
+    assert [buckets.acquire("1:telegram", rate, 3, 0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    wait = buckets.acquire("1:telegram", rate, 3, 0.0)
+    assert abs(wait - 30.0) < 1e-6
+    assert buckets.acquire("1:telegram", rate, 3, 29.0) > 0
+    assert buckets.acquire("1:telegram", rate, 3, 30.0) == 0.0
+    # Buckets are independent per user and channel
+    assert buckets.acquire("1:email", rate, 3, 30.0) == 0.0
+
+def test_block_applies_to_unlimited_channels():
+    limiter = RateLimiter(burst=3)
+    assert limiter.try_acquire(7, "telegram", 0) == 0.0
+    limiter.block(7, "telegram", 10, interval=0)
+    wait = limiter.try_acquire(7, "telegram", 0)
+    assert 9 < wait <= 10
@@ -0,0 +1,67 @@
+from collections import deque
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from app.services.realtime import RealtimeIngestor
+
+OPEN = datetime(2024, 3, 1, 10, 0).timestamp()
+
+def ingestor_with_ticks():
+    ingestor = RealtimeIngestor(buffer_size=100)
+    # (epoch, price, cumulative session volume); the first tick closes the previous bar
+    ingestor.ticks["600519"] = deque([
+        (OPEN, 9.9, 1000.0),
+        (OPEN + 10, 10.0, 1200.0),
+        (OPEN + 70, 10.4, 1500.0),
+        (OPEN + 130, 9.8, 1900.0),
+        (OPEN + 200, 10.1, 2600.0),
+    ], maxlen=100)
+    ingestor.quotes["600519"] = {"price": 10.1, "open": 9.5, "high": 10.6, "low": 9.4,
+                                 "volume": 2600.0, "ts": OPEN + 200}
+    return ingestor
+
+def daily(n=5, end="2024-03-01"):
+    close = np.linspace(9.0, 10.0, n)
+    df = pd.DataFrame({"date": pd.date_range(end=end, periods=n), "open": close, "high": close + 0.2,
+                       "low": close - 0.2, "close": close, "volume": np.full(n, 5e5)})
+    df.attrs.update(symbol="600519", period="daily", stock_type="stock")
+    return df
+
+def test_minute_bar_from_ticks():
+    bar = ingestor_with_ticks().provisional_bar("600519", "5", bar_start=OPEN)
+    # Ticks at or before bar_start belong to the previous bar
+    assert (bar["open"], bar["high"], bar["low"], bar["close"]) == (10.0, 10.4, 9.8, 10.1)
+    assert bar["volume"] == 1400.0
+    assert bar["time"] == datetime.fromtimestamp(OPEN + 200)
+
+    later = ingestor_with_ticks().provisional_bar("600519", "5", bar_start=OPEN + 130)
+    assert later["open"] == later["close"] == 10.1 and later["volume"] == 0.0
+    assert ingestor_with_ticks().provisional_bar("600519", "5", bar_start=OPEN + 200) is None
+    assert RealtimeIngestor().provisional_bar("600519", "5") is None
+
+def test_daily_bar_from_quote():
+    bar = ingestor_with_ticks().provisional_bar("600519", "daily")
+    assert (bar["open"], bar["high"], bar["low"], bar["close"], bar["volume"]) == (9.5, 10.6, 9.4, 10.1, 2600.0)
+
+def test_frame_replaces_todays_daily_bar():
+    df = daily()
+    bar = {"open": 9.9, "high": 10.3, "low": 9.7, "close": 10.2, "volume": 8e5,
+           "time": datetime(2024, 3, 1, 10, 3)}
+    frame = RealtimeIngestor.provisional_frame(df, bar, "daily")
+    assert len(frame) == len(df)
+    assert frame["close"].iloc[-1] == 10.2 and frame["volume"].iloc[-1] == 8e5
+    assert frame["close"].iloc[-2] == df["close"].iloc[-2]
+    assert frame.attrs == df.attrs
+    assert df["close"].iloc[-1] == 10.0  # the cached frame is untouched
+
+    # Yesterday's close is the last row: today's bar is appended
+    frame = RealtimeIngestor.provisional_frame(daily(end="2024-02-29"), bar, "daily")
+    assert len(frame) == 6 and frame["date"].iloc[-1] == pd.Timestamp(bar["time"])
+
+def test_frame_appends_minute_bar():
+    df = daily()
+    bar = {"open": 10.0, "high": 10.4, "low": 9.8, "close": 10.1, "volume": None,
+           "time": datetime(2024, 3, 1, 10, 3)}
+    frame = RealtimeIngestor.provisional_frame(df, bar, "5")
+    assert len(frame) == len(df) + 1
+    assert frame["close"].iloc[-1] == 10.1 and frame["date"].iloc[-1] == pd.Timestamp(bar["time"])
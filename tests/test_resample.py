@@ -0,0 +1,83 @@
+import pandas as pd
+from app.services.resample import normalize_bars, resample_bars, base_period
+
+def make_daily(days=15):
+    # Mon 2024-01-01 .. business days, close = 1, 2, 3, ...
+    dates = pd.bdate_range("2024-01-01", periods=days)
+    return pd.DataFrame({
+        'date': dates,
+        'open': [float(i) for i in range(1, days + 1)],
+        'high': [float(i) + 0.5 for i in range(1, days + 1)],
+        'low': [float(i) - 0.5 for i in range(1, days + 1)],
+        'close': [float(i) for i in range(1, days + 1)],
+        'volume': [100.0] * days,
+    })
+
+def test_base_period():
+    assert base_period("daily") == "daily"
+    assert base_period("weekly") == "daily"
+    assert base_period("3d") == "daily"
+    assert base_period("30") == "30"
+    assert base_period("4h") == "60"
+    assert base_period("5") == "5"
+    assert base_period("yearly") is None
+
+def test_normalize_chinese_columns():
+    df = pd.DataFrame({
+        '日期': ['2024-01-02', '2024-01-03'],
+        '开盘': ['1.0', '2.0'], '收盘': ['1.5', '2.5'],
+        '最高': [2, 3], '最低': [0.5, 1.5], '成交量': [10, 20],
+    })
+    out = normalize_bars(df)
+    assert list(out.columns) == ['date', 'open', 'high', 'low', 'close', 'volume']
+    assert out['close'].tolist() == [1.5, 2.5]
+    assert pd.api.types.is_datetime64_any_dtype(out['date'])
+
+def test_weekly_and_monthly():
+    df = make_daily(15)  # 3 full weeks
+    weekly = resample_bars(df, "weekly")
+    assert len(weekly) == 3
+    first = weekly.iloc[0]
+    assert first['open'] == 1.0 and first['close'] == 5.0
+    assert first['high'] == 5.5 and first['low'] == 0.5
+    assert first['volume'] == 500.0
+    # Bars are stamped with their last trading day
+    assert first['date'] == pd.Timestamp("2024-01-05")
+
+    monthly = resample_bars(make_daily(30), "monthly")
+    assert len(monthly) == 2
+    assert monthly.iloc[0]['close'] == 23.0  # 23 business days in Jan 2024
+
+def test_multi_day_aligned_to_latest():
+    df = make_daily(10)
+    bars = resample_bars(df, "3d")
+    # 10 bars -> groups of [1], [2-4], [5-7], [8-10]: last group is complete and current
+    assert len(bars) == 4
+    assert bars.iloc[-1]['open'] == 8.0 and bars.iloc[-1]['close'] == 10.0
+
+def test_intraday_from_five_minute():
+    times = list(pd.date_range("2024-01-02 09:35", periods=24, freq="5min")) + \
+            list(pd.date_range("2024-01-03 09:35", periods=24, freq="5min"))
+    df = pd.DataFrame({
+        'date': times,
+        'open': range(48), 'high': range(48), 'low': range(48),
+        'close': [float(i) for i in range(48)], 'volume': [1.0] * 48,
+    })
+    bars = resample_bars(df, "30", base="5")
+    assert len(bars) == 8  # 4 half-hour bars per day
+    assert bars.iloc[0]['close'] == 5.0
+    assert bars.iloc[4]['open'] == 24  # new session starts a new bar
+    assert bars.iloc[0]['date'] == pd.Timestamp("2024-01-02 10:00")
+
+    four_hour = resample_bars(df, "4h", base="5")
+    assert len(four_hour) == 2
+
+def test_four_hour_from_sixty_minute():
+    times = [pd.Timestamp(f"2024-01-0{d} {t}") for d in (2, 3) for t in ("10:30", "11:30", "14:00", "15:00")]
+    df = pd.DataFrame({
+        'date': times, 'open': range(8), 'high': range(8), 'low': range(8),
+        'close': [float(i) for i in range(8)], 'volume': [1.0] * 8,
+    })
+    bars = resample_bars(df, "4h")
+    assert len(bars) == 2  # one per session
+    assert bars.iloc[1]['open'] == 4 and bars.iloc[1]['close'] == 7.0
@@ -0,0 +1,58 @@
+import pandas as pd
+import pytest
+from app.services.rules import RuleError, compile_rule, evaluate_rules
+
+def make_frame(closes):
+    return pd.DataFrame({'close': [float(c) for c in closes]})
+
+def test_shared_nodes():
+    rule = compile_rule("close < bb_lower(20, 2) or close > bb_upper(20,2.0)")
+    keys = [node.key for node in rule.outputs]
+    assert keys == ['close', 'bb_lower(20,2.0)', 'bb_upper(20,2.0)']
+    # Both bands read the same bbands node
+    lower, upper = rule.outputs[1], rule.outputs[2]
+    assert lower.source is upper.source
+    # Defaults are filled in, so these are the same expression
+    assert compile_rule("macd_hist > 0").root.key == compile_rule("macd_hist(12,26,9) > 0").root.key
+
+@pytest.mark.parametrize("text", [
+    "", "rsi(14)", "rsi(14) <", "foo > 1", "rsi(1.5) > 2", "(close > 1", "1 and 2", "crosses_above(close) ",
+])
+def test_invalid_rules(text):
+    with pytest.raises(RuleError):
+        compile_rule(text)
+
+def test_evaluate_last_bar():
+    df = make_frame([1, 2, 3, 2, 5])
+    rules = [
+        compile_rule("close > 4"),
+        compile_rule("close * 2 - 1 == 9 and not close < 5"),
+        compile_rule("crosses_above(close, 4)"),
+        compile_rule("crosses_below(close, 4)"),
+    ]
+    assert evaluate_rules(df, rules) == [True, True, True, False]
+
+
+def test_macd_outputs_are_series():
+    rule = compile_rule("macd > 0")
+    assert rule.root.children[0].key == "macd(12,26,9)"
+    assert rule.root.children[0].source.key == "macd_frame(12,26,9)"
+    closes = [10 + (i % 7) * 0.5 + i * 0.05 for i in range(80)]
+    for text in ("macd > 0", "macd > macd_signal", "macd_hist(12,26,9) < 0 or macd >= macd_signal"):
+        assert isinstance(evaluate_rules(make_frame(closes), [compile_rule(text)])[0], bool)
+
+def test_short_frame_is_false():
+    df = make_frame([10, 11, 12])
+    rules = [compile_rule("rsi(14) < 30"), compile_rule("ema(20) > 0"), compile_rule("macd > 0")]
+    assert evaluate_rules(df, rules) == [False, False, False]
+
+def test_rule_alarm_has_no_rsi_threshold():
+    from types import SimpleNamespace
+    from app.services.scanner import build_alarm
+    stock = SimpleNamespace(user_id=1, stock_code="600519", stock_name="贵州茅台")
+    strategy = SimpleNamespace(rsi_low=30.0, rsi_high=70.0, rsi_period="daily", buy_rule="close > 4", sell_rule=None)
+    result = {"signal_type": "buy", "reason": "Rule: close > 4", "detail": "close=5.00",
+              "trend": None, "rsi": None}
+    assert build_alarm(stock, strategy, result, make_frame([5]), 0.0, price=5.0)["threshold"] is None
+    strategy.buy_rule = None
+    assert build_alarm(stock, strategy, result, make_frame([5]), 0.0, price=5.0)["threshold"] == 30.0
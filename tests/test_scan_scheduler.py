@@ -0,0 +1,66 @@
+from app.core.config import settings
+from app.services.scan_scheduler import ScanScheduler, bar_seconds, poll_interval, threshold_distance
+
+class MockStrategy:
+    def __init__(self, id, rsi_low=30.0, rsi_high=70.0, rsi_period="daily"):
+        self.id = id
+        self.stock_code = f"{600000 + id}"
+        self.rsi_low = rsi_low
+        self.rsi_high = rsi_high
+        self.rsi_period = rsi_period
+        self.rsi_length = 14
+        self.enable_trend_filter = False
+        self.buy_rule = None
+        self.sell_rule = None
+
+def history(walk, n=200, seed=5):
+    df = walk(n, seed, start="2024-01-01", ohlcv=False)
+    df.attrs.update(symbol=f"s{seed}", period="daily", stock_type="stock")
+    return df
+
+def test_distance_and_interval():
+    strategy = MockStrategy(1)
+    assert threshold_distance(strategy, 31) == 1
+    assert threshold_distance(strategy, 68) == 2
+    assert threshold_distance(strategy, 25) == 0
+    strategy.enable_trend_filter = True
+    assert threshold_distance(strategy, 36) == 1
+    strategy.buy_rule = "rsi(6) < 20"
+    assert threshold_distance(strategy, 50) is None
+
+    assert bar_seconds("5") == 300 and bar_seconds("4h") == 14400 and bar_seconds("3d") == 3 * 14400
+    near = poll_interval(0.5, 4.0, "daily")
+    far = poll_interval(20, 4.0, "daily")
+    assert near == settings.SCAN_MIN_INTERVAL
+    assert far == settings.SCAN_MAX_INTERVAL
+    assert near < poll_interval(2, 4.0, "daily") < far
+
+def test_plan_prioritizes_and_respects_budget(monkeypatch, walk):
+    monkeypatch.setattr(settings, "SCAN_REQUEST_BUDGET", 2)
+    scheduler = ScanScheduler()
+    near, mid, far = MockStrategy(1), MockStrategy(2), MockStrategy(3)
+    items = [("a", far), ("b", mid), ("c", near)]
+    df = history(walk)
+
+    # First cycle: everything is due, the budget caps the polls
+    due, deferred = scheduler.plan(items, now=0)
+    assert len(due) == 2 and len(deferred) == 1
+    scheduler.record(near, df, 30.5, now=0)
+    scheduler.record(far, df, 50.0, now=0)
+    scheduler.record(mid, df, 36.0, now=0)
+
+    # Only the near-threshold strategy is due after one minimum interval
+    due, _ = scheduler.plan(items, now=settings.SCAN_MIN_INTERVAL)
+    assert [s for _, s in due] == [near]
+    # Later, the most overdue relative to its interval comes first
+    due, _ = scheduler.plan(items, now=settings.SCAN_MAX_INTERVAL)
+    assert [s for _, s in due][0] is near
+    assert scheduler.last_cycle["over_budget"] == 1
+
+def test_changed_settings_are_polled_immediately(walk):
+    scheduler = ScanScheduler()
+    strategy = MockStrategy(1)
+    scheduler.record(strategy, history(walk), 50.0, now=0)
+    assert scheduler.plan([("a", strategy)], now=1)[0] == []
+    strategy.rsi_low = 45.0
+    assert scheduler.plan([("a", strategy)], now=1)[0] == [("a", strategy)]
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+from sqlalchemy import insert
+from app.models import ScreenerResult
+from app.services.screener import compute_batch, query_results, build_filter, ScreenerError
+
+def test_compute_batch():
+    falling = np.linspace(20, 10, 120)
+    short = np.array([10.0, 10.5])
+    rows = {r["stock_code"]: r for r in compute_batch([
+        ("600000", "A", "stock", "2024-01-05", falling),
+        ("600001", "B", "stock", "2024-01-05", short),
+    ])}
+    assert rows["600000"]["rsi6"] < 5
+    assert rows["600000"]["price"] == 10.0
+    assert rows["600000"]["ma60"] > rows["600000"]["price"]
+    # Too little history: price only, indicators empty
+    assert rows["600001"]["change_pct"] == 5.0
+    assert rows["600001"]["ma60"] is None
+
+def test_query_filters(db):
+    db.execute(insert(ScreenerResult), [
+        {"stock_code": "600000", "stock_type": "stock", "price": 12.0, "ma60": 11.0, "rsi6": 15.0},
+        {"stock_code": "600001", "stock_type": "stock", "price": 9.0, "ma60": 11.0, "rsi6": 12.0},
+        {"stock_code": "510300", "stock_type": "etf", "price": 4.0, "ma60": 3.5, "rsi6": 45.0},
+    ])
+    db.commit()
+    assert [r.stock_code for r in query_results(db, "rsi6 < 20 and price > ma60")] == ["600000"]
+    assert [r.stock_code for r in query_results(db, "rsi6 < 50", order_by="rsi6")] == ["600001", "600000", "510300"]
+    assert [r.stock_code for r in query_results(db, "close > 1", stock_type="etf")] == ["510300"]
+
+def test_filter_errors():
+    assert len(build_filter("rsi6 < 20 AND ma20 >= ma60")) == 2
+    for bad in ("rsi6 <", "volume > 1", "1 < 2", "rsi6 < 20 or rsi14 < 30"):
+        with pytest.raises(ScreenerError):
+            build_filter(bad)
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.services.indicator import IndicatorService
+from app.services.series import SeriesError, build_series, from_binary, lttb, to_binary, to_json, warmup_bars
+
+def test_lttb_keeps_endpoints_and_extremes():
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 50)
+    y[437] = 5.0  # Spike must survive downsampling
+    keep = lttb(x, y, 100)
+    assert len(keep) == 100
+    assert keep[0] == 0 and keep[-1] == 999
+    assert np.all(np.diff(keep) > 0)
+    assert 437 in keep
+    assert len(lttb(x, y, 2000)) == 1000
+
+def test_range_is_warmed_up_and_aligned(walk):
+    df = walk()
+    columns = build_series(df, start="2022-01-01", end="2022-03-31", rsi_length=14)
+    assert list(columns)[:6] == ["t", "open", "high", "low", "close", "volume"]
+    assert len(columns["t"]) == 90
+    # Indicators come from the full history, so no warm-up gap at the range start
+    full_rsi = IndicatorService.rsi_series(df, length=14)
+    first = df.index[df["date"] == pd.Timestamp("2022-01-01")][0]
+    assert columns["rsi"][0] == pytest.approx(full_rsi.iloc[first])
+    assert not np.isnan(columns["ma"][0]) and not np.isnan(columns["bb_upper"][0])
+
+def test_warmup_covers_requested_indicators():
+    assert warmup_bars(("ma",)) == 60 and warmup_bars(("bb",)) == 20
+    assert warmup_bars(("rsi",), rsi_length=14) > 14
+    assert warmup_bars(("rsi", "ma")) == max(warmup_bars(("rsi",)), 60)
+    assert warmup_bars(()) == 0
+
+def test_downsampled_columns_stay_aligned(walk):
+    df = walk()
+    columns = build_series(df, points=200, indicators=("rsi",))
+    assert len(columns["t"]) == 200
+    rsi = IndicatorService.rsi_series(df, length=14).to_numpy()
+    rows = ((columns["t"] - columns["t"][0]) // 86400).astype(int)
+    assert np.allclose(columns["close"], df["close"].to_numpy()[rows])
+    assert np.allclose(columns["rsi"], rsi[rows], equal_nan=True)
+
+def test_encodings(walk):
+    columns = build_series(walk(100), indicators=("ma",))
+    payload = to_json(columns)
+    assert payload["rows"] == 100 and payload["columns"][-1] == "ma"
+    assert payload["ma"][0] is None and payload["ma"][-1] is not None
+    decoded = from_binary(to_binary(columns))
+    assert list(decoded) == list(columns)
+    assert np.array_equal(decoded["t"], columns["t"])
+    assert np.allclose(decoded["close"], columns["close"], rtol=1e-6)
+
+def test_invalid_requests(walk):
+    with pytest.raises(SeriesError):
+        build_series(walk(50), indicators=("vwap",))
+    with pytest.raises(SeriesError):
+        build_series(walk(50), start="2021-01-01", end="2020-01-01")
+    with pytest.raises(SeriesError):
+        build_series(walk(50), start="not a date")
@@ -0,0 +1,92 @@
+import multiprocessing
+import threading
+import numpy as np
+import pandas as pd
+from app.core.config import settings
+from app.services.shared_bars import SharedBars
+
+KEY = ("600519", "daily", "stock")
+
+def bars(n=500, shift=0.0):
+    close = np.linspace(10, 20, n) + shift
+    return pd.DataFrame({
+        "date": pd.date_range("2022-01-03", periods=n),
+        "open": close, "high": close + 1, "low": close - 1, "close": close,
+        "volume": np.full(n, 1000.0 + shift),
+    })
+
+def make_pair(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "SHARED_BARS_DIR", str(tmp_path))
+    writer = SharedBars()
+    writer.create(slots=64)
+    return writer, SharedBars()
+
+def test_publish_and_read_zero_copy(tmp_path, monkeypatch):
+    writer, reader = make_pair(tmp_path, monkeypatch)
+    df = bars()
+    shared = writer.publish(KEY, df, fetched_at=123.0)
+    pd.testing.assert_frame_equal(shared, df, check_dtype=False)
+
+    found, fetched_at = reader.get(KEY)
+    assert fetched_at == 123.0
+    pd.testing.assert_frame_equal(found, df, check_dtype=False)
+    # Columns are read-only views of the mapped file
+    close = found["close"].to_numpy()
+    assert not close.flags.writeable and not close.flags.owndata
+    assert reader.get(("000001", "daily", "stock")) is None
+
+def test_update_keeps_old_views_valid(tmp_path, monkeypatch):
+    writer, reader = make_pair(tmp_path, monkeypatch)
+    writer.publish(KEY, bars())
+    old, _ = reader.get(KEY)
+    writer.publish(KEY, bars(501, shift=5))
+    new, _ = reader.get(KEY)
+    assert len(old) == 500 and old["close"].iloc[0] == 10
+    assert len(new) == 501 and new["close"].iloc[0] == 15
+    # Only the current generation is left on disk
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(["index", new_file(writer)])
+    writer.remove(KEY)
+    assert reader.get(KEY) is None
+
+def new_file(writer):
+    return writer._slots["data"][writer._find_slot(b"600519|daily|stock")].decode()
+
+def test_concurrent_reads_are_consistent(tmp_path, monkeypatch):
+    writer, reader = make_pair(tmp_path, monkeypatch)
+    writer.publish(KEY, bars())
+    stop = threading.Event()
+    seen = []
+
+    def read():
+        while not stop.is_set():
+            found = reader.get(KEY)
+            if found is not None:
+                df = found[0]
+                # Every column of a frame comes from the same publication
+                seen.append(df["volume"].iloc[0] - 1000.0 == df["close"].iloc[0] - 10.0)
+
+    thread = threading.Thread(target=read)
+    thread.start()
+    for i in range(200):
+        writer.publish(KEY, bars(500 + i % 7, shift=float(i)))
+    stop.set()
+    thread.join()
+    assert seen and all(seen)
+
+def _read_in_child(directory, queue):
+    settings.SHARED_BARS_DIR = directory
+    from app.services.shared_bars import shared_bars
+    found = shared_bars.get(KEY)
+    queue.put(None if found is None else float(found[0]["close"].sum()))
+
+def test_other_process_maps_the_same_bars(tmp_path, monkeypatch):
+    writer, _ = make_pair(tmp_path, monkeypatch)
+    df = bars()
+    writer.publish(KEY, df)
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    child = ctx.Process(target=_read_in_child, args=(str(tmp_path), queue))
+    child.start()
+    result = queue.get(timeout=60)
+    child.join()
+    assert result == float(df["close"].sum())
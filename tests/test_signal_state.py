@@ -0,0 +1,66 @@
+from app.services.signal_state import SignalStateMachine, IDLE, ARMED, FIRED, RESET
+
+class MockStrategy:
+    id = 1
+    stock_code = "600000"
+    rsi_low = 30.0
+    rsi_high = 70.0
+
+def buy(rsi):
+    return {'signal_type': 'buy', 'triggered': True, 'rsi': rsi}
+
+def test_fires_once_per_episode():
+    machine = SignalStateMachine(hysteresis=5)
+    strategy = MockStrategy()
+
+    assert not machine.step(strategy, None, 50)
+    assert machine.get(strategy)[0] == IDLE
+    assert not machine.step(strategy, None, 33)
+    assert machine.get(strategy)[:2] == (ARMED, "buy")
+
+    # Oversold for many scans: one alarm
+    assert machine.step(strategy, buy(25), 25)
+    for _ in range(10):
+        assert not machine.step(strategy, buy(24), 24)
+    assert machine.get(strategy)[0] == FIRED
+
+    # Flickering around the threshold inside the band does not re-fire
+    assert not machine.step(strategy, None, 31)
+    assert machine.get(strategy)[0] == RESET
+    assert not machine.step(strategy, buy(29), 29)
+
+    # Leaving the band re-arms the side
+    assert not machine.step(strategy, None, 40)
+    assert machine.get(strategy)[0] == IDLE
+    assert machine.step(strategy, buy(28), 28)
+
+def test_side_change_fires():
+    machine = SignalStateMachine(hysteresis=5)
+    strategy = MockStrategy()
+    assert machine.step(strategy, buy(25), 25)
+    assert machine.step(strategy, {'signal_type': 'sell', 'triggered': True}, 75)
+    assert machine.get(strategy)[:2] == (FIRED, "sell")
+
+def test_unqueued_alarm_fires_again(monkeypatch):
+    from app.services import scanner
+    machine = SignalStateMachine(hysteresis=5)
+    strategy = MockStrategy()
+    monkeypatch.setattr(scanner, "signal_state", machine)
+    monkeypatch.setattr(scanner.alarm_queue, "push_alarm", lambda alarm: False)
+    assert not machine.step(strategy, None, 33)
+    assert machine.step(strategy, buy(25), 25)
+    # Redis down or dropped by backpressure: back to armed, so the next scan retries
+    assert not scanner.emit_alarm(None, strategy, {"stock_code": "600000", "signal_type": "buy"})
+    assert machine.get(strategy)[:2] == (ARMED, "buy")
+    assert machine.step(strategy, buy(24), 24)
+
+def test_band_follows_trend_adjusted_threshold():
+    machine = SignalStateMachine(hysteresis=5)
+    strategy = MockStrategy()
+    uptrend = (35.0, 70.0)  # rsi_low raised by the trend filter
+    assert machine.step(strategy, buy(34), 34, uptrend)
+    # Hovering around the trigger level stays inside the band: no repeat
+    for rsi in (36, 34.5, 37, 34):
+        assert not machine.step(strategy, buy(rsi) if rsi < 35 else None, rsi, uptrend)
+    assert not machine.step(strategy, None, 41, uptrend)
+    assert machine.get(strategy)[0] == IDLE
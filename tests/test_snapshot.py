@@ -0,0 +1,101 @@
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from app.core.config import settings
+from app.services import snapshot
+from app.services.bar_cache import BarCache
+from app.services.market_data import MarketDataService
+from app.services.providers import set_provider
+from app.services.signal_state import FIRED, SignalStateMachine
+
+class HistoryProvider:
+    name = "history"
+    def __init__(self, df):
+        self.df = df
+        self.starts = []
+
+    def get_daily(self, code, stock_type="stock", start_date=None):
+        self.starts.append(start_date)
+        if start_date is None:
+            return self.df.copy()
+        return self.df[self.df["date"] >= pd.Timestamp(start_date)].reset_index(drop=True)
+
+def bars(n=300):
+    close = np.linspace(10, 12, n)
+    return pd.DataFrame({
+        "date": pd.date_range("2023-01-02", periods=n),
+        "open": close, "high": close + 0.1, "low": close - 0.1, "close": close,
+        "volume": np.full(n, 5e5),
+    })
+
+@pytest.fixture
+def state(monkeypatch):
+    monkeypatch.setattr(snapshot, "bar_cache", BarCache())
+    monkeypatch.setattr(snapshot, "signal_state", SignalStateMachine())
+    monkeypatch.setattr(MarketDataService, "_symbol_info", {})
+
+def teardown_function():
+    set_provider(None)
+
+def test_round_trip(tmp_path, state, monkeypatch):
+    path = str(tmp_path / "state" / "snapshot.pkl.gz")
+    df = bars()
+    key = ("600519", "daily", "stock")
+    snapshot.bar_cache.restore([(key, df, time.time() - 7200)])
+    snapshot.bar_cache.put(("600519", "weekly", "stock"), bars(60), source=df)
+    snapshot.signal_state._states[7] = (FIRED, "buy", 1700000000.0)
+    MarketDataService._symbol_info["600519"] = {"name": "贵州茅台"}
+    assert snapshot.save_snapshot(path) > 0
+
+    monkeypatch.setattr(snapshot, "bar_cache", BarCache())
+    monkeypatch.setattr(snapshot, "signal_state", SignalStateMachine())
+    monkeypatch.setattr(MarketDataService, "_symbol_info", {})
+    assert snapshot.load_snapshot(path)
+    # Only the base series is stored; it keeps its fetch time, so it is stale
+    assert snapshot.bar_cache.keys() == [key]
+    assert snapshot.bar_cache.get(key, max_age=3600) is None
+    pd.testing.assert_frame_equal(snapshot.bar_cache.get(key, max_age=float("inf")), df)
+    assert snapshot.signal_state._restored == {7: (FIRED, "buy", 1700000000.0)}
+    assert MarketDataService._symbol_info == {"600519": {"name": "贵州茅台"}}
+
+def test_incompatible_snapshots_are_ignored(tmp_path, state, monkeypatch):
+    path = str(tmp_path / "snapshot.pkl.gz")
+    assert not snapshot.load_snapshot(path)
+    snapshot.save_snapshot(path)
+    monkeypatch.setattr(snapshot, "SNAPSHOT_VERSION", 2)
+    assert not snapshot.load_snapshot(path)
+    monkeypatch.setattr(snapshot, "SNAPSHOT_VERSION", 1)
+    monkeypatch.setattr(settings, "SNAPSHOT_MAX_AGE", -1)
+    assert not snapshot.load_snapshot(path)
+    (tmp_path / "snapshot.pkl.gz").write_bytes(b"not gzip")
+    monkeypatch.setattr(settings, "SNAPSHOT_MAX_AGE", 3600)
+    assert not snapshot.load_snapshot(path)
+
+def test_refresh_fetches_only_the_tail():
+    upstream = bars(301)
+    provider = HistoryProvider(upstream)
+    set_provider(provider)
+    df = MarketDataService._refresh_tail("600519", upstream.iloc[:300])
+    assert provider.starts == [upstream["date"].iloc[298].strftime("%Y%m%d")]
+    pd.testing.assert_frame_equal(df, upstream)
+
+def test_refresh_falls_back_to_full_fetch():
+    upstream = bars(301)
+    cached = upstream.iloc[:300]
+    # Re-adjusted upstream (a dividend under qfq scales past closes)
+    readjusted = upstream.copy()
+    readjusted["close"] *= 0.98
+    provider = HistoryProvider(readjusted)
+    set_provider(provider)
+    df = MarketDataService._refresh_tail("600519", cached)
+    assert provider.starts[-1] is None
+    pd.testing.assert_frame_equal(df, readjusted)
+
+    # The anchor bar is missing upstream, so the tail starts on another day
+    gapped = upstream.drop(index=298).reset_index(drop=True)
+    provider = HistoryProvider(gapped)
+    set_provider(provider)
+    df = MarketDataService._refresh_tail("600519", cached)
+    assert len(provider.starts) == 2 and provider.starts[-1] is None
+    pd.testing.assert_frame_equal(df, gapped)
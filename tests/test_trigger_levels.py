@@ -0,0 +1,61 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from app.services.indicator import IndicatorService
+from app.services.signal import SignalEngine
+from app.services.trigger_levels import compute_levels, completed_bars, TriggerCache
+
+class MockStrategy:
+    id = 1
+    rsi_low = 30.0
+    rsi_high = 70.0
+    rsi_length = 14
+    enable_trend_filter = False
+    enable_volatility_filter = False
+    buy_rule = None
+    sell_rule = None
+
+AFTER_CLOSE = datetime(2030, 1, 1, 16, 0)
+
+def history(walk, n=300, seed=1):
+    return walk(n, seed, start="2023-01-02", ohlcv=False)
+
+def with_close(df, price):
+    row = pd.DataFrame({"date": [df["date"].iloc[-1] + pd.Timedelta(days=1)], "close": [price]})
+    return pd.concat([df, row], ignore_index=True)
+
+def test_trigger_prices_hit_thresholds(walk):
+    df = history(walk)
+    levels = compute_levels(df, MockStrategy(), now=AFTER_CLOSE)
+    assert levels.buy_price < df["close"].iloc[-1] < levels.sell_price
+    assert abs(IndicatorService.calculate_rsi(with_close(df, levels.buy_price), length=14) - 30) < 1e-6
+    assert abs(IndicatorService.calculate_rsi(with_close(df, levels.sell_price), length=14) - 70) < 1e-6
+
+def test_check_matches_signal_engine(walk):
+    df = history(walk, seed=7)
+    for trend in (False, True):
+        strategy = MockStrategy()
+        strategy.enable_trend_filter = trend
+        levels = compute_levels(df, strategy, now=AFTER_CLOSE)
+        if trend:
+            assert levels.ma_cross is not None
+        last = df["close"].iloc[-1]
+        for price in np.linspace(last * 0.8, last * 1.2, 60):
+            frame = with_close(df, price)
+            result = SignalEngine.check_signal(frame, strategy)
+            assert levels.check(price) == (result["signal_type"] if result else None)
+            assert levels.rsi_thresholds(strategy, price) == SignalEngine.effective_thresholds(frame, strategy)
+
+def test_forming_bar_excluded_during_session(walk):
+    df = history(walk, n=50)
+    session = df["date"].iloc[-1].to_pydatetime().replace(hour=10)
+    assert len(completed_bars(df, now=session)) == 49
+    assert len(completed_bars(df, now=session.replace(hour=15, minute=5))) == 50
+
+def test_cache_recomputes_on_new_bar(walk):
+    cache = TriggerCache()
+    strategy = MockStrategy()
+    df = history(walk)
+    first = cache.get(strategy, df, now=AFTER_CLOSE)
+    assert cache.get(strategy, df, now=AFTER_CLOSE) is first
+    assert cache.get(strategy, with_close(df, 12.0), now=AFTER_CLOSE) is not first
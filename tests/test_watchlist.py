@@ -0,0 +1,86 @@
+from app.models import UserStock, UserStrategy
+from app.services import watchlist
+from app.services.providers import set_provider
+
+class ListingProvider:
+    name = "listing"
+    def list_symbols(self, stock_type="stock"):
+        if stock_type == "etf":
+            return {"510300": "沪深300ETF"}
+        return {"600519": "贵州茅台", "000001": "平安银行"}
+
+def setup_function():
+    set_provider(ListingProvider())
+    watchlist.symbol_index.invalidate()
+
+def test_parse_csv_and_json():
+    rows = watchlist.parse_rows(b"stock_code,rsi_low\nsh600519,25\n", "text/csv")
+    assert rows == [{"stock_code": "sh600519", "rsi_low": "25"}]
+    rows = watchlist.parse_rows(b'["600519", {"stock_code": "510300"}]', "application/json")
+    assert [r["stock_code"] for r in rows] == ["600519", "510300"]
+
+def test_validate_against_listing():
+    rows = [
+        {"stock_code": "600519.SH", "rsi_low": "25"},
+        {"stock_code": "510300"},
+        {"stock_code": "999999"},
+        {"stock_code": "abc"},
+        {"stock_code": "000001", "enable_push": "maybe"},
+    ]
+    valid, errors = watchlist.validate_rows(rows)
+    assert valid["600519"] == {"stock_name": "贵州茅台", "stock_type": "stock", "strategy": {"rsi_low": 25.0},
+                                "given": []}
+    assert valid["510300"]["stock_type"] == "etf"
+    assert [(e["row"], e["error"]) for e in errors][:2] == [(3, "unknown symbol"), (4, "invalid code")]
+    assert errors[2]["row"] == 5
+
+def test_upsert_and_export_round_trip(db):
+    db.add(UserStock(stock_code="600519", stock_name="old", stock_type="stock"))
+    db.add(UserStrategy(stock_code="600519", rsi_low=30.0, rsi_high=70.0))
+    db.commit()
+
+    valid, _ = watchlist.validate_rows(watchlist.parse_rows(
+        b"stock_code,rsi_low,buy_rule\n600519,20,\n000001,,rsi(6) < 20\n"))
+    result = watchlist.upsert(db, valid)
+    assert result == {"added": ["000001"], "updated": ["600519"]}
+
+    rows = {r["stock_code"]: r for r in watchlist.export_rows(db)}
+    # Columns absent from the file keep their values
+    assert rows["600519"]["stock_name"] == "old"
+    assert rows["600519"]["rsi_low"] == 20.0
+    assert rows["000001"]["rsi_low"] == 30.0
+    assert rows["000001"]["buy_rule"] == "rsi(6) < 20"
+
+    # The CSV export imports back unchanged
+    valid, errors = watchlist.validate_rows(watchlist.parse_rows(
+        watchlist.to_csv(list(rows.values())).encode()))
+    assert not errors
+    assert watchlist.upsert(db, valid)["added"] == []
+
+    valid, _ = watchlist.validate_rows([{"stock_code": "600519", "stock_name": "贵州茅台"}])
+    assert watchlist.upsert(db, valid)["updated"] == ["600519"]
+    assert {r["stock_code"]: r for r in watchlist.export_rows(db)}["600519"]["stock_name"] == "贵州茅台"
+
+def teardown_function():
+    set_provider(None)
+
+def test_rejects_unsupported_period():
+    valid, errors = watchlist.validate_rows([{"stock_code": "600519", "rsi_period": "2h"},
+                                             {"stock_code": "000001", "rsi_period": "4h"}])
+    assert list(valid) == ["000001"]
+    assert errors[0]["row"] == 1 and "rsi_period" in errors[0]["error"]
+
+def test_update_resets_signal_state(db):
+    from app.services.signal_state import FIRED, IDLE, signal_state
+    db.add(UserStock(stock_code="600519", stock_name="x", stock_type="stock"))
+    strategy = UserStrategy(stock_code="600519", rsi_low=30.0, rsi_high=70.0)
+    db.add(strategy)
+    db.commit()
+    signal_state.step(strategy, {"triggered": True, "signal_type": "buy"}, 20.0)
+    assert signal_state.get(strategy)[0] == FIRED
+
+    valid, _ = watchlist.validate_rows([{"stock_code": "600519", "rsi_low": "20"}])
+    watchlist.upsert(db, valid)
+    assert signal_state.get(strategy)[0] == IDLE
+    db.refresh(strategy)
+    assert strategy.signal_state == IDLE
@@ -0,0 +1,21 @@
+from app.services import worker
+
+class FakeSession:
+    rolled_back = False
+    def rollback(self):
+        self.rolled_back = True
+
+def test_message_without_value():
+    # Rule strategies on short frames have no RSI
+    alarm = {"stock_name": "贵州茅台", "stock_code": "600519", "reason": "Rule: close > 4",
+             "value": None, "price": 1500.0, "time": "2024-03-01T10:00:00"}
+    assert "Value: N/A" in worker.format_message(alarm)
+    assert "Value: 25.12" in worker.format_message(dict(alarm, value=25.123))
+
+def test_failed_delivery_does_not_raise(monkeypatch):
+    def deliver(db, alarm):
+        raise TypeError("bad alarm")
+    monkeypatch.setattr(worker, "deliver_alarm", deliver)
+    db = FakeSession()
+    worker._deliver(db, {"stock_code": "600519"})
+    assert db.rolled_back